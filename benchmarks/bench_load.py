@@ -0,0 +1,106 @@
+"""Benchmark NodeEditor.loadFromJson on large generated circuits.
+
+Builds a grid of gates where every gate takes its inputs from two gates in
+the previous column, and times loading it into an offscreen editor with and
+without bulk construction:
+
+    python benchmarks/bench_load.py
+    python benchmarks/bench_load.py --sizes 10000 100000 500000 --bulk-only
+"""
+
+import os
+import sys
+import time
+import argparse
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from PyQt5.QtWidgets import QApplication
+
+from nodes import NodeEditor
+
+
+SIZES = [10000, 100000, 500000]
+ROWS = 100
+GATE_TYPES = ["AndNode", "OrNode", "XorNode", "NandNode", "NorNode", "XnorNode"]
+
+
+def gridCircuit(gates, rows=ROWS):
+    """
+    Generate circuit data with a column of inputs followed by gate columns
+
+    Args:
+        gates: Number of gates to generate
+        rows: Gates per column
+
+    Returns:
+        Dict in the .circuit JSON format
+    """
+    nodes = []
+    connections = []
+    previous = []
+    for row in range(rows):
+        node_id = f"in{row}"
+        nodes.append({"id": node_id, "type": "InputNode", "pos_x": 0.0, "pos_y": row * 100.0,
+                      "value": str(row & 1)})
+        previous.append(node_id)
+
+    column = 0
+    while gates > 0:
+        column += 1
+        current = []
+        for row in range(min(rows, gates)):
+            node_id = f"g{column}_{row}"
+            nodes.append({"id": node_id, "type": GATE_TYPES[(column + row) % len(GATE_TYPES)],
+                          "pos_x": column * 150.0, "pos_y": row * 100.0})
+            for socket, source in enumerate((previous[row], previous[(row + 1) % len(previous)])):
+                connections.append({"source_node": source, "source_socket": 0,
+                                    "dest_node": node_id, "dest_socket": socket})
+            current.append(node_id)
+        gates -= len(current)
+        previous = current
+
+    for row, source in enumerate(previous):
+        node_id = f"out{row}"
+        nodes.append({"id": node_id, "type": "OutputNode", "pos_x": (column + 1) * 150.0, "pos_y": row * 100.0})
+        connections.append({"source_node": source, "source_socket": 0, "dest_node": node_id, "dest_socket": 0})
+
+    return {"nodes": nodes, "connections": connections}
+
+
+def timeLoad(data, bulk):
+    """Load data into a fresh editor and return the elapsed seconds"""
+
+    editor = NodeEditor()
+    start = time.perf_counter()
+    editor.loadFromJson(data, bulk=bulk)
+    elapsed = time.perf_counter() - start
+    editor.release()
+    editor.deleteLater()
+    return elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time loading generated circuits into the editor")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="Gate counts to load")
+    parser.add_argument("--bulk-only", action="store_true", help="Skip the per-item (non-bulk) load")
+    args = parser.parse_args(argv)
+
+    app = QApplication.instance() or QApplication(sys.argv)
+
+    print(f"{'gates':>8} {'connections':>12} {'bulk s':>9} {'per-item s':>11} {'speedup':>8}")
+    for size in args.sizes:
+        data = gridCircuit(size)
+        bulk = timeLoad(data, True)
+        app.processEvents()
+        if args.bulk_only:
+            print(f"{size:>8} {len(data['connections']):>12} {bulk:>9.2f} {'-':>11} {'-':>8}")
+            continue
+        single = timeLoad(data, False)
+        app.processEvents()
+        print(f"{size:>8} {len(data['connections']):>12} {bulk:>9.2f} {single:>11.2f} {single / bulk:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
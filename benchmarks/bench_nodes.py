@@ -0,0 +1,103 @@
+"""Benchmark construction time and memory per gate item.
+
+Creates gate items of every type in an offscreen scene and reports the
+time and resident memory per gate. The same is measured for the text alone,
+with the title and symbol built as QGraphicsTextItem objects (the way nodes
+drew text before the glyph cache) and as cached TextItem objects:
+
+    python benchmarks/bench_nodes.py
+    python benchmarks/bench_nodes.py --count 20000
+"""
+
+import os
+import sys
+import time
+import argparse
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from PyQt5.QtWidgets import QApplication, QGraphicsRectItem, QGraphicsTextItem
+from PyQt5.QtGui import QFont
+
+from nodes import (NodeEditor, TextItem, GLYPH_CACHE, TEXT_COLOR, SYMBOL_COLOR, NODE_WIDTH, NODE_HEIGHT,
+                   AndNode, OrNode, NotNode, NandNode, NorNode, XorNode, XnorNode)
+
+
+COUNT = 10000
+GATES = [AndNode, OrNode, NotNode, NandNode, NorNode, XorNode, XnorNode]
+SYMBOLS = ["∧", "∨", "¬", "⊼", "⊽", "⊕", "⊙"]
+
+
+def residentBytes():
+    """Get the resident set size of the process, or 0 where /proc is unavailable"""
+
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+
+def measure(build, count):
+    """
+    Call build(i) count times, keeping the results alive
+
+    Returns:
+        (microseconds per call, resident bytes per call)
+    """
+    items = []
+    memory = residentBytes()
+    start = time.perf_counter()
+    for i in range(count):
+        items.append(build(i))
+    elapsed = time.perf_counter() - start
+    memory = residentBytes() - memory
+    return 1e6 * elapsed / count, memory / count, items
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time and size gate construction")
+    parser.add_argument("--count", type=int, default=COUNT, help="Items to build per measurement")
+    args = parser.parse_args(argv)
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    editor = NodeEditor()
+    scene = editor.scene
+
+    def gate(i):
+        node = GATES[i % len(GATES)](scene)
+        node.setPos((i % 100) * NODE_WIDTH, (i // 100) * NODE_HEIGHT)
+        return node
+
+    def documentText(i):
+        parent = QGraphicsRectItem(0, 0, NODE_WIDTH, NODE_HEIGHT)
+        title = QGraphicsTextItem(GATES[i % len(GATES)].__name__, parent)
+        title.setDefaultTextColor(TEXT_COLOR)
+        title.setFont(QFont("Arial", 10, QFont.Bold))
+        symbol = QGraphicsTextItem(SYMBOLS[i % len(SYMBOLS)], parent)
+        symbol.setDefaultTextColor(SYMBOL_COLOR)
+        symbol.setFont(QFont("Arial", 20, QFont.Bold))
+        return parent
+
+    def cachedText(i):
+        parent = QGraphicsRectItem(0, 0, NODE_WIDTH, NODE_HEIGHT)
+        TextItem(GATES[i % len(GATES)].__name__, GLYPH_CACHE.font(10), TEXT_COLOR, parent)
+        TextItem(SYMBOLS[i % len(SYMBOLS)], GLYPH_CACHE.font(20), SYMBOL_COLOR, parent)
+        return parent
+
+    print(f"{'items':<28} {'us/item':>9} {'bytes/item':>11}")
+    for name, build in (("gates", gate), ("text: QGraphicsTextItem", documentText), ("text: TextItem", cachedText)):
+        per_item, per_byte, items = measure(build, args.count)
+        print(f"{name:<28} {per_item:>9.1f} {per_byte:>11.0f}")
+        if name == "gates":
+            scene.clear()
+        del items
+        app.processEvents()
+
+    stats = GLYPH_CACHE.getStats()
+    print(f"glyph cache: {stats['pixmaps']} pixmaps, {stats['bytes']} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Benchmark repaint cost per frame for each viewport update mode.
+
+Loads the generated grid circuits of bench_load.py into an offscreen editor,
+then for every update mode drags a node in view and toggles an input in
+view, one change per frame, and reports the time spent in the view's
+paintEvent per frame and the share of the viewport repainted:
+
+    python benchmarks/bench_repaint.py
+    python benchmarks/bench_repaint.py --sizes 1000 100000 --modes full smart --no-cache
+"""
+
+import os
+import sys
+import time
+import argparse
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from PyQt5.QtWidgets import QApplication, QGraphicsItem
+
+import nodes
+from nodes import NodeEditor, InputNode, UPDATE_MODES
+from bench_load import gridCircuit
+
+
+SIZES = [1000, 10000, 100000]
+FRAMES = 60
+VIEW_WIDTH = 1280
+VIEW_HEIGHT = 800
+
+
+class TimedView(nodes.GridGraphicsView):
+    """GridGraphicsView that records the duration and area of each paint"""
+
+    def __init__(self, scene, node_editor):
+        super().__init__(scene, node_editor)
+        self.paint_seconds = 0.0
+        self.paint_area = 0
+
+    def paintEvent(self, event):
+        start = time.perf_counter()
+        super().paintEvent(event)
+        self.paint_seconds += time.perf_counter() - start
+        rect = event.region().boundingRect()
+        self.paint_area += rect.width() * rect.height()
+
+
+def shownNode(editor, node_class):
+    """Get a shown node of the given class nearest the middle of the viewport"""
+
+    center = editor.getViewRect().center()
+    candidates = [node for node in editor.node_index.values() if isinstance(node, node_class)]
+    return min(candidates, key=lambda node: (node.pos() - center).manhattanLength())
+
+
+def runFrames(app, editor, action, frames):
+    """
+    Apply an action once per frame and let the view repaint after each
+
+    Returns:
+        (paint ms per frame, frame ms, repainted share of the viewport)
+    """
+    view = editor.view
+    view.paint_seconds = 0.0
+    view.paint_area = 0
+    start = time.perf_counter()
+    for frame in range(frames):
+        action(frame)
+        app.processEvents()
+        app.processEvents()
+    elapsed = time.perf_counter() - start
+    viewport = view.viewport().width() * view.viewport().height()
+    return (1000 * view.paint_seconds / frames, 1000 * elapsed / frames,
+            view.paint_area / (viewport * frames))
+
+
+def measure(app, data, mode, frames):
+    """Load data into a fresh editor using an update mode and time dragging and toggling"""
+
+    editor = NodeEditor()
+    editor.resize(VIEW_WIDTH, VIEW_HEIGHT)
+    editor.show()
+    editor.view.setUpdateMode(mode)
+    editor.loadFromJson(data)
+    editor.view.centerOn(VIEW_WIDTH / 2, VIEW_HEIGHT / 2)
+    editor.materialize()
+    app.processEvents()
+
+    node = shownNode(editor, nodes.LogicGateNode)
+    origin = node.pos()
+
+    def drag(frame):
+        node.setPos(origin.x() + 2 * (frame % 10), origin.y() + frame % 5)
+
+    input_id = shownNode(editor, InputNode).id
+
+    def toggle(frame):
+        editor.setInputValue(input_id, not editor.model.getValue(input_id))
+
+    results = {"drag": runFrames(app, editor, drag, frames),
+               "toggle": runFrames(app, editor, toggle, frames)}
+
+    editor.hide()
+    editor.release()
+    editor.deleteLater()
+    app.processEvents()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time repaints per frame for each viewport update mode")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="Gate counts to load")
+    parser.add_argument("--modes", nargs="+", default=list(UPDATE_MODES), choices=list(UPDATE_MODES),
+                        help="Viewport update modes to compare")
+    parser.add_argument("--frames", type=int, default=FRAMES, help="Frames per action")
+    parser.add_argument("--no-cache", action="store_true", help="Disable item caching on node items")
+    args = parser.parse_args(argv)
+
+    if args.no_cache:
+        nodes.ITEM_CACHE_MODE = QGraphicsItem.NoCache
+    nodes.GridGraphicsView = TimedView
+
+    app = QApplication.instance() or QApplication(sys.argv)
+
+    print(f"{'gates':>8} {'mode':>9} {'action':>7} {'paint ms':>9} {'frame ms':>9} {'repainted':>10}")
+    for size in args.sizes:
+        data = gridCircuit(size)
+        for mode in args.modes:
+            for action, (paint, frame, share) in measure(app, data, mode, args.frames).items():
+                print(f"{size:>8} {mode:>9} {action:>7} {paint:>9.2f} {frame:>9.2f} {share:>9.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""Streaming batch simulation of test-vector files.
+
+Vectors are read in fixed-size chunks; each chunk is packed column-wise into
+Python ints (bit r of a column is row r of the chunk) and evaluated with a
+single bit-parallel pass over the netlist, so memory use does not depend on
+the length of the file.
+"""
+
+import argparse
+
+from engine import CircuitError, loadCircuit
+
+
+CHUNK_ROWS = 65536
+VALUES = frozenset(("0", "1"))
+
+
+def _splitRow(line, delimiter, packed=True):
+    """Split one vector line into its value tokens, unpacking a single run of digits if packed"""
+
+    if delimiter:
+        return [token.strip() for token in line.split(delimiter)]
+
+    tokens = line.split()
+    if packed and len(tokens) == 1 and len(tokens[0]) > 1:
+        return list(tokens[0])
+    return tokens
+
+
+def _isHeader(tokens):
+    """Check if a row names columns rather than holding values"""
+
+    return any(token.strip("01") for token in tokens)
+
+
+class VectorSimulator:
+    """Runs rows of input values through a netlist in bit-parallel chunks"""
+
+    def __init__(self, netlist, input_ids=None, output_ids=None):
+        """
+        Initialize a vector simulator
+
+        Args:
+            netlist: The compiled Netlist
+            input_ids: InputNode ids in column order; defaults to every input
+                       node in netlist order. Inputs without a column keep
+                       their stored value.
+            output_ids: Output node ids to report; defaults to every
+                        OutputNode/WriteOutputNode in netlist order
+        """
+        self.netlist = netlist
+
+        if input_ids is None:
+            self.columns = list(netlist.inputs)
+        else:
+            self.columns = [self._lookup(node_id, netlist.input_position) for node_id in input_ids]
+
+        if output_ids is None:
+            self.outputs = list(netlist.outputs)
+        else:
+            outputs = set(netlist.outputs)
+            self.outputs = [self._lookup(node_id, outputs) for node_id in output_ids]
+
+        _, self.order = netlist.getCone(self.outputs)
+        self.values = [0] * len(netlist)
+
+    def _lookup(self, node_id, allowed):
+        """Map a node id to its netlist index, checking the node kind"""
+
+        index = self.netlist.index.get(node_id)
+        if index is None or index not in allowed:
+            raise CircuitError(f"Unknown input or output node id: {node_id}")
+        return index
+
+    def getOutputIds(self):
+        """Get the node ids of the reported outputs, in column order"""
+
+        return [self.netlist.ids[index] for index in self.outputs]
+
+    def simulateChunk(self, rows, line_numbers=None):
+        """
+        Evaluate a chunk of vectors
+
+        Args:
+            rows: List of token lists, one "0"/"1" token per input column
+            line_numbers: Optional file line number of each row, used in
+                          error messages; rows are numbered from 1 otherwise
+
+        Returns:
+            List of output strings per output column; character r is "0",
+            "1" or "X" (not fully connected) for row r
+        """
+        count = len(rows)
+        if count == 0:
+            return ["" for _ in self.outputs]
+
+        netlist = self.netlist
+        mask = (1 << count) - 1
+        values = self.values
+        for node, value in zip(netlist.inputs, netlist.input_values):
+            values[node] = mask if value else 0
+
+        width = len(self.columns)
+        for position, row in enumerate(rows):
+            if len(row) != width or not VALUES.issuperset(row):
+                number = line_numbers[position] if line_numbers is not None else position + 1
+                if len(row) != width:
+                    raise CircuitError(f"line {number}: expected {width} values per vector, got {len(row)}")
+                token = next(token for token in row if token not in VALUES)
+                raise CircuitError(f"line {number}: expected 0 or 1, got {token!r}")
+
+        for position, node in enumerate(self.columns):
+            bits = "".join(row[position] for row in reversed(rows))
+            values[node] = int(bits, 2)
+
+        netlist.propagate(values, mask, self.order)
+
+        results = []
+        for node in self.outputs:
+            if netlist.defined[node]:
+                results.append(format(values[node], f"0{count}b")[::-1])
+            else:
+                results.append("X" * count)
+        return results
+
+
+def simulateVectors(netlist, in_path, out_path, chunk_rows=CHUNK_ROWS, input_ids=None, output_ids=None):
+    """
+    Stream a vector file through a circuit and write one output row per vector
+
+    The input file is CSV (when it ends in .csv) or whitespace separated
+    text; rows may also be packed digits such as "0110". An optional first
+    row of InputNode ids sets the column order. Every other row must hold
+    exactly one 0 or 1 per input column.
+
+    Args:
+        netlist: The compiled Netlist
+        in_path: Path of the vector file
+        out_path: Path of the result file; it gets a header row of output ids
+        chunk_rows: Number of vectors evaluated per pass
+        input_ids: Column order when the file has no header row
+        output_ids: Output node ids to write; defaults to every output node
+
+    Returns:
+        Number of vectors simulated
+
+    Raises:
+        CircuitError: A row has another value or a different number of
+                      values, with the line number in the message
+    """
+    in_delimiter = "," if in_path.lower().endswith(".csv") else None
+    out_delimiter = "," if out_path.lower().endswith(".csv") else " "
+
+    total = 0
+    simulator = None
+    with open(in_path, 'r') as source, open(out_path, 'w') as sink:
+        rows = []
+        numbers = []
+        for number, line in enumerate(source, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+
+            if simulator is None:
+                tokens = _splitRow(line, in_delimiter, packed=False)
+                if _isHeader(tokens):
+                    simulator = VectorSimulator(netlist, tokens, output_ids)
+                    sink.write(out_delimiter.join(simulator.getOutputIds()) + "\n")
+                    continue
+                simulator = VectorSimulator(netlist, input_ids, output_ids)
+                sink.write(out_delimiter.join(simulator.getOutputIds()) + "\n")
+
+            rows.append(_splitRow(line, in_delimiter))
+            numbers.append(number)
+            if len(rows) >= chunk_rows:
+                total += _writeChunk(simulator, rows, numbers, sink, out_delimiter)
+                rows = []
+                numbers = []
+
+        if rows:
+            total += _writeChunk(simulator, rows, numbers, sink, out_delimiter)
+
+    return total
+
+
+def _writeChunk(simulator, rows, numbers, sink, delimiter):
+    """Simulate one chunk and write its output rows"""
+
+    results = simulator.simulateChunk(rows, numbers)
+    sink.write("".join(delimiter.join(values) + "\n" for values in zip(*results)))
+    return len(rows)
+
+
+def main(argv=None):
+    """Run a vector file through a .circuit file"""
+
+    parser = argparse.ArgumentParser(description="Simulate a file of input vectors")
+    parser.add_argument("circuit", help="Path to a .circuit or .circuitb file")
+    parser.add_argument("vectors", help="CSV or text file with one input vector per line")
+    parser.add_argument("output", help="File to write the output vectors to")
+    parser.add_argument("--chunk", type=int, default=CHUNK_ROWS, help="Vectors evaluated per pass")
+    args = parser.parse_args(argv)
+
+    netlist = loadCircuit(args.circuit)
+    count = simulateVectors(netlist, args.vectors, args.output, args.chunk)
+    print(f"Simulated {count} vectors")
+
+
+if __name__ == "__main__":
+    main()
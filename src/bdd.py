@@ -0,0 +1,420 @@
+"""Reduced ordered binary decision diagrams.
+
+Nodes live in parallel arrays and are identified by integer ids; the unique
+table guarantees one id per (variable, low, high) triple, so two functions
+are equal exactly when their ids are equal. ITE results are memoized in a
+fixed-size, direct-mapped computed table that evicts on collision, and the
+total node count is capped so memory use stays bounded.
+"""
+
+import sys
+from array import array
+
+from engine import (CircuitError, compileCircuit, OP_OUTPUT, OP_AND, OP_OR, OP_NOT,
+                    OP_NAND, OP_NOR, OP_XOR, OP_XNOR)
+
+
+FALSE = 0
+TRUE = 1
+
+MAX_NODES = 2000000
+CACHE_SIZE = 1 << 18
+
+
+class BDDMemoryError(CircuitError):
+    """Raised when a BDD would grow beyond its node limit"""
+
+
+class BDD:
+    """BDD manager holding the node arrays, unique table and computed table"""
+
+    def __init__(self, var_count, max_nodes=MAX_NODES, cache_size=CACHE_SIZE):
+        """
+        Initialize a manager
+
+        Args:
+            var_count: Number of variables; variable 0 is at the top
+            max_nodes: Node limit, BDDMemoryError is raised beyond it
+            cache_size: Number of computed table slots
+        """
+        self.var_count = var_count
+        self.max_nodes = max_nodes
+
+        self.var = array('l', [var_count, var_count])
+        self.low = array('l', [FALSE, TRUE])
+        self.high = array('l', [FALSE, TRUE])
+        self.unique = {}
+
+        self.cache_size = cache_size
+        self.cache_keys = [None] * cache_size
+        self.cache_values = array('l', [0]) * cache_size
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_evictions = 0
+
+    def __len__(self):
+        return len(self.var)
+
+    def makeNode(self, var, low, high):
+        """Get the unique node for (var, low, high), applying the reduction rule"""
+
+        if low == high:
+            return low
+
+        key = (var, low, high)
+        node = self.unique.get(key)
+        if node is None:
+            node = len(self.var)
+            if node >= self.max_nodes:
+                raise BDDMemoryError(f"BDD exceeded {self.max_nodes} nodes")
+            self.var.append(var)
+            self.low.append(low)
+            self.high.append(high)
+            self.unique[key] = node
+        return node
+
+    def variable(self, var):
+        """Get the function of a single variable"""
+
+        return self.makeNode(var, FALSE, TRUE)
+
+    def ite(self, f, g, h):
+        """
+        Compute if-then-else: (f and g) or (not f and h)
+
+        The Shannon expansion runs on an explicit stack rather than by
+        recursion, so deep variable orders need no recursion limit. Each
+        stack entry is either a call (top is None) or the step that joins the
+        two cofactor results of a call, which are left on the value stack
+        low first.
+        """
+        var = self.var
+        low = self.low
+        high = self.high
+        cache_keys = self.cache_keys
+        cache_values = self.cache_values
+
+        values = []
+        tasks = [(f, g, h, None)]
+        while tasks:
+            f, g, h, top = tasks.pop()
+            if top is not None:
+                high_result = values.pop()
+                result = self.makeNode(top, values.pop(), high_result)
+                key = (f, g, h)
+                slot = hash(key) % self.cache_size
+                if cache_keys[slot] is not None:
+                    self.cache_evictions += 1
+                cache_keys[slot] = key
+                cache_values[slot] = result
+                values.append(result)
+                continue
+
+            if f == TRUE:
+                values.append(g)
+                continue
+            if f == FALSE:
+                values.append(h)
+                continue
+            if g == h:
+                values.append(g)
+                continue
+            if g == TRUE and h == FALSE:
+                values.append(f)
+                continue
+
+            key = (f, g, h)
+            slot = hash(key) % self.cache_size
+            if cache_keys[slot] == key:
+                self.cache_hits += 1
+                values.append(cache_values[slot])
+                continue
+            self.cache_misses += 1
+
+            top = min(var[f], var[g], var[h])
+            f0, f1 = (low[f], high[f]) if var[f] == top else (f, f)
+            g0, g1 = (low[g], high[g]) if var[g] == top else (g, g)
+            h0, h1 = (low[h], high[h]) if var[h] == top else (h, h)
+            tasks.append((f, g, h, top))
+            tasks.append((f1, g1, h1, None))
+            tasks.append((f0, g0, h0, None))
+        return values[0]
+
+    def negate(self, f):
+        """Get the complement of f"""
+
+        return self.ite(f, FALSE, TRUE)
+
+    def conjoin(self, f, g):
+        """Get f AND g"""
+
+        return self.ite(f, g, FALSE)
+
+    def disjoin(self, f, g):
+        """Get f OR g"""
+
+        return self.ite(f, TRUE, g)
+
+    def exclusiveOr(self, f, g):
+        """Get f XOR g"""
+
+        return self.ite(f, self.negate(g), g)
+
+    def satCount(self, f):
+        """Get the number of assignments of all variables that make f true"""
+
+        counts = {FALSE: 0, TRUE: 1}
+        var = self.var
+        stack = [f]
+        while stack:
+            node = stack[-1]
+            if node in counts:
+                stack.pop()
+                continue
+            low = self.low[node]
+            high = self.high[node]
+            if low in counts and high in counts:
+                stack.pop()
+                counts[node] = ((counts[low] << (var[low] - var[node] - 1)) +
+                                (counts[high] << (var[high] - var[node] - 1)))
+            else:
+                stack.append(low)
+                stack.append(high)
+        return counts[f] << var[f]
+
+    def satisfy(self, f):
+        """Get one satisfying assignment as a dict of variable to value, or None"""
+
+        if f == FALSE:
+            return None
+        assignment = {}
+        while f != TRUE:
+            if self.low[f] != FALSE:
+                assignment[self.var[f]] = 0
+                f = self.low[f]
+            else:
+                assignment[self.var[f]] = 1
+                f = self.high[f]
+        return assignment
+
+    def nodeCount(self, roots):
+        """Get the number of distinct nodes reachable from some functions"""
+
+        seen = set()
+        stack = list(roots)
+        while stack:
+            node = stack.pop()
+            if node in seen:
+                continue
+            seen.add(node)
+            if node > TRUE:
+                stack.append(self.low[node])
+                stack.append(self.high[node])
+        return len(seen)
+
+    def clearCache(self):
+        """Empty the computed table"""
+
+        self.cache_keys = [None] * self.cache_size
+
+    def getStats(self):
+        """Get node, table and cache statistics as a dict"""
+
+        node_bytes = len(self.var) * (self.var.itemsize * 3)
+        unique_bytes = sys.getsizeof(self.unique) + len(self.unique) * (sys.getsizeof((0, 0, 0)) + 28)
+        cache_bytes = sys.getsizeof(self.cache_keys) + self.cache_values.itemsize * self.cache_size
+        return {
+            "nodes": len(self.var),
+            "max_nodes": self.max_nodes,
+            "cache_size": self.cache_size,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "cache_evictions": self.cache_evictions,
+            "bytes": node_bytes + unique_bytes + cache_bytes
+        }
+
+
+def orderByDepthFirst(netlist, roots):
+    """Order inputs by first visit in a depth-first walk from the outputs"""
+
+    inputs, _ = netlist.getCone(roots)
+    return inputs
+
+
+def orderByFanout(netlist, roots):
+    """Order inputs by decreasing fan-out, keeping depth-first order for ties"""
+
+    inputs, _ = netlist.getCone(roots)
+    rank = {node: position for position, node in enumerate(inputs)}
+    fanout_start = netlist.fanout_start
+    return sorted(inputs, key=lambda node: (fanout_start[node] - fanout_start[node + 1], rank[node]))
+
+
+def orderByNetlist(netlist, roots):
+    """Order inputs as they appear in the circuit data"""
+
+    inputs, _ = netlist.getCone(roots)
+    used = set(inputs)
+    return [node for node in netlist.inputs if node in used]
+
+
+ORDERINGS = {
+    "dfs": orderByDepthFirst,
+    "fanout": orderByFanout,
+    "netlist": orderByNetlist
+}
+
+
+class CircuitFunctions:
+    """BDDs for the nodes of a netlist, cached per node index"""
+
+    def __init__(self, netlist, outputs=None, ordering="dfs", manager=None, inputs=None,
+                 max_nodes=MAX_NODES):
+        """
+        Build the BDD of every node in the cone of some outputs
+
+        Args:
+            netlist: The compiled Netlist
+            outputs: Node indices to build; defaults to every output node
+            ordering: Name of a variable ordering heuristic in ORDERINGS
+            manager: Optional BDD manager to share with other circuits
+            inputs: Optional explicit variable order as input node indices
+            max_nodes: Node limit for a new manager
+        """
+        self.netlist = netlist
+        self.outputs = list(netlist.outputs) if outputs is None else list(outputs)
+        if inputs is None:
+            inputs = ORDERINGS[ordering](netlist, self.outputs)
+        self.inputs = list(inputs)
+
+        if manager is None:
+            manager = BDD(len(self.inputs), max_nodes)
+        elif manager.var_count < len(self.inputs):
+            raise CircuitError("Shared BDD manager has too few variables")
+        self.manager = manager
+
+        self.functions = {}
+        self._build()
+
+    def _build(self):
+        """Build node BDDs in level order"""
+
+        netlist = self.netlist
+        manager = self.manager
+        functions = self.functions
+        ops = netlist.ops
+        fanin_start = netlist.fanin_start
+        fanin = netlist.fanin
+
+        for position, node in enumerate(self.inputs):
+            functions[node] = manager.variable(position)
+        for node in netlist.inputs:
+            if node not in functions:
+                functions[node] = TRUE if netlist.input_values[netlist.input_position[node]] else FALSE
+
+        _, order = netlist.getCone(self.outputs)
+        for node in order:
+            op = ops[node]
+            a = functions[fanin[fanin_start[node]]]
+            if op == OP_OUTPUT:
+                result = a
+            elif op == OP_NOT:
+                result = manager.negate(a)
+            else:
+                b = functions[fanin[fanin_start[node] + 1]]
+                if op == OP_AND:
+                    result = manager.conjoin(a, b)
+                elif op == OP_OR:
+                    result = manager.disjoin(a, b)
+                elif op == OP_NAND:
+                    result = manager.negate(manager.conjoin(a, b))
+                elif op == OP_NOR:
+                    result = manager.negate(manager.disjoin(a, b))
+                elif op == OP_XOR:
+                    result = manager.exclusiveOr(a, b)
+                else:
+                    result = manager.negate(manager.exclusiveOr(a, b))
+            functions[node] = result
+
+    def getFunction(self, node):
+        """Get the BDD of a node, or None if it is not fully connected"""
+
+        if not self.netlist.defined[node]:
+            return None
+        return self.functions.get(node)
+
+    def isTautology(self, node):
+        """Check if a node is 1 for every input combination"""
+
+        return self.getFunction(node) == TRUE
+
+    def isContradiction(self, node):
+        """Check if a node is 0 for every input combination"""
+
+        return self.getFunction(node) == FALSE
+
+    def isEquivalent(self, node, other):
+        """Check if two nodes compute the same function"""
+
+        function = self.getFunction(node)
+        return function is not None and function == self.getFunction(other)
+
+    def satCount(self, node):
+        """Get the number of input combinations of the cone that make a node 1"""
+
+        function = self.getFunction(node)
+        if function is None:
+            return None
+        return self.manager.satCount(function) >> (self.manager.var_count - len(self.inputs))
+
+    def getInputCount(self):
+        """Get the number of BDD variables, one per input in the cone"""
+
+        return len(self.inputs)
+
+    def getNodeCount(self):
+        """Get the number of BDD nodes used by the outputs"""
+
+        roots = [self.functions[node] for node in self.outputs if node in self.functions]
+        return self.manager.nodeCount(roots)
+
+
+def buildFunctions(data, ordering="dfs", max_nodes=MAX_NODES):
+    """Compile circuit data and build the BDD of each output"""
+
+    return CircuitFunctions(compileCircuit(data), ordering=ordering, max_nodes=max_nodes)
+
+
+def circuitsEquivalent(data, other, max_nodes=MAX_NODES):
+    """
+    Check if two circuits compute the same outputs
+
+    Inputs are matched by id, or by depth-first order when the ids differ;
+    outputs are matched by order.
+
+    Returns:
+        True if every output pair has the same BDD; False if an output is
+        not fully connected in either circuit
+    """
+    netlist = compileCircuit(data)
+    other_netlist = compileCircuit(other)
+    if len(netlist.outputs) != len(other_netlist.outputs):
+        return False
+
+    inputs = orderByDepthFirst(netlist, list(netlist.outputs))
+    ids = [netlist.ids[node] for node in inputs]
+    if all(node_id in other_netlist.index for node_id in ids):
+        other_inputs = [other_netlist.index[node_id] for node_id in ids]
+    else:
+        other_inputs = orderByDepthFirst(other_netlist, list(other_netlist.outputs))
+        if len(other_inputs) != len(inputs):
+            return False
+
+    manager = BDD(len(inputs), max_nodes)
+    functions = CircuitFunctions(netlist, manager=manager, inputs=inputs)
+    other_functions = CircuitFunctions(other_netlist, manager=manager, inputs=other_inputs)
+    for a, b in zip(netlist.outputs, other_netlist.outputs):
+        function = functions.getFunction(a)
+        if function is None or function != other_functions.getFunction(b):
+            return False
+    return True
@@ -0,0 +1,549 @@
+"""Compact binary circuit files.
+
+A .circuitb file holds the same circuit as a JSON .circuit file, laid out as
+flat little-endian arrays so it can be memory-mapped and read without
+parsing:
+
+    header          magic, version, node, edge and string counts
+    string table    uint32 offsets (string_count + 1) and the UTF-8 bytes
+    node ids        uint32 string index per node
+    node types      uint8 type code per node
+    node flags      uint8 per node, bit 0 is an InputNode's value
+    positions       float32 x, y per node
+    edges           uint32 source, uint32 dest, uint8 source socket and
+                    uint8 dest socket, each as its own array
+
+Every section starts on a 4-byte boundary. Connections refer to nodes by
+index, so each UUID is stored once.
+"""
+
+import re
+import sys
+import json
+import codecs
+import mmap
+import struct
+import argparse
+from array import array
+
+from engine import (CircuitError, Netlist, NODE_OPCODES, OPCODE_ARITY, OP_OUTPUT, UNCONNECTED)
+
+
+MAGIC = b"LGSC"
+VERSION = 1
+HEADER = struct.Struct("<4sHHIIII")
+
+BINARY_EXTENSION = ".circuitb"
+
+TYPE_NAMES = [
+    "InputNode", "OutputNode", "WriteOutputNode", "AndNode", "OrNode",
+    "NotNode", "NandNode", "NorNode", "XorNode", "XnorNode"
+]
+TYPE_CODES = {name: code for code, name in enumerate(TYPE_NAMES)}
+
+FLAG_VALUE = 1
+MAX_SOCKET = 255
+PROGRESS_RECORDS = 4096
+
+
+class WriteCancelled(CircuitError):
+    """Raised when a progress callback stops a write"""
+
+
+def _report(progress, done, total):
+    """Pass write progress to a callback, raising WriteCancelled if it returns False"""
+
+    if progress is not None and progress(done, total) is False:
+        raise WriteCancelled("Write cancelled")
+
+
+def isBinaryPath(path):
+    """Check if a path names a binary circuit file"""
+
+    return path.lower().endswith(BINARY_EXTENSION)
+
+
+def _padding(size):
+    return -size % 4
+
+
+def _layout(node_count, edge_count, string_count, string_bytes):
+    """Get the offset of each section for the given counts"""
+
+    offsets = {}
+    offset = HEADER.size
+    for name, size in (("string_offsets", 4 * (string_count + 1)),
+                       ("strings", string_bytes),
+                       ("ids", 4 * node_count),
+                       ("types", node_count),
+                       ("flags", node_count),
+                       ("positions", 8 * node_count),
+                       ("sources", 4 * edge_count),
+                       ("dests", 4 * edge_count),
+                       ("source_sockets", edge_count),
+                       ("dest_sockets", edge_count)):
+        offsets[name] = (offset, size)
+        offset += size + _padding(size)
+    return offsets, offset
+
+
+def _littleEndian(values):
+    """Get the bytes of an array in little-endian order"""
+
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def writeBinary(data, path, progress=None):
+    """
+    Write circuit data to a binary circuit file
+
+    Args:
+        data: Dict with "nodes" and "connections" lists, as produced by
+              NodeEditor.saveToJson
+        path: Path of the file to write
+        progress: Optional callable (records done, total records); if it
+                  returns False, WriteCancelled is raised before the file
+                  is opened
+    """
+    total = len(data.get("nodes", [])) + len(data.get("connections", []))
+    done = 0
+    strings = []
+    string_index = {}
+    ids = array('I')
+    types = array('B')
+    flags = array('B')
+    positions = array('f')
+    node_index = {}
+
+    for node_data in data.get("nodes", []):
+        done += 1
+        if done % PROGRESS_RECORDS == 0:
+            _report(progress, done, total)
+        code = TYPE_CODES.get(node_data.get("type"))
+        if code is None:
+            raise CircuitError(f"Unknown node type: {node_data.get('type')}")
+
+        node_id = str(node_data.get("id"))
+        if node_id not in string_index:
+            string_index[node_id] = len(strings)
+            strings.append(node_id)
+        node_index[node_id] = len(types)
+        ids.append(string_index[node_id])
+        types.append(code)
+        flags.append(FLAG_VALUE if node_data.get("value", "0") in ("1", 1, True) else 0)
+        positions.append(node_data.get("pos_x", 0))
+        positions.append(node_data.get("pos_y", 0))
+
+    sources = array('I')
+    dests = array('I')
+    source_sockets = array('B')
+    dest_sockets = array('B')
+    for conn_data in data.get("connections", []):
+        done += 1
+        if done % PROGRESS_RECORDS == 0:
+            _report(progress, done, total)
+        source = node_index.get(conn_data.get("source_node"))
+        dest = node_index.get(conn_data.get("dest_node"))
+        if source is None or dest is None:
+            continue
+        source_socket = conn_data.get("source_socket", 0)
+        dest_socket = conn_data.get("dest_socket", 0)
+        for socket in (source_socket, dest_socket):
+            if not isinstance(socket, int) or not 0 <= socket <= MAX_SOCKET:
+                raise CircuitError(f"Socket index {socket!r} of connection {conn_data.get('source_node')} -> "
+                                   f"{conn_data.get('dest_node')} does not fit the binary format "
+                                   f"(0 to {MAX_SOCKET}); save as .circuit instead")
+        sources.append(source)
+        dests.append(dest)
+        source_sockets.append(source_socket)
+        dest_sockets.append(dest_socket)
+
+    encoded = [string.encode("utf-8") for string in strings]
+    string_offsets = array('I', [0])
+    for blob in encoded:
+        string_offsets.append(string_offsets[-1] + len(blob))
+
+    _report(progress, total, total)
+    sections = [
+        _littleEndian(string_offsets), b"".join(encoded), _littleEndian(ids), types.tobytes(),
+        flags.tobytes(), _littleEndian(positions), _littleEndian(sources), _littleEndian(dests),
+        source_sockets.tobytes(), dest_sockets.tobytes()
+    ]
+
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0, len(types), len(sources), len(strings), string_offsets[-1]))
+        for section in sections:
+            f.write(section)
+            f.write(b"\0" * _padding(len(section)))
+
+
+class CircuitFile:
+    """A memory-mapped binary circuit file
+
+    The node and edge arrays are memoryviews straight into the mapping, so
+    opening a file costs no parsing or copying. Call close(), or use the
+    object as a context manager, to release the mapping.
+    """
+
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.file.close()
+            raise CircuitError(f"{path} is not a binary circuit file")
+
+        if len(self.map) < HEADER.size:
+            self.close()
+            raise CircuitError(f"{path} is not a binary circuit file")
+
+        magic, version, _, node_count, edge_count, string_count, string_bytes = HEADER.unpack_from(self.map)
+        if magic != MAGIC:
+            self.close()
+            raise CircuitError(f"{path} is not a binary circuit file")
+        if version > VERSION:
+            self.close()
+            raise CircuitError(f"{path} uses format version {version}, newer than {VERSION}")
+
+        offsets, size = _layout(node_count, edge_count, string_count, string_bytes)
+        if len(self.map) < size:
+            self.close()
+            raise CircuitError(f"{path} is truncated")
+
+        self.node_count = node_count
+        self.edge_count = edge_count
+        self.string_count = string_count
+
+        self.buffer = memoryview(self.map)
+        self.views = []
+        self.string_offsets = self._section(offsets, "string_offsets", 'I')
+        self.strings = self._section(offsets, "strings", 'B')
+        self.ids = self._section(offsets, "ids", 'I')
+        self.types = self._section(offsets, "types", 'B')
+        self.flags = self._section(offsets, "flags", 'B')
+        self.positions = self._section(offsets, "positions", 'f')
+        self.sources = self._section(offsets, "sources", 'I')
+        self.dests = self._section(offsets, "dests", 'I')
+        self.source_sockets = self._section(offsets, "source_sockets", 'B')
+        self.dest_sockets = self._section(offsets, "dest_sockets", 'B')
+
+    def _section(self, offsets, name, typecode):
+        """Get a typed view of one section"""
+
+        offset, size = offsets[name]
+        view = self.buffer[offset:offset + size].cast(typecode)
+        if sys.byteorder != "little" and view.itemsize > 1:
+            swapped = array(typecode, view)
+            swapped.byteswap()
+            view.release()
+            return swapped
+        self.views.append(view)
+        return view
+
+    def close(self):
+        """Release the views and the mapping"""
+
+        for view in getattr(self, "views", []):
+            view.release()
+        self.views = []
+        if getattr(self, "buffer", None) is not None:
+            self.buffer.release()
+            self.buffer = None
+        if getattr(self, "map", None) is not None:
+            self.map.close()
+            self.map = None
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.node_count
+
+    def getString(self, index):
+        """Decode one entry of the string table"""
+
+        return bytes(self.strings[self.string_offsets[index]:self.string_offsets[index + 1]]).decode("utf-8")
+
+    def getNodeId(self, node):
+        return self.getString(self.ids[node])
+
+    def getNodeData(self, node):
+        """Get one node as the dict NodeEditor.loadFromJson expects"""
+
+        type_name = TYPE_NAMES[self.types[node]]
+        node_data = {
+            "id": self.getNodeId(node),
+            "type": type_name,
+            "pos_x": self.positions[2 * node],
+            "pos_y": self.positions[2 * node + 1]
+        }
+        if type_name == "InputNode":
+            node_data["value"] = "1" if self.flags[node] & FLAG_VALUE else "0"
+        return node_data
+
+    def iterNodes(self):
+        """Yield each node's dict in file order"""
+
+        for node in range(self.node_count):
+            yield self.getNodeData(node)
+
+    def iterConnections(self):
+        """Yield each connection's dict in file order"""
+
+        ids = [self.getNodeId(node) for node in range(self.node_count)]
+        for edge in range(self.edge_count):
+            yield {
+                "source_node": ids[self.sources[edge]],
+                "source_socket": self.source_sockets[edge],
+                "dest_node": ids[self.dests[edge]],
+                "dest_socket": self.dest_sockets[edge]
+            }
+
+    def toJson(self):
+        """Get the whole circuit as saveToJson data"""
+
+        return {"nodes": list(self.iterNodes()), "connections": list(self.iterConnections())}
+
+    def getNetlist(self):
+        """
+        Compile the circuit straight from the mapped arrays
+
+        Applies the same rules as engine.compileCircuit without building the
+        intermediate dicts.
+
+        Returns:
+            The compiled Netlist
+        """
+        node_count = self.node_count
+        opcodes = [NODE_OPCODES[name] for name in TYPE_NAMES]
+        ops = [opcodes[code] for code in self.types]
+        values = [flag & FLAG_VALUE for flag in self.flags]
+        ids = [self.getNodeId(node) for node in range(node_count)]
+
+        fanin_start = [0] * (node_count + 1)
+        for i, op in enumerate(ops):
+            fanin_start[i + 1] = fanin_start[i] + OPCODE_ARITY[op]
+        fanin = [UNCONNECTED] * fanin_start[-1]
+
+        for source, dest, source_socket, dest_socket in zip(self.sources, self.dests,
+                                                             self.source_sockets, self.dest_sockets):
+            if source >= node_count or dest >= node_count:
+                continue
+            if ops[source] == OP_OUTPUT or source_socket != 0:
+                continue
+            if dest_socket >= OPCODE_ARITY[ops[dest]]:
+                continue
+            fanin[fanin_start[dest] + dest_socket] = source
+
+        return Netlist(ids, ops, fanin_start, fanin, values)
+
+
+READ_SIZE = 1 << 16
+WHITESPACE = re.compile(r"[ \t\r\n]*")
+
+
+class JsonRecordStream:
+    """Incremental reader for the node and connection records of a JSON circuit
+
+    The file is read in blocks and each array element is decoded on its own,
+    so only one record and one block are held in memory at a time.
+    """
+
+    def __init__(self, f, read_size=READ_SIZE):
+        """
+        Args:
+            f: File object opened in binary mode
+            read_size: Bytes read per block
+        """
+        self.file = f
+        self.read_size = read_size
+        self.decoder = json.JSONDecoder()
+        self.utf8 = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.pos = 0
+        self.bytes_read = 0
+        self.eof = False
+
+    def _fill(self):
+        """Read another block; return False at the end of the file"""
+
+        if self.eof:
+            return False
+        block = self.file.read(self.read_size)
+        self.bytes_read += len(block)
+        if not block:
+            self.eof = True
+        if self.pos > len(self.buffer) // 2:
+            self.buffer = self.buffer[self.pos:]
+            self.pos = 0
+        self.buffer += self.utf8.decode(block, final=not block)
+        return True
+
+    def _peek(self):
+        """Get the next non-whitespace character without consuming it, or "" at the end"""
+
+        while True:
+            self.pos = WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ""
+
+    def _expect(self, chars):
+        char = self._peek()
+        if char == "" or char not in chars:
+            raise CircuitError(f"Malformed circuit file: expected {chars!r} near byte {self.bytes_read}")
+        self.pos += 1
+        return char
+
+    def _value(self):
+        """Decode the next complete JSON value, reading more blocks as needed"""
+
+        self._peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise CircuitError("Malformed circuit file: unexpected end of data")
+                continue
+            if end == len(self.buffer) and not self.eof:
+                # A number may continue in the next block
+                self._fill()
+                continue
+            self.pos = end
+            return value
+
+    def __iter__(self):
+        """Yield ("node" or "connection", record) pairs in file order"""
+
+        self._expect("{")
+        if self._peek() == "}":
+            return
+        while True:
+            key = self._value()
+            self._expect(":")
+            kind = {"nodes": "node", "connections": "connection"}.get(key)
+            if kind is not None and self._peek() == "[":
+                self.pos += 1
+                if self._peek() == "]":
+                    self.pos += 1
+                else:
+                    while True:
+                        yield kind, self._value()
+                        if self._expect(",]") == "]":
+                            break
+            else:
+                self._value()
+            if self._expect(",}") == "}":
+                return
+
+
+def iterCircuitRecords(path):
+    """
+    Read a JSON or binary circuit file record by record
+
+    Yields:
+        Tuples of ("node" or "connection", record dict, bytes read so far)
+    """
+    if isBinaryPath(path):
+        with CircuitFile(path) as circuit:
+            size = len(circuit.map)
+            total = max(1, circuit.node_count + circuit.edge_count)
+            done = 0
+            for node_data in circuit.iterNodes():
+                done += 1
+                yield "node", node_data, size * done // total
+            for conn_data in circuit.iterConnections():
+                done += 1
+                yield "connection", conn_data, size * done // total
+        return
+
+    with open(path, 'rb') as f:
+        stream = JsonRecordStream(f)
+        for kind, record in stream:
+            yield kind, record, stream.bytes_read
+
+
+def readCircuit(path):
+    """Read a JSON or binary circuit file as saveToJson data, by extension"""
+
+    if isBinaryPath(path):
+        with CircuitFile(path) as circuit:
+            return circuit.toJson()
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def writeJson(data, path, progress=None):
+    """
+    Write circuit data as an indented JSON circuit file
+
+    The output is the same as json.dump(data, f, indent=4), but lists are
+    written in chunks of PROGRESS_RECORDS so progress can be reported.
+
+    Args:
+        data: Dict as produced by NodeEditor.saveToJson
+        path: Path of the file to write
+        progress: Optional callable (records done, total records); if it
+                  returns False, WriteCancelled is raised
+    """
+    total = sum(len(value) for value in data.values() if isinstance(value, list))
+    done = 0
+    with open(path, 'w') as f:
+        f.write("{")
+        for position, (name, value) in enumerate(data.items()):
+            f.write(("," if position else "") + "\n    " + json.dumps(name) + ": ")
+            if not isinstance(value, list) or not value:
+                f.write(json.dumps(value, indent=4).replace("\n", "\n    "))
+                continue
+            f.write("[")
+            for start in range(0, len(value), PROGRESS_RECORDS):
+                chunk = value[start:start + PROGRESS_RECORDS]
+                # Drop the brackets of the chunk's own list and indent it one level deeper
+                text = json.dumps(chunk, indent=4)[1:-2].replace("\n", "\n    ")
+                f.write(("," if start else "") + text)
+                done += len(chunk)
+                _report(progress, done, total)
+            f.write("\n    ]")
+        f.write("\n}" if data else "}")
+    _report(progress, total, total)
+
+
+def writeCircuit(data, path, progress=None):
+    """
+    Write saveToJson data as a JSON or binary circuit file, by extension
+
+    Args:
+        data: Circuit data
+        path: Path of the file to write
+        progress: Optional callable (records done, total records); if it
+                  returns False, the write stops with WriteCancelled and
+                  the file may be incomplete
+    """
+    if isBinaryPath(path):
+        writeBinary(data, path, progress)
+    else:
+        writeJson(data, path, progress)
+
+
+def main(argv=None):
+    """Convert between JSON and binary circuit files"""
+
+    parser = argparse.ArgumentParser(description="Convert a circuit between .circuit (JSON) and .circuitb (binary)")
+    parser.add_argument("source", help="Circuit file to read")
+    parser.add_argument("target", help="Circuit file to write; the format follows the extension")
+    args = parser.parse_args(argv)
+
+    writeCircuit(readCircuit(args.source), args.target)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,553 @@
+"""Headless circuit engine.
+
+Compiles circuit data (the dict produced by NodeEditor.saveToJson or stored in
+a .circuit file) into a levelized netlist of integer node indices, gate
+opcodes and fan-in arrays, and evaluates it without importing PyQt5.
+"""
+
+import json
+import heapq
+from array import array
+
+
+OP_INPUT = 0
+OP_OUTPUT = 1
+OP_AND = 2
+OP_OR = 3
+OP_NOT = 4
+OP_NAND = 5
+OP_NOR = 6
+OP_XOR = 7
+OP_XNOR = 8
+
+NODE_OPCODES = {
+    "InputNode": OP_INPUT,
+    "OutputNode": OP_OUTPUT,
+    "WriteOutputNode": OP_OUTPUT,
+    "AndNode": OP_AND,
+    "OrNode": OP_OR,
+    "NotNode": OP_NOT,
+    "NandNode": OP_NAND,
+    "NorNode": OP_NOR,
+    "XorNode": OP_XOR,
+    "XnorNode": OP_XNOR
+}
+
+OPCODE_ARITY = {
+    OP_INPUT: 0,
+    OP_OUTPUT: 1,
+    OP_AND: 2,
+    OP_OR: 2,
+    OP_NOT: 1,
+    OP_NAND: 2,
+    OP_NOR: 2,
+    OP_XOR: 2,
+    OP_XNOR: 2
+}
+
+UNCONNECTED = -1
+
+
+class CircuitError(Exception):
+    """Raised when circuit data cannot be compiled or simulated"""
+
+
+class Netlist:
+    """Levelized, index-based form of a circuit
+
+    Nodes are numbered 0..n-1 in the order they appear in the circuit data.
+    The fan-in of node i is fanin[fanin_start[i]:fanin_start[i + 1]], one
+    entry per input socket holding the source node index or UNCONNECTED.
+    Fan-out uses the same compressed layout. Every node only has a single
+    output socket, so edges do not need to record the source socket.
+
+    A node is "defined" when all of its input sockets are connected to
+    defined nodes and it is not part of a cycle; undefined nodes evaluate to
+    None, matching what the GUI shows for partially wired gates.
+    """
+
+    def __init__(self, ids, ops, fanin_start, fanin, input_values=None):
+        """
+        Build a netlist from raw arrays and levelize it
+
+        Args:
+            ids: Node id strings, indexed by node number
+            ops: Opcode per node
+            fanin_start: Offsets into fanin, length len(ids) + 1
+            fanin: Source node index per input socket, or UNCONNECTED
+            input_values: Optional initial value per node (only read for inputs)
+        """
+        self.ids = list(ids)
+        self.index = {node_id: i for i, node_id in enumerate(self.ids)}
+        self.ops = array('B', ops)
+        self.fanin_start = array('l', fanin_start)
+        self.fanin = array('l', fanin)
+
+        count = len(self.ids)
+        self.inputs = array('l', (i for i in range(count) if self.ops[i] == OP_INPUT))
+        self.outputs = array('l', (i for i in range(count) if self.ops[i] == OP_OUTPUT))
+        self.input_position = {node: position for position, node in enumerate(self.inputs)}
+
+        if input_values is None:
+            self.input_values = [0] * len(self.inputs)
+        else:
+            self.input_values = [1 if input_values[i] else 0 for i in self.inputs]
+
+        self._buildFanout()
+        self._levelize()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _buildFanout(self):
+        """Build the compressed fan-out arrays from the fan-in arrays"""
+
+        count = len(self.ids)
+        degree = [0] * (count + 1)
+        for source in self.fanin:
+            if source != UNCONNECTED:
+                degree[source + 1] += 1
+
+        for i in range(count):
+            degree[i + 1] += degree[i]
+
+        fanout = array('l', [0]) * degree[count]
+        cursor = degree[:count]
+        fanin_start = self.fanin_start
+        fanin = self.fanin
+        for dest in range(count):
+            for k in range(fanin_start[dest], fanin_start[dest + 1]):
+                source = fanin[k]
+                if source != UNCONNECTED:
+                    fanout[cursor[source]] = dest
+                    cursor[source] += 1
+
+        self.fanout_start = array('l', degree)
+        self.fanout = fanout
+
+    def _levelize(self):
+        """Assign topological levels and work out which nodes are defined"""
+
+        count = len(self.ids)
+        fanin_start = self.fanin_start
+        fanin = self.fanin
+        fanout_start = self.fanout_start
+        fanout = self.fanout
+
+        pending = [0] * count
+        broken = bytearray(count)
+        for i in range(count):
+            for k in range(fanin_start[i], fanin_start[i + 1]):
+                if fanin[k] == UNCONNECTED:
+                    broken[i] = 1
+                else:
+                    pending[i] += 1
+
+        level = array('l', [0]) * count
+        ready = [i for i in range(count) if pending[i] == 0]
+        visited = 0
+        while ready:
+            node = ready.pop()
+            visited += 1
+            next_level = level[node] + 1
+            for k in range(fanout_start[node], fanout_start[node + 1]):
+                dest = fanout[k]
+                if broken[node]:
+                    broken[dest] = 1
+                if level[dest] < next_level:
+                    level[dest] = next_level
+                pending[dest] -= 1
+                if pending[dest] == 0:
+                    ready.append(dest)
+
+        defined = bytearray(count)
+        for i in range(count):
+            if pending[i] == 0 and not broken[i]:
+                defined[i] = 1
+            else:
+                level[i] = -1
+
+        self.cyclic = count - visited
+        self.level = level
+        self.defined = defined
+        self.depth = max(level) if count else 0
+
+        buckets = [[] for _ in range(self.depth + 1)]
+        for i in range(count):
+            if defined[i] and self.ops[i] != OP_INPUT:
+                buckets[level[i]].append(i)
+        self.order = array('l', (i for bucket in buckets for i in bucket))
+
+    def getFanin(self, node):
+        """Get the source node indices feeding a node"""
+
+        return self.fanin[self.fanin_start[node]:self.fanin_start[node + 1]]
+
+    def getFanout(self, node):
+        """Get the node indices fed by a node"""
+
+        return self.fanout[self.fanout_start[node]:self.fanout_start[node + 1]]
+
+    def getGateCount(self):
+        """Get the number of logic gates, excluding input and output nodes"""
+
+        return sum(1 for op in self.ops if op != OP_INPUT and op != OP_OUTPUT)
+
+    def getCone(self, roots):
+        """
+        Get the transitive fan-in of some nodes
+
+        Args:
+            roots: Node indices to start from
+
+        Returns:
+            Tuple of (input nodes in depth-first first-visit order following
+            socket order, defined non-input nodes of the cone in level order)
+        """
+        ops = self.ops
+        fanin_start = self.fanin_start
+        fanin = self.fanin
+
+        seen = set()
+        inputs = []
+        stack = list(reversed(roots))
+        while stack:
+            node = stack.pop()
+            if node == UNCONNECTED or node in seen:
+                continue
+            seen.add(node)
+            if ops[node] == OP_INPUT:
+                inputs.append(node)
+                continue
+            for k in range(fanin_start[node + 1] - 1, fanin_start[node] - 1, -1):
+                stack.append(fanin[k])
+
+        order = array('l', (node for node in self.order if node in seen))
+        return inputs, order
+
+    def propagate(self, values, mask=1, order=None):
+        """
+        Evaluate every defined gate in level order
+
+        Values are plain ints, so the same pass evaluates a single vector
+        (mask=1) or many vectors packed into the bits of each word.
+
+        Args:
+            values: List indexed by node with the input node words filled in;
+                    gate entries are overwritten
+            mask: All-ones word of the simulated width
+            order: Optional subset of self.order to evaluate, e.g. a cone
+
+        Returns:
+            The values list
+        """
+        ops = self.ops
+        fanin_start = self.fanin_start
+        fanin = self.fanin
+        if order is None:
+            order = self.order
+
+        for node in order:
+            op = ops[node]
+            start = fanin_start[node]
+            a = values[fanin[start]]
+            if op == OP_OUTPUT:
+                values[node] = a
+            elif op == OP_NOT:
+                values[node] = a ^ mask
+            else:
+                b = values[fanin[start + 1]]
+                if op == OP_AND:
+                    values[node] = a & b
+                elif op == OP_OR:
+                    values[node] = a | b
+                elif op == OP_NAND:
+                    values[node] = (a & b) ^ mask
+                elif op == OP_NOR:
+                    values[node] = (a | b) ^ mask
+                elif op == OP_XOR:
+                    values[node] = a ^ b
+                else:
+                    values[node] = a ^ b ^ mask
+        return values
+
+    def evaluate(self, input_values=None):
+        """
+        Evaluate the circuit for one input vector
+
+        Args:
+            input_values: Values for the input nodes, in the order of
+                          self.inputs; defaults to the values stored in the
+                          circuit data
+
+        Returns:
+            List indexed by node of True, False or None (undefined)
+        """
+        if input_values is None:
+            input_values = self.input_values
+        if len(input_values) != len(self.inputs):
+            raise CircuitError(f"Expected {len(self.inputs)} input values, got {len(input_values)}")
+
+        values = [0] * len(self.ids)
+        for node, value in zip(self.inputs, input_values):
+            values[node] = 1 if value else 0
+        self.propagate(values)
+
+        defined = self.defined
+        return [bool(value) if defined[i] else None for i, value in enumerate(values)]
+
+
+def inputLabel(position):
+    """Get the display label for the input at a position: A..Z, then Input_N"""
+
+    if position < 26:
+        return chr(65 + position)
+    return f"Input_{position + 1}"
+
+
+def evaluateGate(op, a, b=0, mask=1):
+    """
+    Evaluate a single gate opcode on packed input words
+
+    Args:
+        op: Gate opcode
+        a: First input word
+        b: Second input word (ignored for single-input opcodes)
+        mask: All-ones word of the simulated width
+
+    Returns:
+        The output word
+    """
+    if op == OP_OUTPUT:
+        return a
+    if op == OP_NOT:
+        return a ^ mask
+    if op == OP_AND:
+        return a & b
+    if op == OP_OR:
+        return a | b
+    if op == OP_NAND:
+        return (a & b) ^ mask
+    if op == OP_NOR:
+        return (a | b) ^ mask
+    if op == OP_XOR:
+        return a ^ b
+    if op == OP_XNOR:
+        return a ^ b ^ mask
+    raise CircuitError(f"Opcode {op} is not a gate")
+
+
+class Simulator:
+    """Evaluates a netlist and memoizes node values between input changes
+
+    Every change to an input starts a new evaluation epoch. The first read
+    evaluates the whole netlist; after that, input changes are propagated
+    event-driven: gates are scheduled in topological level order and only
+    re-evaluated when one of their inputs changed, and propagation stops at
+    any gate whose output did not change.
+    """
+
+    def __init__(self, netlist, input_values=None):
+        """
+        Initialize a simulator
+
+        Args:
+            netlist: The compiled Netlist
+            input_values: Values for the input nodes, in the order of
+                          netlist.inputs; defaults to the stored values
+        """
+        self.netlist = netlist
+        if input_values is None:
+            input_values = netlist.input_values
+        self.input_values = [1 if value else 0 for value in input_values]
+
+        self.values = [0] * len(netlist)
+        self.epoch = 0
+        self.values_epoch = -1
+
+        self.updates = 0
+        self.gate_evaluations = 0
+        self.last_update_evaluations = 0
+        self.cache_hits = 0
+
+    def setInput(self, node, value):
+        """
+        Set the value of an input node and propagate the change
+
+        Args:
+            node: Netlist index of the input node
+            value: New boolean value
+
+        Returns:
+            List of node indices whose value changed, starting with the
+            input itself; empty if the value did not change
+        """
+        position = self.netlist.input_position[node]
+        value = 1 if value else 0
+        if self.input_values[position] == value:
+            return []
+
+        if self.values_epoch != self.epoch:
+            self._evaluate()
+
+        self.input_values[position] = value
+        self.values[node] = value
+        self.epoch += 1
+        changed = self._propagateFrom(node)
+        self.values_epoch = self.epoch
+        return changed
+
+    def _propagateFrom(self, source):
+        """Re-evaluate the fan-out of a changed node in level order"""
+
+        netlist = self.netlist
+        ops = netlist.ops
+        level = netlist.level
+        defined = netlist.defined
+        fanin_start = netlist.fanin_start
+        fanin = netlist.fanin
+        fanout_start = netlist.fanout_start
+        fanout = netlist.fanout
+        values = self.values
+
+        changed = [source]
+        scheduled = set()
+        queue = []
+        for k in range(fanout_start[source], fanout_start[source + 1]):
+            dest = fanout[k]
+            if defined[dest] and dest not in scheduled:
+                scheduled.add(dest)
+                heapq.heappush(queue, (level[dest], dest))
+
+        evaluations = 0
+        while queue:
+            _, node = heapq.heappop(queue)
+            evaluations += 1
+
+            op = ops[node]
+            start = fanin_start[node]
+            if op == OP_OUTPUT or op == OP_NOT:
+                value = evaluateGate(op, values[fanin[start]])
+            else:
+                value = evaluateGate(op, values[fanin[start]], values[fanin[start + 1]])
+
+            if value == values[node]:
+                continue
+
+            values[node] = value
+            changed.append(node)
+            for k in range(fanout_start[node], fanout_start[node + 1]):
+                dest = fanout[k]
+                if defined[dest] and dest not in scheduled:
+                    scheduled.add(dest)
+                    heapq.heappush(queue, (level[dest], dest))
+
+        self.updates += 1
+        self.last_update_evaluations = evaluations
+        self.gate_evaluations += evaluations
+        return changed
+
+    def getValues(self):
+        """Get the raw value list for the current epoch, evaluating if needed"""
+
+        if self.values_epoch != self.epoch:
+            self._evaluate()
+        else:
+            self.cache_hits += 1
+        return self.values
+
+    def getValue(self, node):
+        """Get the value of a node as True, False or None"""
+
+        values = self.getValues()
+        if not self.netlist.defined[node]:
+            return None
+        return bool(values[node])
+
+    def _evaluate(self):
+        """Re-evaluate every gate for the current inputs"""
+
+        netlist = self.netlist
+        values = self.values
+        for node, value in zip(netlist.inputs, self.input_values):
+            values[node] = value
+        netlist.propagate(values)
+
+        self.values_epoch = self.epoch
+        self.updates += 1
+        self.last_update_evaluations = len(netlist.order)
+        self.gate_evaluations += self.last_update_evaluations
+
+    def getStats(self):
+        """Get evaluation counters as a dict"""
+
+        return {
+            "epoch": self.epoch,
+            "updates": self.updates,
+            "gate_evaluations": self.gate_evaluations,
+            "last_update_evaluations": self.last_update_evaluations,
+            "cache_hits": self.cache_hits
+        }
+
+
+def compileCircuit(data):
+    """
+    Compile circuit data into a Netlist
+
+    Args:
+        data: Dict with "nodes" and "connections" lists, as produced by
+              NodeEditor.saveToJson
+
+    Returns:
+        The compiled Netlist
+    """
+    ids = []
+    ops = []
+    values = []
+    index = {}
+
+    for node_data in data.get("nodes", []):
+        op = NODE_OPCODES.get(node_data.get("type"))
+        if op is None:
+            continue
+        node_id = node_data.get("id")
+        index[node_id] = len(ids)
+        ids.append(node_id)
+        ops.append(op)
+        values.append(node_data.get("value", "0") in ("1", 1, True))
+
+    fanin_start = [0] * (len(ids) + 1)
+    for i, op in enumerate(ops):
+        fanin_start[i + 1] = fanin_start[i] + OPCODE_ARITY[op]
+    fanin = [UNCONNECTED] * fanin_start[-1]
+
+    for conn_data in data.get("connections", []):
+        source = index.get(conn_data.get("source_node"))
+        dest = index.get(conn_data.get("dest_node"))
+        if source is None or dest is None:
+            continue
+
+        source_socket = conn_data.get("source_socket", 0)
+        dest_socket = conn_data.get("dest_socket", 0)
+        if ops[source] == OP_OUTPUT or source_socket != 0:
+            continue
+        if not 0 <= dest_socket < OPCODE_ARITY[ops[dest]]:
+            continue
+
+        fanin[fanin_start[dest] + dest_socket] = source
+
+    return Netlist(ids, ops, fanin_start, fanin, values)
+
+
+def loadCircuit(path):
+    """Load and compile a .circuit (JSON) or .circuitb (binary) file"""
+
+    if path.lower().endswith(".circuitb"):
+        # Imported here because circuitfile builds on this module
+        from circuitfile import CircuitFile
+        with CircuitFile(path) as circuit:
+            return circuit.getNetlist()
+
+    with open(path, 'r') as f:
+        data = json.load(f)
+    return compileCircuit(data)
@@ -0,0 +1,254 @@
+"""Logic equation derivation over a hash-consed expression DAG.
+
+Every gate in the cone of an output becomes an expression node; identical
+(operator, operands) pairs are stored once, so shared logic is derived
+once. Subexpressions used more than once are named (t1 = A * B) and
+referenced by name, which keeps the rendered equation linear in the size of
+the circuit.
+"""
+
+from engine import (UNCONNECTED, OP_INPUT, OP_OUTPUT, OP_AND, OP_OR, OP_NOT, OP_NAND,
+                    OP_NOR, OP_XOR, OP_XNOR, inputLabel)
+
+
+VAR = "var"
+CONST = "const"
+CYCLE = "cycle"
+AND = "*"
+OR = "+"
+XOR = "^"
+NOT = "!"
+NAND = "!*"
+NOR = "!+"
+XNOR = "!^"
+
+INFIX = {AND: " * ", OR: " + ", XOR: " ^ ", NAND: " * ", NOR: " + ", XNOR: " ^ "}
+
+
+class Equation:
+    """Rendered equation: named shared subterms plus the output expression"""
+
+    def __init__(self, expression, definitions, labels):
+        """
+        Args:
+            expression: Text of the output expression
+            definitions: List of (name, text) for shared subterms, in
+                         dependency order
+            labels: Dict of InputNode id to its letter
+        """
+        self.expression = expression
+        self.definitions = definitions
+        self.labels = labels
+
+    def __str__(self):
+        if not self.definitions:
+            return self.expression
+        lines = [self.expression, "where"]
+        lines.extend(f"  {name} = {text}" for name, text in self.definitions)
+        return "\n".join(lines)
+
+
+class ExpressionDAG:
+    """Hash-consed expressions: each (operator, operands) pair has one id"""
+
+    def __init__(self):
+        self.kinds = []
+        self.operands = []
+        self.table = {}
+
+    def make(self, kind, operands):
+        """Get the id of an expression, creating it if it is new"""
+
+        key = (kind, operands)
+        expr = self.table.get(key)
+        if expr is None:
+            expr = len(self.kinds)
+            self.kinds.append(kind)
+            self.operands.append(operands)
+            self.table[key] = expr
+        return expr
+
+    def isCompound(self, expr):
+        """Check if an expression needs parentheses when used as an operand"""
+
+        return self.kinds[expr] in (AND, OR, XOR)
+
+
+def _gateExpression(dag, op, operands):
+    """Build the expression of a gate from its connected operands
+
+    Unconnected inputs are left out, so partially wired gates read the way
+    they are drawn.
+    """
+    if op == OP_NOT:
+        if not operands:
+            return dag.make(CONST, "1")
+        return dag.make(NOT, operands[:1])
+
+    kind, inverted = {
+        OP_AND: (AND, False), OP_OR: (OR, False), OP_XOR: (XOR, False),
+        OP_NAND: (AND, True), OP_NOR: (OR, True), OP_XNOR: (XOR, True)
+    }[op]
+
+    if not operands:
+        return dag.make(CONST, "1" if inverted else "0")
+    if len(operands) == 1:
+        if inverted:
+            return dag.make(NOT, operands)
+        return operands[0]
+    if inverted:
+        return dag.make({AND: NAND, OR: NOR, XOR: XNOR}[kind], operands)
+    return dag.make(kind, operands)
+
+
+def buildExpression(netlist, root, dag, labels):
+    """
+    Add the expression of a node to a DAG
+
+    Args:
+        netlist: The compiled Netlist
+        root: Node index to derive
+        dag: ExpressionDAG to add to
+        labels: Dict of input node index to label
+
+    Returns:
+        The expression id of the node
+    """
+    ops = netlist.ops
+    fanin_start = netlist.fanin_start
+    fanin = netlist.fanin
+
+    exprs = {}
+    active = set()
+    stack = [(root, False)]
+    while stack:
+        node, expanded = stack.pop()
+        if node in exprs:
+            continue
+
+        op = ops[node]
+        if op == OP_INPUT:
+            exprs[node] = dag.make(VAR, labels[node])
+            continue
+
+        sources = [fanin[k] for k in range(fanin_start[node], fanin_start[node + 1])
+                   if fanin[k] != UNCONNECTED]
+        if not expanded:
+            active.add(node)
+            stack.append((node, True))
+            for source in reversed(sources):
+                if source not in active and source not in exprs:
+                    stack.append((source, False))
+            continue
+
+        active.discard(node)
+        operands = tuple(exprs[source] if source in exprs else dag.make(CYCLE, ()) for source in sources)
+        if op == OP_OUTPUT:
+            exprs[node] = operands[0] if operands else dag.make(CONST, "0")
+        else:
+            exprs[node] = _gateExpression(dag, op, operands)
+
+    return exprs[root]
+
+
+def renderEquation(dag, root, labels=None):
+    """
+    Render an expression with shared subterms named once
+
+    Returns:
+        An Equation
+    """
+    kinds = dag.kinds
+    operands = dag.operands
+
+    uses = {}
+    order = []
+    stack = [(root, False)]
+    while stack:
+        expr, expanded = stack.pop()
+        if expanded:
+            order.append(expr)
+            continue
+        if expr in uses:
+            uses[expr] += 1
+            continue
+        uses[expr] = 1
+        stack.append((expr, True))
+        if kinds[expr] not in (VAR, CONST, CYCLE):
+            for operand in reversed(operands[expr]):
+                stack.append((operand, False))
+
+    names = {}
+    for expr in order:
+        if expr != root and uses[expr] > 1 and kinds[expr] not in (VAR, CONST, CYCLE):
+            names[expr] = f"t{len(names) + 1}"
+
+    definitions = [(names[expr], _emit(dag, expr, names)) for expr in order if expr in names]
+    return Equation(_emit(dag, root, names), definitions, labels or {})
+
+
+def _emit(dag, top, names):
+    """Write out one expression, referring to named subterms by name"""
+
+    kinds = dag.kinds
+    operands = dag.operands
+    out = []
+    stack = [top]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            out.append(item)
+            continue
+
+        if item in names and item != top:
+            out.append(names[item])
+            continue
+
+        kind = kinds[item]
+        if kind == VAR or kind == CONST:
+            out.append(operands[item])
+            continue
+        if kind == CYCLE:
+            out.append("(...)")
+            continue
+
+        if kind == NOT:
+            operand = operands[item][0]
+            if operand not in names and dag.isCompound(operand):
+                pieces = ["!(", operand, ")"]
+            else:
+                pieces = ["!", operand]
+        else:
+            pieces = []
+            for position, operand in enumerate(operands[item]):
+                if position:
+                    pieces.append(INFIX[kind])
+                if operand not in names and dag.isCompound(operand):
+                    pieces.extend(["(", operand, ")"])
+                else:
+                    pieces.append(operand)
+            if kind in (NAND, NOR, XNOR):
+                pieces = ["!("] + pieces + [")"]
+
+        stack.extend(reversed(pieces))
+        top = None
+
+    return "".join(out)
+
+
+def deriveEquation(netlist, root):
+    """
+    Derive the equation of a node over the inputs in its cone
+
+    Inputs are lettered A, B, ... in depth-first order from the node,
+    following socket order.
+
+    Returns:
+        An Equation
+    """
+    inputs, _ = netlist.getCone([root])
+    labels = {node: inputLabel(position) for position, node in enumerate(inputs)}
+
+    dag = ExpressionDAG()
+    expr = buildExpression(netlist, root, dag, labels)
+    return renderEquation(dag, expr, {netlist.ids[node]: label for node, label in labels.items()})
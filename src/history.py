@@ -0,0 +1,359 @@
+"""Command-based undo history.
+
+Every edit is pushed as a command that knows how to undo and redo itself on
+a NodeEditor. Commands refer to nodes by id, so they stay valid when the
+scene is rebuilt. Node moves are merged into the move command on top of the
+stack until it is sealed at mouse release, so a drag of any length is a
+single entry and never serializes the scene. Structural edits are stored as
+the records they added and removed and applied as deltas.
+
+Records are interned in a RecordStore shared by the whole stack, so a node
+that is deleted, restored and deleted again is stored once. The stack is
+limited by an estimate of its size in bytes rather than by entry count.
+"""
+
+import sys
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+
+HISTORY_BUDGET = 8 * 1024 * 1024
+
+
+class RecordStore:
+    """Interned, reference-counted node and connection records
+
+    A record is kept as a tuple of its (key, value) pairs; equal records
+    pushed by different commands share one tuple.
+    """
+
+    def __init__(self):
+        self.records = {}
+        self.bytes = 0
+        self.hits = 0
+
+    def intern(self, record):
+        """Get the shared tuple for a toJson dict, adding a reference to it"""
+
+        key = tuple((name, sys.intern(value) if isinstance(value, str) else value)
+                    for name, value in record.items())
+        entry = self.records.get(key)
+        if entry is not None:
+            entry[1] += 1
+            self.hits += 1
+            return entry[0]
+
+        self.records[key] = [key, 1]
+        self.bytes += self.recordSize(key)
+        return key
+
+    def release(self, key):
+        """Drop a reference to a record, freeing it with the last one"""
+
+        entry = self.records.get(key)
+        if entry is None:
+            return
+        entry[1] -= 1
+        if entry[1] == 0:
+            del self.records[key]
+            self.bytes -= self.recordSize(key)
+
+    def recordSize(self, key):
+        """Estimate the bytes held by one record"""
+
+        size = sys.getsizeof(key)
+        for pair in key:
+            size += sys.getsizeof(pair) + sys.getsizeof(pair[1])
+        return size
+
+    def __len__(self):
+        return len(self.records)
+
+
+class Command(ABC):
+    """Base class for undoable edits; subclasses implement undo and redo"""
+
+    text = ""
+
+    def __init__(self):
+        self.sealed = False
+
+    @abstractmethod
+    def undo(self, editor):
+        """Revert the edit on a NodeEditor"""
+
+    @abstractmethod
+    def redo(self, editor):
+        """Apply the edit again on a NodeEditor"""
+
+    def mergeWith(self, command):
+        """Absorb a following command into this one; return True if merged"""
+
+        return False
+
+    def intern(self, store):
+        """Move the command's records into a shared RecordStore"""
+
+    def release(self, store):
+        """Give the command's records back to the RecordStore"""
+
+    def getSize(self):
+        """Estimate the bytes held by the command itself, excluding shared records"""
+
+        return sys.getsizeof(self) + sys.getsizeof(self.__dict__)
+
+
+class MoveNodesCommand(Command):
+    """Move one or more nodes, merging consecutive moves of a drag"""
+
+    text = "Move"
+
+    def __init__(self, moves):
+        """
+        Args:
+            moves: Dict of node id to ((old_x, old_y), (new_x, new_y))
+        """
+        super().__init__()
+        self.moves = dict(moves)
+
+    def mergeWith(self, command):
+        if self.sealed or not isinstance(command, MoveNodesCommand):
+            return False
+        for node_id, (old, new) in command.moves.items():
+            if node_id in self.moves:
+                old = self.moves[node_id][0]
+            self.moves[node_id] = (old, new)
+        return True
+
+    def undo(self, editor):
+        editor.moveNodes({node_id: old for node_id, (old, _) in self.moves.items()})
+
+    def redo(self, editor):
+        editor.moveNodes({node_id: new for node_id, (_, new) in self.moves.items()})
+
+    def getSize(self):
+        # Each move is a pair of (x, y) pairs of floats
+        per_move = 3 * sys.getsizeof((0.0, 0.0)) + 4 * sys.getsizeof(0.0)
+        return super().getSize() + sys.getsizeof(self.moves) + len(self.moves) * per_move
+
+
+class SetInputCommand(Command):
+    """Change the value of an InputNode"""
+
+    text = "Set Input"
+
+    def __init__(self, node_id, old_value, new_value):
+        super().__init__()
+        self.node_id = node_id
+        self.old_value = old_value
+        self.new_value = new_value
+
+    def undo(self, editor):
+        editor.setInputValue(self.node_id, self.old_value)
+
+    def redo(self, editor):
+        editor.setInputValue(self.node_id, self.new_value)
+
+
+class StructureCommand(Command):
+    """Add or remove nodes and connections as a delta on the live scene
+
+    Nodes and connections are held as their toJson records, so undo and
+    redo only touch the items the edit affected.
+    """
+
+    def __init__(self, text, added_nodes=(), removed_nodes=(), added_connections=(), removed_connections=()):
+        """
+        Args:
+            text: Name of the edit, e.g. "Add Node" or "Connect"
+            added_nodes: Records of the nodes the edit created
+            removed_nodes: Records of the nodes the edit deleted
+            added_connections: Records of the connections the edit created
+            removed_connections: Records of the connections the edit deleted,
+                                 including those attached to deleted nodes
+        """
+        super().__init__()
+        self.text = text
+        self.added_nodes = list(added_nodes)
+        self.removed_nodes = list(removed_nodes)
+        self.added_connections = list(added_connections)
+        self.removed_connections = list(removed_connections)
+
+    def _lists(self):
+        return (self.added_nodes, self.removed_nodes, self.added_connections, self.removed_connections)
+
+    def intern(self, store):
+        for records in self._lists():
+            records[:] = [store.intern(record) for record in records]
+
+    def release(self, store):
+        for records in self._lists():
+            for record in records:
+                store.release(record)
+
+    def getSize(self):
+        return super().getSize() + sum(sys.getsizeof(records) for records in self._lists())
+
+    def undo(self, editor):
+        editor.applyStructure([dict(record) for record in self.added_connections],
+                              [dict(record)["id"] for record in self.added_nodes],
+                              [dict(record) for record in self.removed_nodes],
+                              [dict(record) for record in self.removed_connections])
+
+    def redo(self, editor):
+        editor.applyStructure([dict(record) for record in self.removed_connections],
+                              [dict(record)["id"] for record in self.removed_nodes],
+                              [dict(record) for record in self.added_nodes],
+                              [dict(record) for record in self.added_connections])
+
+
+class UndoStack:
+    """Stack of executed commands with a redo position, limited by a byte budget"""
+
+    def __init__(self, budget=HISTORY_BUDGET):
+        """
+        Args:
+            budget: Estimated bytes the history may hold; the oldest commands
+                    are dropped beyond it, but the newest is always kept
+        """
+        self.commands = []
+        self.sizes = []
+        self.index = 0
+        self.budget = budget
+        self.blocked = 0
+
+        self.store = RecordStore()
+        self.command_bytes = 0
+        self.evicted = 0
+        self.max_depth = 0
+
+    def push(self, command):
+        """
+        Record a command that has already been applied
+
+        Commands pushed while the stack is undoing, redoing or blocked are
+        ignored, since they only echo the change being applied.
+
+        Returns:
+            True if the command was recorded or merged
+        """
+        if self.blocked:
+            return False
+
+        self._drop(self.index, len(self.commands))
+        if self.commands and self.commands[-1].mergeWith(command):
+            size = self.commands[-1].getSize()
+            self.command_bytes += size - self.sizes[-1]
+            self.sizes[-1] = size
+            self._trim()
+            return True
+
+        if self.commands:
+            self.commands[-1].sealed = True
+        command.intern(self.store)
+        self.commands.append(command)
+        self.sizes.append(command.getSize())
+        self.command_bytes += self.sizes[-1]
+        self.index = len(self.commands)
+        self._trim()
+        return True
+
+    def _drop(self, first, last):
+        """Remove the commands in [first, last) and release their records"""
+
+        for position in range(first, last):
+            self.commands[position].release(self.store)
+            self.command_bytes -= self.sizes[position]
+        del self.commands[first:last]
+        del self.sizes[first:last]
+
+    def _trim(self):
+        """Drop the oldest commands until the history fits its budget"""
+
+        count = 0
+        while count < len(self.commands) - 1 and self.getBytes() > self.budget:
+            self.commands[count].release(self.store)
+            self.command_bytes -= self.sizes[count]
+            count += 1
+        if count:
+            del self.commands[:count]
+            del self.sizes[:count]
+            self.index = max(0, self.index - count)
+            self.evicted += count
+
+    def setBudget(self, budget):
+        """Change the byte budget, dropping old commands if needed"""
+
+        self.budget = budget
+        self._trim()
+
+    def getBytes(self):
+        """Get the estimated size of the history in bytes"""
+
+        return self.command_bytes + self.store.bytes + sys.getsizeof(self.commands) + sys.getsizeof(self.sizes)
+
+    def getStats(self):
+        """Get history size and usage statistics as a dict"""
+
+        return {
+            "entries": len(self.commands),
+            "position": self.index,
+            "bytes": self.getBytes(),
+            "budget": self.budget,
+            "records": len(self.store),
+            "record_bytes": self.store.bytes,
+            "shared_records": self.store.hits,
+            "evicted": self.evicted,
+            "max_undo_depth": self.max_depth
+        }
+
+    def seal(self):
+        """Stop the top command from absorbing further commands"""
+
+        if self.commands:
+            self.commands[-1].sealed = True
+
+    def undo(self, editor):
+        """Undo the command before the redo position; return False if there is none"""
+
+        if self.index == 0:
+            return False
+        self.index -= 1
+        self.max_depth = max(self.max_depth, len(self.commands) - self.index)
+        command = self.commands[self.index]
+        command.sealed = True
+        with self.block():
+            command.undo(editor)
+        return True
+
+    def redo(self, editor):
+        """Redo the command at the redo position; return False if there is none"""
+
+        if self.index == len(self.commands):
+            return False
+        command = self.commands[self.index]
+        self.index += 1
+        command.sealed = True
+        with self.block():
+            command.redo(editor)
+        return True
+
+    def canUndo(self):
+        return self.index > 0
+
+    def canRedo(self):
+        return self.index < len(self.commands)
+
+    def clear(self):
+        self._drop(0, len(self.commands))
+        self.index = 0
+
+    @contextmanager
+    def block(self):
+        """Ignore pushes while applying changes that must not be recorded"""
+
+        self.blocked += 1
+        try:
+            yield
+        finally:
+            self.blocked -= 1
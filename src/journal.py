@@ -0,0 +1,330 @@
+"""Append-only autosave journal.
+
+Edits reach the journal as the change notifications of a CircuitModel. On
+the GUI thread each one only becomes a small record on a queue; a worker
+thread appends the records to the journal file as JSON lines and applies
+them to a shadow CircuitModel. Once the journal holds COMPACT_RECORDS
+records the worker replaces it with a single snapshot of the shadow model,
+so neither writing nor compaction ever runs on the GUI thread.
+
+A journal holds the edits made since its circuit file was last saved. It
+lives next to the file as <file>.journal, or in AUTOSAVE_DIR for circuits
+that were never saved, and is removed when the circuit is saved or closed
+normally, so a journal found when opening a file was left by a crash.
+"""
+
+import os
+import json
+import queue
+import tempfile
+import threading
+import uuid
+
+from model import CircuitModel
+from circuitfile import readCircuit
+
+
+JOURNAL_EXTENSION = ".journal"
+AUTOSAVE_DIR = os.path.join(tempfile.gettempdir(), "logic-gate-simulator")
+COMPACT_RECORDS = 10000
+CLOSE_TIMEOUT = 5.0
+
+
+def journalPath(path):
+    """Get the journal path of a circuit file"""
+
+    return path + JOURNAL_EXTENSION
+
+
+def untitledJournalPath():
+    """Get a fresh journal path for a circuit that has not been saved"""
+
+    return os.path.join(AUTOSAVE_DIR, f"untitled-{uuid.uuid4()}{JOURNAL_EXTENSION}")
+
+
+def findUntitledJournals():
+    """Get the paths of journals left by unsaved circuits, oldest first"""
+
+    if not os.path.isdir(AUTOSAVE_DIR):
+        return []
+    paths = [os.path.join(AUTOSAVE_DIR, name) for name in os.listdir(AUTOSAVE_DIR)
+             if name.endswith(JOURNAL_EXTENSION)]
+    return sorted(paths, key=os.path.getmtime)
+
+
+def eventRecord(model, event, *args):
+    """
+    Turn a model change notification into a journal record
+
+    Returns:
+        A JSON-serializable dict, or None for events that are not journaled
+    """
+    if event == "node_added":
+        return {"op": "add_node", "node": model.getNode(args[0])}
+    if event == "node_removed":
+        return {"op": "remove_node", "id": args[0]}
+    if event == "node_moved":
+        return {"op": "move", "id": args[0], "x": args[1], "y": args[2]}
+    if event == "value_changed":
+        return {"op": "value", "id": args[0], "value": args[1]}
+    if event == "connection_added":
+        return {"op": "connect", "connection": args[0]}
+    if event == "connection_removed":
+        return {"op": "disconnect", "connection": args[0]}
+    if event == "reset":
+        return {"op": "reset"}
+    return None
+
+
+def loadSnapshot(model, data):
+    """Replace the contents of a model with circuit data"""
+
+    model.clear()
+    for node_data in data.get("nodes", []):
+        model.addNode(node_data)
+    for conn_data in data.get("connections", []):
+        model.addConnection(conn_data)
+
+
+def applyRecord(model, record):
+    """Apply one journal record to a model"""
+
+    op = record.get("op")
+    if op == "snapshot":
+        loadSnapshot(model, record["data"])
+    elif op == "add_node":
+        model.addNode(record["node"])
+    elif op == "remove_node":
+        model.removeNode(record["id"])
+    elif op == "move":
+        model.moveNode(record["id"], record["x"], record["y"])
+    elif op == "value":
+        model.setValue(record["id"], record["value"])
+    elif op == "connect":
+        model.addConnection(record["connection"])
+    elif op == "disconnect":
+        model.removeConnection(record["connection"])
+    elif op == "reset":
+        model.clear()
+
+
+def replayJournal(model, path):
+    """
+    Apply the records of a journal file to a model
+
+    Replay stops at the first line that does not parse, which is where a
+    write was cut short.
+
+    Returns:
+        The number of records applied
+    """
+    count = 0
+    with open(path, 'r') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            applyRecord(model, record)
+            count += 1
+    return count
+
+
+class Journal:
+    """Writes the edits of one CircuitModel to a journal file on a worker thread"""
+
+    def __init__(self, path, base_path=None, compact_records=COMPACT_RECORDS):
+        """
+        Start the worker thread
+
+        Args:
+            path: Journal file; records already in it are kept and appended to
+            base_path: Circuit file the journal's edits apply to, or None for
+                       a circuit that starts empty
+            compact_records: Journal length at which it is rewritten as a snapshot
+        """
+        self.path = path
+        self.base_path = base_path
+        self.compact_records = compact_records
+        self.model = None
+        self.error = None
+
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name="journal", daemon=True)
+        self.thread.start()
+
+    def attach(self, model):
+        """Start journaling the changes of a model"""
+
+        self.model = model
+        model.subscribe(self._record)
+
+    def _record(self, event, *args):
+        record = eventRecord(self.model, event, *args)
+        if record is not None:
+            self.queue.put(("record", record))
+
+    def mark(self):
+        """
+        Note that a snapshot of the model is being saved
+
+        Records that arrive after the mark are carried over into the new
+        journal when the save completes and the journal is rebased, since the
+        saved file does not contain them.
+        """
+        self.queue.put(("mark", None))
+
+    def unmark(self):
+        """Forget the mark after a save failed"""
+
+        self.queue.put(("unmark", None))
+
+    def rebase(self, base_path, path):
+        """
+        Start over after the circuit was saved
+
+        Args:
+            base_path: The file the circuit was saved to
+            path: Journal file to use from now on
+        """
+        self.queue.put(("rebase", (base_path, path)))
+
+    def flush(self):
+        """Wait until every queued record has been written"""
+
+        self.queue.join()
+
+    def close(self, discard=True, wait=False):
+        """
+        Stop journaling
+
+        The worker writes the records still queued and then stops; by
+        default it does so in the background, so a compaction in progress
+        never holds up the caller.
+
+        Args:
+            discard: Delete the journal file, since its edits are saved or
+                     were thrown away
+            wait: Block for up to CLOSE_TIMEOUT seconds until the worker has
+                  finished, as when the application exits
+
+        Returns:
+            False if the worker was waited for and had not finished; error
+            then says so and the journal is left as last written
+        """
+        if self.model is not None:
+            self.model.unsubscribe(self._record)
+            self.model = None
+        self.queue.put(("close", discard))
+        if not wait:
+            return True
+
+        self.thread.join(CLOSE_TIMEOUT)
+        if self.thread.is_alive():
+            self.error = f"{self.path} was still being written after {CLOSE_TIMEOUT} seconds"
+            return False
+        return True
+
+    def _run(self):
+        """Worker loop: apply records to the shadow model and append them to the file"""
+
+        shadow = CircuitModel()
+        records = 0
+        marked = None
+        try:
+            if self.base_path and os.path.exists(self.base_path):
+                loadSnapshot(shadow, readCircuit(self.base_path))
+            if os.path.exists(self.path):
+                records = replayJournal(shadow, self.path)
+        except Exception as e:
+            self.error = str(e)
+
+        f = None
+        while True:
+            items = [self.queue.get()]
+            while True:
+                try:
+                    items.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            lines = []
+            for kind, payload in items:
+                if kind == "record":
+                    applyRecord(shadow, payload)
+                    line = json.dumps(payload, separators=(",", ":"))
+                    lines.append(line)
+                    if marked is not None:
+                        marked.append(line)
+                    continue
+                if kind == "mark":
+                    marked = []
+                    continue
+                if kind == "unmark":
+                    marked = None
+                    continue
+
+                f, records = self._write(f, lines, records)
+                lines = []
+                if f is not None:
+                    f.close()
+                    f = None
+                if kind == "rebase":
+                    self._remove()
+                    self.base_path, self.path = payload
+                    records = 0
+                    if marked:
+                        f, records = self._write(f, marked, records)
+                    marked = None
+                elif kind == "close":
+                    if payload:
+                        self._remove()
+                    for _ in items:
+                        self.queue.task_done()
+                    return
+
+            f, records = self._write(f, lines, records)
+            if f is not None and records >= self.compact_records:
+                f.close()
+                f = None
+                records = self._compact(shadow)
+            for _ in items:
+                self.queue.task_done()
+
+    def _write(self, f, lines, records):
+        """Append lines to the journal, opening it if needed; return (file, record count)"""
+
+        if not lines or self.error is not None:
+            return f, records
+        try:
+            if f is None:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                f = open(self.path, 'a')
+            f.write("\n".join(lines) + "\n")
+            f.flush()
+        except OSError as e:
+            self.error = str(e)
+            return None, records
+        return f, records + len(lines)
+
+    def _compact(self, shadow):
+        """Replace the journal with one snapshot record; return the new record count"""
+
+        temp_path = self.path + ".tmp"
+        try:
+            with open(temp_path, 'w') as f:
+                f.write(json.dumps({"op": "snapshot", "data": shadow.toJson()}, separators=(",", ":")) + "\n")
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            self.error = str(e)
+        return 1
+
+    def _remove(self):
+        """Delete the journal file if it exists"""
+
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            self.error = str(e)
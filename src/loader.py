@@ -0,0 +1,264 @@
+"""Opening and saving circuit files off the GUI thread.
+
+CircuitLoader parses a file on a worker thread and hands the records over in
+batches through a bounded queue. A zero-interval QTimer on the GUI thread
+adds them to the editor in time slices, so the window keeps painting and
+handling input while a large circuit loads, and the load can be cancelled
+between batches. The editor stays in bulk mode for the whole load, so items
+are created once at the end for the nodes in view.
+
+CircuitSaver takes a snapshot of the editor's model, which only copies its
+arrays, and serializes and writes it on a worker thread while editing
+continues. The file is written beside the target and only replaces it once
+complete, so a cancelled or failed save leaves the original file intact.
+"""
+
+import os
+import time
+import queue
+import threading
+
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+from circuitfile import WriteCancelled, iterCircuitRecords, writeCircuit
+
+
+SLICE_SECONDS = 0.03
+BATCH_RECORDS = 2000
+QUEUE_BATCHES = 32
+
+
+class CircuitLoader(QObject):
+    """Loads a circuit file into an editor, parsing it on a worker thread"""
+
+    progress = pyqtSignal(int)
+    finished = pyqtSignal()
+    failed = pyqtSignal(str)
+
+    def __init__(self, editor, path, slice_seconds=SLICE_SECONDS):
+        """
+        Initialize a loader
+
+        Args:
+            editor: The NodeEditor to fill; it should be empty
+            path: Path of a .circuit or .circuitb file
+            slice_seconds: Time spent inserting records per timer tick
+        """
+        super().__init__(editor)
+
+        self.editor = editor
+        self.path = path
+        self.slice_seconds = slice_seconds
+        self.size = max(1, os.path.getsize(path))
+
+        self.batches = queue.Queue(QUEUE_BATCHES)
+        self.thread = None
+        self.batch = []
+        self.position = 0
+        self.pending = []
+        self.node_count = 0
+        self.connection_count = 0
+        self.cancelled = False
+        self.running = False
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(0)
+        self.timer.timeout.connect(self._step)
+
+    def start(self):
+        """Start parsing on a worker thread and inserting on the event loop"""
+
+        self.running = True
+        self.editor.beginBulkLoad()
+        self.thread = threading.Thread(target=self._read, name="load", daemon=True)
+        self.thread.start()
+        self.timer.start()
+
+    def cancel(self):
+        """Stop loading; records already inserted stay in the editor"""
+
+        self.cancelled = True
+        self.timer.stop()
+        if self.running:
+            self.running = False
+            self.editor.endBulkLoad()
+
+    def _put(self, item):
+        """Queue an item for the GUI thread; return False if the load was cancelled"""
+
+        while not self.cancelled:
+            try:
+                self.batches.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _read(self):
+        """Worker thread: parse the file into batches of (kind, record) pairs"""
+
+        try:
+            batch = []
+            for kind, record, done in iterCircuitRecords(self.path):
+                batch.append((kind, record))
+                if len(batch) >= BATCH_RECORDS:
+                    if not self._put(("records", batch, done)):
+                        return
+                    batch = []
+            if self._put(("records", batch, self.size)):
+                self._put(("done", None, self.size))
+        except Exception as e:
+            self._put(("error", str(e), 0))
+
+    def _step(self):
+        """Insert records until this tick's time slice is used up"""
+
+        editor = self.editor
+        deadline = time.perf_counter() + self.slice_seconds
+        done = None
+        while time.perf_counter() < deadline:
+            if self.position == len(self.batch):
+                try:
+                    kind, payload, done = self.batches.get_nowait()
+                except queue.Empty:
+                    break
+                if kind == "done":
+                    self._finish()
+                    return
+                if kind == "error":
+                    self.cancel()
+                    self.failed.emit(payload)
+                    return
+                self.batch = payload
+                self.position = 0
+
+            end = min(len(self.batch), self.position + 256)
+            for kind, record in self.batch[self.position:end]:
+                if kind == "node":
+                    if editor.createNode(record):
+                        self.node_count += 1
+                elif not self._connect(record):
+                    self.pending.append(record)
+            self.position = end
+
+        if done is not None:
+            self.progress.emit(min(99, 100 * done // self.size))
+
+    def _connect(self, record):
+        """Create a connection; return False if an endpoint has not been loaded yet"""
+
+        model = self.editor.model
+        if record.get("source_node") not in model or record.get("dest_node") not in model:
+            return False
+        if self.editor.createConnection(record):
+            self.connection_count += 1
+        return True
+
+    def _finish(self):
+        """Wire connections that came before their nodes and refresh the outputs"""
+
+        self.timer.stop()
+        self.running = False
+        for record in self.pending:
+            self._connect(record)
+        self.pending = []
+        self.batch = []
+
+        self.editor.endBulkLoad()
+        self.progress.emit(100)
+        self.finished.emit()
+
+
+class CircuitSaver(QObject):
+    """Writes a snapshot of an editor's circuit to a file on a worker thread"""
+
+    progress = pyqtSignal(int)
+    finished = pyqtSignal(str)
+    failed = pyqtSignal(str)
+
+    def __init__(self, editor, path):
+        """
+        Take the snapshot to save
+
+        Args:
+            editor: The NodeEditor to save
+            path: File to write; the format follows the extension
+        """
+        super().__init__(editor)
+
+        self.path = path
+        self.snapshot = editor.model.snapshot()
+        self.version = editor.model.version
+        self.error = None
+        self.thread = None
+        self.percent = -1
+        self.cancelled = False
+        self.lock = threading.Lock()
+
+    def start(self):
+        """Write the file on a worker thread"""
+
+        self.thread = threading.Thread(target=self.run, name="save", daemon=True)
+        self.thread.start()
+
+    def cancel(self):
+        """
+        Stop the save, keeping the original file
+
+        Returns:
+            False if the file was already replaced, in which case the save
+            completes normally
+        """
+        with self.lock:
+            if self.snapshot is None:
+                return False
+            self.cancelled = True
+            return True
+
+    def _progress(self, done, total):
+        """Write progress callback: emit whole percents and stop once cancelled"""
+
+        percent = min(99, 100 * done // max(1, total))
+        if percent != self.percent:
+            self.percent = percent
+            self.progress.emit(percent)
+        return not self.cancelled
+
+    def wait(self):
+        """Block until a background save has finished"""
+
+        if self.thread is not None:
+            self.thread.join()
+
+    def run(self):
+        """Serialize and write the snapshot, replacing the file only once it is complete"""
+
+        stem, extension = os.path.splitext(self.path)
+        temp_path = stem + ".saving" + extension
+        self._progress(0, 1)
+        try:
+            writeCircuit(self.snapshot.toJson(), temp_path, self._progress)
+            with self.lock:
+                if self.cancelled:
+                    raise WriteCancelled("Write cancelled")
+                os.replace(temp_path, self.path)
+                self.snapshot = None
+        except WriteCancelled:
+            self._removeTemp(temp_path)
+            return
+        except Exception as e:
+            self.error = str(e)
+            self._removeTemp(temp_path)
+            self.failed.emit(self.error)
+            return
+        self.progress.emit(100)
+        self.finished.emit(self.path)
+
+    def _removeTemp(self, temp_path):
+        """Delete a partly written file"""
+
+        self.snapshot = None
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
@@ -2,13 +2,23 @@
 
 
 import os
-import json
 from PyQt5.QtWidgets import (QMainWindow, QTabWidget, QAction, QFileDialog, 
                             QDockWidget, QListWidget, QListWidgetItem, QMenu,
-                            QMessageBox, QVBoxLayout, QWidget)
-from PyQt5.QtCore import Qt, QMimeData, QPoint
+                            QMessageBox, QVBoxLayout, QWidget, QProgressDialog,
+                            QApplication)
+from PyQt5.QtCore import Qt, QMimeData, QPoint, QTimer
 from PyQt5.QtGui import QIcon, QDrag, QPixmap, QPainter
 from nodes import NodeEditor, InputNode, OutputNode, WriteOutputNode, AndNode, OrNode, NotNode, NandNode, NorNode, XorNode, XnorNode
+from batch import simulateVectors
+from verify import exhaustiveCheck
+from circuitfile import readCircuit, BINARY_EXTENSION
+from loader import CircuitLoader, CircuitSaver
+from journal import journalPath, findUntitledJournals
+
+
+OPEN_FILTER = "Circuit Files (*.circuit *.circuitb);;All Files (*)"
+SAVE_FILTER = "Circuit Files (*.circuit);;Binary Circuit Files (*.circuitb);;All Files (*)"
+HIBERNATE_DELAY = 60000
 
 class DraggableNodeListWidget(QListWidget):
     """Custom QListWidget that handles starting node drags properly"""
@@ -57,9 +67,16 @@ class MainWindow(QMainWindow):
         self.tabWidget = QTabWidget()
         self.tabWidget.setTabsClosable(True)
         self.tabWidget.tabCloseRequested.connect(self.closeTab)
+        self.tabWidget.currentChanged.connect(self.tabChanged)
         self.setCentralWidget(self.tabWidget)
         
         
+        self.hibernateTimer = QTimer(self)
+        self.hibernateTimer.setSingleShot(True)
+        self.hibernateTimer.setInterval(HIBERNATE_DELAY)
+        self.hibernateTimer.timeout.connect(self.hibernateInactiveTabs)
+        
+        
         self.createNodeList()
         
         
@@ -69,6 +86,9 @@ class MainWindow(QMainWindow):
         
         
         self.newTab()
+        
+        
+        QTimer.singleShot(0, self.recoverUntitled)
     
     def createMenuBar(self):
         """Create the application menu bar"""
@@ -134,6 +154,21 @@ class MainWindow(QMainWindow):
         editMenu.addAction(deleteAction)
         
         
+        simulateMenu = self.menuBar().addMenu("Simulate")
+        
+        vectorsAction = QAction("Run Test Vectors...", self)
+        vectorsAction.triggered.connect(self.runTestVectors)
+        simulateMenu.addAction(vectorsAction)
+        
+        exhaustiveAction = QAction("Exhaustive Check", self)
+        exhaustiveAction.triggered.connect(lambda: self.runExhaustiveCheck(False))
+        simulateMenu.addAction(exhaustiveAction)
+        
+        equivalenceAction = QAction("Check Equivalence...", self)
+        equivalenceAction.triggered.connect(lambda: self.runExhaustiveCheck(True))
+        simulateMenu.addAction(equivalenceAction)
+        
+        
         windowMenu = self.menuBar().addMenu("Window")
         
         lightThemeAction = QAction("Light Theme", self)
@@ -143,6 +178,16 @@ class MainWindow(QMainWindow):
         darkThemeAction = QAction("Dark Theme", self)
         darkThemeAction.triggered.connect(lambda: self.changeTheme("dark"))
         windowMenu.addAction(darkThemeAction)
+        
+        windowMenu.addSeparator()
+        
+        hibernateAction = QAction("Hibernate Inactive Tabs", self)
+        hibernateAction.triggered.connect(self.hibernateInactiveTabs)
+        windowMenu.addAction(hibernateAction)
+        
+        memoryAction = QAction("Memory Usage", self)
+        memoryAction.triggered.connect(self.showMemoryUsage)
+        windowMenu.addAction(memoryAction)
     
     def createNodeList(self):
         """Create the side panel with the list of available nodes"""
@@ -197,6 +242,59 @@ class MainWindow(QMainWindow):
         editor = NodeEditor()
         index = self.tabWidget.addTab(editor, f"Untitled {self.tabWidget.count() + 1}")
         self.tabWidget.setCurrentIndex(index)
+        editor.startJournal()
+        return editor
+    
+    def recoverUntitled(self):
+        """Offer to recover circuits that were never saved before a crash"""
+        
+        active = set()
+        for i in range(self.tabWidget.count()):
+            journal = self.tabWidget.widget(i).journal
+            if journal is not None:
+                active.add(journal.path)
+        
+        for path in findUntitledJournals():
+            if path in active:
+                continue
+            reply = QMessageBox.question(
+                self, "Recover Circuit",
+                "An unsaved circuit was found from a previous session. Do you want to recover it?",
+                QMessageBox.Yes | QMessageBox.No
+            )
+            if reply != QMessageBox.Yes:
+                os.remove(path)
+                continue
+            
+            editor = NodeEditor()
+            index = self.tabWidget.addTab(editor, f"Recovered {self.tabWidget.count() + 1}")
+            self.tabWidget.setCurrentIndex(index)
+            try:
+                editor.recoverJournal(path)
+            except Exception as e:
+                QMessageBox.critical(self, "Error", f"Failed to recover circuit: {str(e)}")
+            editor.startJournal(path)
+    
+    def recoverFile(self, editor, filePath):
+        """Offer to replay the journal a crash left next to a file just opened"""
+        
+        path = journalPath(filePath)
+        if not os.path.exists(path):
+            return
+        
+        reply = QMessageBox.question(
+            self, "Recover Changes",
+            f"{os.path.basename(filePath)} has unsaved changes from a previous session. Do you want to recover them?",
+            QMessageBox.Yes | QMessageBox.No
+        )
+        if reply != QMessageBox.Yes:
+            os.remove(path)
+            return
+        
+        try:
+            editor.recoverJournal(path)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to recover changes: {str(e)}")
     
     def closeTab(self, index):
         """Close the tab at the given index"""
@@ -204,6 +302,9 @@ class MainWindow(QMainWindow):
         
         editor = self.tabWidget.widget(index)
         if editor.hasUnsavedChanges():
+            
+            self.tabWidget.setCurrentIndex(index)
+            
             reply = QMessageBox.question(
                 self, "Unsaved Changes",
                 "This tab has unsaved changes. Do you want to save them?",
@@ -211,16 +312,54 @@ class MainWindow(QMainWindow):
             )
             
             if reply == QMessageBox.Save:
-                if not self.saveFile():
+                if not self.saveFile(background=False):
                     return
             elif reply == QMessageBox.Cancel:
                 return
         
         self.tabWidget.removeTab(index)
+        editor.finishSave()
+        editor.stopJournal()
+        editor.release()
+        editor.deleteLater()
+        
         
         
         
+    
+    def tabChanged(self, index):
+        """Wake the tab being shown and restart the countdown to hibernating the others"""
+        
+        editor = self.tabWidget.widget(index)
+        if editor is not None:
+            editor.wake()
+        self.hibernateTimer.start()
+    
+    def hibernateInactiveTabs(self):
+        """Free the scenes of every tab except the current one"""
+        
+        current = self.tabWidget.currentWidget()
+        for i in range(self.tabWidget.count()):
+            editor = self.tabWidget.widget(i)
+            if editor is not current:
+                editor.hibernate()
+    
+    def showMemoryUsage(self):
+        """Show an estimate of the memory held by each tab"""
         
+        lines = []
+        for i in range(self.tabWidget.count()):
+            usage = self.tabWidget.widget(i).getMemoryUsage()
+            state = "hibernated" if usage["hibernated"] else f"{usage['nodes']} nodes"
+            lines.append(
+                f"{self.tabWidget.tabText(i)} ({state}): "
+                f"model {usage['model_bytes'] / 1e6:.1f} MB, "
+                f"{usage['node_items']} node items, {usage['connection_items']} wires, "
+                f"{usage['pooled_items']} pooled, "
+                f"history {usage['history_bytes'] / 1e6:.1f} MB, "
+                f"clipboard {usage['clipboard_entries']}"
+            )
+        QMessageBox.information(self, "Memory Usage", "\n".join(lines) or "No open tabs")
     
     def getCurrentEditor(self):
         """Get the currently active node editor"""
@@ -229,32 +368,77 @@ class MainWindow(QMainWindow):
         return None
     
     def openFile(self):
-        """Open a circuit file"""
+        """Open a circuit file, loading it progressively into a new tab"""
         
         filePath, _ = QFileDialog.getOpenFileName(
-            self, "Open Circuit", "", "Circuit Files (*.circuit);;All Files (*)"
+            self, "Open Circuit", "", OPEN_FILTER
         )
         
-        if filePath:
-            try:
-                with open(filePath, 'r') as f:
-                    data = json.load(f)
-                
-                editor = NodeEditor()
-                editor.loadFromJson(data)
-                
-                
-                filename = os.path.basename(filePath)
-                index = self.tabWidget.addTab(editor, filename)
-                self.tabWidget.setCurrentIndex(index)
-                
-                editor.setFilePath(filePath)
-                editor.setUnsavedChanges(False) 
-            except Exception as e:
-                QMessageBox.critical(self, "Error", f"Failed to open file: {str(e)}")
+        if not filePath:
+            return
+        
+        try:
+            editor = NodeEditor()
+            loader = CircuitLoader(editor, filePath)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to open file: {str(e)}")
+            return
+        
+        
+        filename = os.path.basename(filePath)
+        index = self.tabWidget.addTab(editor, filename)
+        self.tabWidget.setCurrentIndex(index)
+        
+        
+        progress = QProgressDialog(f"Loading {filename}...", "Cancel", 0, 100, self)
+        progress.setWindowTitle("Open Circuit")
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(500)
+        
+        def finish():
+            progress.reset()
+            editor.setFilePath(filePath)
+            editor.setUnsavedChanges(False)
+            self.recoverFile(editor, filePath)
+            editor.startJournal()
+        
+        def fail(message):
+            progress.reset()
+            self.tabWidget.removeTab(self.tabWidget.indexOf(editor))
+            editor.release()
+            editor.deleteLater()
+            QMessageBox.critical(self, "Error", f"Failed to open file: {message}")
+        
+        def cancel():
+            if not loader.running:
+                return
+            loader.cancel()
+            self.tabWidget.removeTab(self.tabWidget.indexOf(editor))
+            editor.release()
+            editor.deleteLater()
+        
+        loader.progress.connect(progress.setValue)
+        loader.finished.connect(finish)
+        loader.failed.connect(fail)
+        progress.canceled.connect(cancel)
+        loader.start()
     
-    def saveFile(self):
-        """Save the current circuit to a file"""
+    def saveFile(self, background=True):
+        """
+        Save the current circuit to a file
+        
+        The model is snapshotted on the GUI thread and written on a worker
+        thread, so editing can continue while a large circuit is saved. A
+        background save shows its progress and can be cancelled, which
+        leaves the file as it was.
+        
+        Args:
+            background: Return as soon as the write has started; otherwise
+                        wait for it, as when saving before closing
+        
+        Returns:
+            False if the save was cancelled or failed
+        """
         
         editor = self.getCurrentEditor()
         if editor is None:
@@ -263,29 +447,78 @@ class MainWindow(QMainWindow):
         filePath = editor.getFilePath()
         
         if not filePath:
-            filePath, _ = QFileDialog.getSaveFileName(
-                self, "Save Circuit", "", "Circuit Files (*.circuit);;All Files (*)"
+            filePath, selectedFilter = QFileDialog.getSaveFileName(
+                self, "Save Circuit", "", SAVE_FILTER
             )
             
             if not filePath:
                 return False
-        
-        try:
-            data = editor.saveToJson()
             
-            with open(filePath, 'w') as f:
-                json.dump(data, f, indent=4)
             
-            
-            filename = os.path.basename(filePath)
-            self.tabWidget.setTabText(self.tabWidget.currentIndex(), filename)
-            
-            editor.setFilePath(filePath)
-            editor.setUnsavedChanges(False)
+            if not os.path.splitext(filePath)[1]:
+                filePath += BINARY_EXTENSION if BINARY_EXTENSION in selectedFilter else ".circuit"
+        
+        
+        editor.finishSave()
+        
+        saver = CircuitSaver(editor, filePath)
+        editor.saver = saver
+        if editor.journal is not None:
+            editor.journal.mark()
+        
+        progress = None
+        if background:
+            progress = QProgressDialog(f"Saving {os.path.basename(filePath)}...", "Cancel", 0, 100, self)
+            progress.setWindowTitle("Save Circuit")
+            progress.setMinimumDuration(500)
+        
+        def closeProgress():
+            if progress is not None:
+                progress.reset()
+                progress.deleteLater()
+        
+        def finish(path):
+            closeProgress()
+            if editor.saver is not saver:
+                return
+            editor.saver = None
+            editor.setFilePath(path)
+            self.tabWidget.setTabText(self.tabWidget.indexOf(editor), os.path.basename(path))
+            if editor.model.version == saver.version:
+                editor.setUnsavedChanges(False)
+            editor.rebaseJournal()
+            self.statusBar().showMessage(f"Saved {os.path.basename(path)}", 3000)
+        
+        def fail(message):
+            closeProgress()
+            if editor.saver is not saver:
+                return
+            editor.saver = None
+            if editor.journal is not None:
+                editor.journal.unmark()
+            QMessageBox.critical(self, "Error", f"Failed to save file: {message}")
+        
+        def cancel():
+            if editor.saver is not saver or not saver.cancel():
+                return
+            closeProgress()
+            editor.saver = None
+            if editor.journal is not None:
+                editor.journal.unmark()
+            self.statusBar().showMessage("Save cancelled", 3000)
+        
+        saver.finished.connect(finish)
+        saver.failed.connect(fail)
+        
+        if background:
+            self.statusBar().showMessage(f"Saving {os.path.basename(filePath)}...")
+            saver.progress.connect(progress.setValue)
+            progress.canceled.connect(cancel)
+            saver.start()
             return True
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Failed to save file: {str(e)}")
-            return False
+        
+        saver.run()
+        return saver.error is None
     
     def undo(self):
         """Undo the last action in the current editor"""
@@ -329,6 +562,88 @@ class MainWindow(QMainWindow):
         if editor:
             editor.delete()
     
+    def runTestVectors(self):
+        """Stream a file of input vectors through the current circuit"""
+        
+        editor = self.getCurrentEditor()
+        if editor is None:
+            return
+        
+        vectorPath, _ = QFileDialog.getOpenFileName(
+            self, "Open Test Vectors", "", "Vector Files (*.csv *.txt);;All Files (*)"
+        )
+        if not vectorPath:
+            return
+        
+        outputPath, _ = QFileDialog.getSaveFileName(
+            self, "Save Simulation Results", "", "CSV Files (*.csv);;Text Files (*.txt);;All Files (*)"
+        )
+        if not outputPath:
+            return
+        
+        try:
+            count = simulateVectors(editor.getNetlist(), vectorPath, outputPath)
+            QMessageBox.information(self, "Simulation Complete", f"Simulated {count} vectors.")
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to simulate vectors: {str(e)}")
+    
+    def runExhaustiveCheck(self, withReference):
+        """Simulate every input combination of the current circuit on all cores"""
+        
+        editor = self.getCurrentEditor()
+        if editor is None:
+            return
+        
+        reference = None
+        if withReference:
+            referencePath, _ = QFileDialog.getOpenFileName(
+                self, "Open Reference Circuit", "", OPEN_FILTER
+            )
+            if not referencePath:
+                return
+            try:
+                reference = readCircuit(referencePath)
+            except Exception as e:
+                QMessageBox.critical(self, "Error", f"Failed to open file: {str(e)}")
+                return
+        
+        progress = QProgressDialog("Simulating...", "Cancel", 0, 1000, self)
+        progress.setWindowTitle("Exhaustive Check")
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(0)
+        
+        def report(result):
+            progress.setValue(int(1000 * result.vectors / result.total_vectors))
+            progress.setLabelText(f"{result.vectors:,} of {result.total_vectors:,} vectors, "
+                                  f"{result.getRate():,.0f} vectors/s")
+            QApplication.processEvents()
+            return not progress.wasCanceled()
+        
+        try:
+            result = exhaustiveCheck(editor.saveToJson(), reference, progress=report)
+        except Exception as e:
+            progress.close()
+            QMessageBox.critical(self, "Error", f"Failed to check circuit: {str(e)}")
+            return
+        progress.close()
+        
+        lines = [f"{result.vectors:,} vectors in {result.elapsed:.1f} s "
+                 f"({result.getRate():,.0f} vectors/s)"]
+        if result.cancelled:
+            lines.append("Cancelled before completion.")
+        for position, output_id in enumerate(result.output_ids):
+            onset = result.onset_counts[position]
+            line = f"Output {position + 1}: " + ("not connected" if onset is None else f"1 for {onset:,} vectors")
+            row = result.counterexamples[position]
+            if row is not None:
+                assignment = result.getAssignment(row)
+                line += ", mismatch at " + " ".join(f"{node_id[:8]}={value}" for node_id, value in assignment.items())
+            lines.append(line)
+        if reference is not None and result.isEquivalent():
+            lines.append("The circuits are equivalent.")
+        
+        QMessageBox.information(self, "Exhaustive Check", "\n".join(lines))
+    
     def changeTheme(self, theme):
         """Change the application theme"""
         
@@ -366,7 +681,7 @@ class MainWindow(QMainWindow):
                 )
                 
                 if reply == QMessageBox.Save:
-                    if not self.saveFile():
+                    if not self.saveFile(background=False):
                         
                         event.ignore()
                         return
@@ -376,4 +691,13 @@ class MainWindow(QMainWindow):
                     return
         
         
+        problems = []
+        for i in range(self.tabWidget.count()):
+            self.tabWidget.widget(i).finishSave()
+            problem = self.tabWidget.widget(i).stopJournal(wait=True)
+            if problem:
+                problems.append(f"{self.tabWidget.tabText(i)}: {problem}")
+        if problems:
+            QMessageBox.warning(self, "Autosave",
+                                "Some autosave journals were not finished:\n" + "\n".join(problems))
         event.accept()
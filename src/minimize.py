@@ -0,0 +1,482 @@
+"""Two-level logic minimization.
+
+A cube is a pair of ints (care, value): bit p of care is set when variable p
+appears as a literal, and bit p of value gives its polarity. The function
+itself is a truth-table column (bit r set when row r is in the onset, see
+truthtable.py), so checking a cube against the offset is a single AND of
+two packed ints.
+
+Small functions are minimized exactly with Quine-McCluskey and a
+branch-and-bound cover; larger ones with an Espresso-style loop of expand,
+irredundant and reduce. Each seed is the path to 1 of the function's
+decision tree through an uncovered row rather than the row alone. Every full-width cube
+operation costs time in proportion to the truth table, so the heuristic's
+run time grows with both the table and the size of the cover; max_cubes
+bounds the latter.
+"""
+
+from engine import CircuitError
+from truthtable import inputPattern
+
+
+EXACT_LIMIT = 8
+MAX_MINIMIZE_INPUTS = 20
+SEARCH_LIMIT = 20000
+REFINE_PASSES = 3
+REFINE_CUBES = 2000
+PROGRESS_CUBES = 64
+
+# Share of the progress range taken by seeding, irredundant and refinement
+STAGES = ((0, 500), (500, 700), (700, 1000))
+
+
+class MinimizeCancelled(CircuitError):
+    """Raised when a progress callback stops a minimization"""
+
+
+class TermLimitError(CircuitError):
+    """Raised when a cover would need more cubes than allowed"""
+
+
+def _popcount(word):
+    return bin(word).count("1")
+
+
+class Minimizer:
+    """Minimizes one truth-table column over a fixed number of variables"""
+
+    def __init__(self, onset, count, max_cubes=None, progress=None):
+        """
+        Args:
+            onset: Int with bit r set when row r of the table is 1
+            count: Number of variables; variable 0 is the most significant
+                   bit of the row number
+            max_cubes: Optional limit on the heuristic's cover; TermLimitError
+                       is raised as soon as it is exceeded
+            progress: Optional callable (done, 1000); if it returns False,
+                      MinimizeCancelled is raised
+        """
+        self.count = count
+        self.max_cubes = max_cubes
+        self.progress = progress
+        self.full = (1 << (1 << count)) - 1
+        self.onset = onset & self.full
+        self.offset = self.full ^ self.onset
+
+        self.ones = [inputPattern(count - 1 - position, count) for position in range(count)]
+        self.zeros = [self.full ^ word for word in self.ones]
+
+    def cubeMask(self, cube):
+        """Get the rows covered by a cube as a packed int"""
+
+        care, value = cube
+        mask = self.full
+        for position in range(self.count):
+            if (care >> position) & 1:
+                mask &= self.ones[position] if (value >> position) & 1 else self.zeros[position]
+        return mask
+
+    def _report(self, stage, done, total):
+        """Pass the progress through a stage to the callback"""
+
+        if self.progress is None:
+            return
+        start, end = STAGES[stage]
+        if self.progress(start + (end - start) * done // max(1, total), 1000) is False:
+            raise MinimizeCancelled("Minimization cancelled")
+
+    def pathCube(self, row):
+        """
+        Get the cube of the decision-tree path that reaches an onset row
+
+        Variables are split in order until the rows left are all in the
+        onset. Each split halves the offset cofactor, so the walk costs
+        about two passes over the table, and the cube's rows are one
+        contiguous block.
+
+        Returns:
+            ((care, value), mask)
+        """
+        count = self.count
+        offset = self.offset
+        care = 0
+        value = 0
+        size = 1 << count
+        for position in range(count):
+            if not offset:
+                break
+            size >>= 1
+            bit = 1 << position
+            care |= bit
+            if (row >> (count - 1 - position)) & 1:
+                value |= bit
+                offset >>= size
+            else:
+                offset &= (1 << size) - 1
+        if offset:
+            raise CircuitError(f"Row {row} is not in the onset")
+        return (care, value), ((1 << size) - 1) << (row & ~(size - 1))
+
+    def rowCube(self, row):
+        """Get the cube of a single row"""
+
+        value = 0
+        for position in range(self.count):
+            if (row >> (self.count - 1 - position)) & 1:
+                value |= 1 << position
+        return ((1 << self.count) - 1, value)
+
+    def expand(self, cube, mask, order):
+        """Drop literals while the cube stays clear of the offset"""
+
+        care, value = cube
+        offset = self.offset
+        for position in order:
+            if not (care >> position) & 1:
+                continue
+            shift = 1 << (self.count - 1 - position)
+            if (value >> position) & 1:
+                grown = mask | (mask >> shift)
+            else:
+                grown = mask | (mask << shift)
+            if not grown & offset:
+                mask = grown
+                care &= ~(1 << position)
+                value &= ~(1 << position)
+        return (care, value), mask
+
+    def supercube(self, rows):
+        """Get the smallest cube containing a set of rows"""
+
+        care = 0
+        value = 0
+        for position in range(self.count):
+            if not rows & self.zeros[position]:
+                care |= 1 << position
+                value |= 1 << position
+            elif not rows & self.ones[position]:
+                care |= 1 << position
+        return (care, value)
+
+    def minimize(self):
+        """Get a minimal (exact) or near-minimal (heuristic) list of cubes"""
+
+        if not self.onset:
+            return []
+        if not self.offset:
+            return [(0, 0)]
+        if self.count <= EXACT_LIMIT:
+            return self._exact()
+        return self._heuristic()
+
+    def _primes(self):
+        """Generate all prime implicants by Quine-McCluskey merging"""
+
+        current = set()
+        onset = self.onset
+        while onset:
+            low = onset & -onset
+            current.add(self.rowCube(low.bit_length() - 1))
+            onset ^= low
+
+        primes = set()
+        while current:
+            merged = set()
+            used = set()
+            groups = {}
+            for cube in current:
+                groups.setdefault(cube[0], []).append(cube)
+            for care, cubes in groups.items():
+                values = set(value for _, value in cubes)
+                for value in values:
+                    for position in range(self.count):
+                        bit = 1 << position
+                        if care & bit and not value & bit and (value | bit) in values:
+                            merged.add((care & ~bit, value))
+                            used.add((care, value))
+                            used.add((care, value | bit))
+            primes.update(current - used)
+            current = merged
+        return list(primes)
+
+    def _exact(self):
+        """Minimum cover of the prime implicants, by branch and bound"""
+
+        primes = self._primes()
+        masks = [self.cubeMask(prime) for prime in primes]
+        literals = [_popcount(care) for care, _ in primes]
+
+        chosen = []
+        uncovered = self.onset
+        row_covers = {}
+        remaining = self.onset
+        while remaining:
+            low = remaining & -remaining
+            covering = [i for i, mask in enumerate(masks) if mask & low]
+            if len(covering) == 1 and covering[0] not in chosen:
+                chosen.append(covering[0])
+            row_covers[low] = covering
+            remaining ^= low
+        for i in chosen:
+            uncovered &= ~masks[i]
+
+        best = [None, None]
+        budget = [SEARCH_LIMIT]
+
+        def cost(selection):
+            return (len(selection), sum(literals[i] for i in selection))
+
+        def search(uncovered, selection):
+            if budget[0] <= 0:
+                return
+            budget[0] -= 1
+            if not uncovered:
+                selection_cost = cost(selection)
+                if best[0] is None or selection_cost < best[1]:
+                    best[0] = list(selection)
+                    best[1] = selection_cost
+                return
+            if best[0] is not None and len(selection) + 1 > best[1][0]:
+                return
+            low = uncovered & -uncovered
+            candidates = sorted(row_covers[low], key=lambda i: (-_popcount(masks[i] & uncovered), literals[i]))
+            for i in candidates:
+                selection.append(i)
+                search(uncovered & ~masks[i], selection)
+                selection.pop()
+
+        search(uncovered, list(chosen))
+        if best[0] is None or budget[0] <= 0:
+            greedy = self._greedyCover(masks, literals, chosen, uncovered)
+            if best[0] is None or cost(greedy) < best[1]:
+                best[0] = greedy
+        return [primes[i] for i in best[0]]
+
+    def _greedyCover(self, masks, literals, chosen, uncovered):
+        """Cover the remaining rows by repeatedly taking the largest prime"""
+
+        selection = list(chosen)
+        while uncovered:
+            best = max(range(len(masks)), key=lambda i: (_popcount(masks[i] & uncovered), -literals[i]))
+            selection.append(best)
+            uncovered &= ~masks[best]
+        return selection
+
+    def _heuristic(self):
+        """Espresso-style expand / irredundant / reduce loop"""
+
+        forward = list(range(self.count))
+        backward = forward[::-1]
+
+        rows = _popcount(self.onset)
+        cubes = []
+        masks = []
+        uncovered = self.onset
+        while uncovered:
+            if len(cubes) % PROGRESS_CUBES == 0:
+                self._report(0, rows - _popcount(uncovered), rows)
+            if self.max_cubes is not None and len(cubes) >= self.max_cubes:
+                raise TermLimitError(f"more than {self.max_cubes} terms")
+            low = uncovered & -uncovered
+            cube, mask = self.expand(*self.pathCube(low.bit_length() - 1), forward)
+            cubes.append(cube)
+            masks.append(mask)
+            uncovered &= ~mask
+        cubes, masks = self._irredundant(cubes, masks, report=True)
+        self._report(1, 1, 1)
+
+        best = cubes
+        best_cost = self._cost(cubes)
+        passes = REFINE_PASSES if len(cubes) <= REFINE_CUBES else 0
+        for step in range(passes):
+            self._report(2, step, passes)
+            order = backward if step % 2 == 0 else forward
+            reduced = self._reduce(cubes, masks)
+            cubes = []
+            masks = []
+            for cube, mask in reduced:
+                cube, mask = self.expand(cube, mask, order)
+                cubes.append(cube)
+                masks.append(mask)
+            cubes, masks = self._irredundant(cubes, masks)
+
+            current_cost = self._cost(cubes)
+            if current_cost >= best_cost:
+                break
+            best = cubes
+            best_cost = current_cost
+        return best
+
+    def _cost(self, cubes):
+        return (len(cubes), sum(_popcount(care) for care, _ in cubes))
+
+    def _irredundant(self, cubes, masks, report=False):
+        """Drop cubes whose rows are all covered by the other cubes
+
+        Cubes are tried smallest first; each one is taken out of the cover
+        counts and put back only if some onset row loses its last cube.
+        """
+        onset = self.onset
+        counter = CoverCounter()
+        for mask in masks:
+            counter.add(mask)
+
+        keep = [True] * len(cubes)
+        trial = sorted(range(len(cubes)), key=lambda i: (_popcount(cubes[i][0]), i), reverse=True)
+        for tried, i in enumerate(trial):
+            if report and tried % PROGRESS_CUBES == 0:
+                self._report(1, tried, len(trial))
+            counter.remove(masks[i])
+            if masks[i] & onset & ~counter.covered():
+                counter.add(masks[i])
+            else:
+                keep[i] = False
+
+        kept = [i for i in range(len(cubes)) if keep[i]]
+        return [cubes[i] for i in kept], [masks[i] for i in kept]
+
+    def _reduce(self, cubes, masks):
+        """Shrink each cube to the supercube of the rows only it covers"""
+
+        onset = self.onset
+        counter = CoverCounter()
+        for mask in masks:
+            counter.add(mask)
+
+        reduced = []
+        for cube, mask in zip(cubes, masks):
+            own = mask & onset & counter.single()
+            counter.remove(mask)
+            if not own:
+                continue
+            cube = self.supercube(own)
+            mask = self.cubeMask(cube)
+            counter.add(mask)
+            reduced.append((cube, mask))
+        return reduced
+
+
+class CoverCounter:
+    """Per-row cover counts of a set of cubes, stored as bit-sliced planes
+
+    Plane k holds bit k of every row's count, so adding or removing a cube
+    costs one big-int operation per plane.
+    """
+
+    def __init__(self):
+        self.planes = []
+
+    def add(self, mask):
+        carry = mask
+        planes = self.planes
+        for k in range(len(planes)):
+            if not carry:
+                return
+            plane = planes[k]
+            planes[k] = plane ^ carry
+            carry &= plane
+        if carry:
+            planes.append(carry)
+
+    def remove(self, mask):
+        borrow = mask
+        planes = self.planes
+        for k in range(len(planes)):
+            if not borrow:
+                break
+            plane = planes[k]
+            planes[k] = plane ^ borrow
+            borrow &= ~plane
+        while planes and not planes[-1]:
+            planes.pop()
+
+    def covered(self):
+        """Get the rows covered by at least one cube"""
+
+        rows = 0
+        for plane in self.planes:
+            rows |= plane
+        return rows
+
+    def single(self):
+        """Get the rows covered by exactly one cube"""
+
+        if not self.planes:
+            return 0
+        rows = self.planes[0]
+        for plane in self.planes[1:]:
+            rows &= ~plane
+        return rows
+
+
+def minimizeColumn(onset, count, max_cubes=None, progress=None):
+    """Get the cubes of a minimal sum-of-products for a truth-table column"""
+
+    return Minimizer(onset, count, max_cubes, progress).minimize()
+
+
+def formatSop(cubes, labels):
+    """Render cubes as a sum of products, e.g. A * !B + C"""
+
+    if not cubes:
+        return "0"
+    terms = []
+    for care, value in cubes:
+        literals = [labels[p] if (value >> p) & 1 else f"!{labels[p]}"
+                    for p in range(len(labels)) if (care >> p) & 1]
+        terms.append(" * ".join(literals) if literals else "1")
+    return " + ".join(terms)
+
+
+def formatPos(cubes, labels):
+    """Render offset cubes as a product of sums, e.g. (!A + B) * C"""
+
+    if not cubes:
+        return "1"
+    clauses = []
+    for care, value in cubes:
+        literals = [f"!{labels[p]}" if (value >> p) & 1 else labels[p]
+                    for p in range(len(labels)) if (care >> p) & 1]
+        if not literals:
+            return "0"
+        clause = " + ".join(literals)
+        clauses.append(f"({clause})" if len(literals) > 1 else clause)
+    return " * ".join(clauses)
+
+
+def minimizeTable(table, output=0, max_terms=None, progress=None):
+    """
+    Minimize one output of a TruthTable
+
+    Args:
+        table: The TruthTable
+        output: Index of the output column
+        max_terms: Optional limit on the terms of each form; a form that
+                   needs more is given as "more than N terms"
+        progress: Optional callable (done, 1000); if it returns False,
+                  MinimizeCancelled is raised
+
+    Returns:
+        Tuple of (sum-of-products text, product-of-sums text), or None if the
+        output is not fully connected
+    """
+    column = table.columns[output]
+    if column is None:
+        return None
+
+    count = len(table.labels)
+    if count > MAX_MINIMIZE_INPUTS:
+        raise CircuitError(f"Function has {count} inputs, the minimization limit is {MAX_MINIMIZE_INPUTS}")
+    full = (1 << table.getRowCount()) - 1
+    forms = []
+    for half, (onset, render) in enumerate(((column, formatSop), (full ^ column, formatPos))):
+        def report(done, total, half=half):
+            return progress((half * total + done) // 2, total)
+
+        try:
+            cubes = minimizeColumn(onset, count, max_terms, report if progress is not None else None)
+        except TermLimitError as e:
+            forms.append(str(e))
+            continue
+        forms.append(render(cubes, table.labels))
+    return tuple(forms)
@@ -0,0 +1,519 @@
+"""Compact circuit model behind a NodeEditor.
+
+The editor keeps the whole circuit here, independent of Qt. Nodes occupy
+numbered slots in columnar arrays (id, type code, position, value), and
+slots freed by deletions are reused. Fan-in is a CSR array with a fixed
+stride of MAX_ARITY entries per slot, holding the source slot of each input
+socket or UNCONNECTED. Fan-out is threaded through the same entries as
+singly linked lists (first_out per slot, next_out per fan-in entry), so an
+edge can be added or removed without repacking; getNetlist packs both
+directions into the engine's contiguous CSR arrays.
+
+Every change is reported to the subscribed listeners as (event, *args):
+
+    "node_added"          node id
+    "node_removed"        node id, after its connections were removed
+    "node_moved"          node id, x, y
+    "value_changed"       node id, value
+    "connection_added"    connection record
+    "connection_removed"  connection record
+    "reset"               no arguments
+
+The graphics items in the scene are only a view of the part of the model
+around the viewport. A uniform grid over node positions answers which nodes
+are in view.
+"""
+
+import sys
+import zlib
+import pickle
+from array import array
+
+from engine import Netlist, NODE_OPCODES, OPCODE_ARITY, OP_OUTPUT, UNCONNECTED
+from circuitfile import TYPE_NAMES, TYPE_CODES
+
+
+CELL_SIZE = 500
+MAX_ARITY = max(OPCODE_ARITY.values())
+FREE = 255
+
+TYPE_OPCODES = [NODE_OPCODES[name] for name in TYPE_NAMES]
+TYPE_ARITY = [OPCODE_ARITY[op] for op in TYPE_OPCODES]
+TYPE_OUTPUTS = [0 if op == OP_OUTPUT else 1 for op in TYPE_OPCODES]
+INPUT_CODE = TYPE_CODES["InputNode"]
+
+
+def socketCounts(node_type):
+    """Get (inputs, outputs) for a node type name, or None if it is unknown"""
+
+    code = TYPE_CODES.get(node_type)
+    if code is None:
+        return None
+    return TYPE_ARITY[code], TYPE_OUTPUTS[code]
+
+
+class CircuitModel:
+    """Array-backed nodes and connections of a circuit with change notifications"""
+
+    def __init__(self, cell_size=CELL_SIZE):
+        self.cell_size = cell_size
+        self.listeners = []
+        self.version = 0
+        self.clear()
+
+    def subscribe(self, callback):
+        """Call callback(event, *args) after every change"""
+
+        self.listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        """Stop reporting changes to a callback"""
+
+        if callback in self.listeners:
+            self.listeners.remove(callback)
+
+    def _notify(self, event, *args):
+        self.version += 1
+        for callback in self.listeners:
+            callback(event, *args)
+
+    def clear(self):
+        """Remove every node and connection"""
+
+        self.ids = []
+        self.index = {}
+        self.types = bytearray()
+        self.xs = array('d')
+        self.ys = array('d')
+        self.values = bytearray()
+        self.fanin = array('i')
+        self.first_out = array('i')
+        self.next_out = array('i')
+        self.free = []
+        self.cells = {}
+        self._notify("reset")
+
+    def snapshot(self):
+        """
+        Copy the model without its listeners
+
+        Only the flat arrays and indexes are copied, so this is cheap enough to
+        call on the GUI thread before handing the copy to a worker thread.
+        """
+        copy = CircuitModel.__new__(CircuitModel)
+        copy.cell_size = self.cell_size
+        copy.listeners = []
+        copy.version = self.version
+        copy.ids = list(self.ids)
+        copy.index = dict(self.index)
+        for name in ("types", "xs", "ys", "values", "fanin", "first_out", "next_out"):
+            setattr(copy, name, getattr(self, name)[:])
+        copy.free = list(self.free)
+        copy.cells = {cell: set(members) for cell, members in self.cells.items()}
+        return copy
+
+    def pack(self):
+        """
+        Compress the model's contents into bytes and empty it
+
+        No listener is notified, since the circuit has not changed; the model
+        must not be used until unpack restores it. This lets an inactive tab
+        keep its circuit in a fraction of the memory.
+        """
+        data = zlib.compress(pickle.dumps(
+            (self.ids, self.types, self.xs, self.ys, self.values, self.fanin,
+             self.first_out, self.next_out, self.free), pickle.HIGHEST_PROTOCOL), 1)
+        self.ids = []
+        self.index = {}
+        self.types = bytearray()
+        self.xs = array('d')
+        self.ys = array('d')
+        self.values = bytearray()
+        self.fanin = array('i')
+        self.first_out = array('i')
+        self.next_out = array('i')
+        self.free = []
+        self.cells = {}
+        return data
+
+    def unpack(self, data):
+        """Restore the contents saved by pack, rebuilding the id index and spatial grid"""
+
+        (self.ids, self.types, self.xs, self.ys, self.values, self.fanin,
+         self.first_out, self.next_out, self.free) = pickle.loads(zlib.decompress(data))
+        self.index = {node_id: slot for slot, node_id in enumerate(self.ids) if node_id is not None}
+        self.cells = {}
+        for slot in self.index.values():
+            self._place(slot)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, node_id):
+        return node_id in self.index
+
+    def _cell(self, slot):
+        size = self.cell_size
+        return int(self.xs[slot] // size), int(self.ys[slot] // size)
+
+    def _place(self, slot):
+        self.cells.setdefault(self._cell(slot), set()).add(slot)
+
+    def _unplace(self, slot):
+        cell = self._cell(slot)
+        members = self.cells[cell]
+        members.discard(slot)
+        if not members:
+            del self.cells[cell]
+
+    def _allocate(self, node_id):
+        """Get a free slot for a node, growing the arrays if there is none"""
+
+        if self.free:
+            slot = self.free.pop()
+            self.ids[slot] = node_id
+        else:
+            slot = len(self.ids)
+            self.ids.append(node_id)
+            self.types.append(FREE)
+            self.xs.append(0.0)
+            self.ys.append(0.0)
+            self.values.append(0)
+            self.first_out.append(UNCONNECTED)
+            self.fanin.extend([UNCONNECTED] * MAX_ARITY)
+            self.next_out.extend([UNCONNECTED] * MAX_ARITY)
+        self.index[node_id] = slot
+        return slot
+
+    def addNode(self, node_data):
+        """
+        Add a node from its JSON data, replacing any node with the same id
+
+        Returns:
+            The node's JSON record, or None if the type is unknown
+        """
+        code = TYPE_CODES.get(node_data.get("type"))
+        if code is None or "id" not in node_data:
+            return None
+
+        node_id = node_data["id"]
+        if node_id in self.index:
+            self.removeNode(node_id)
+
+        slot = self._allocate(node_id)
+        self.types[slot] = code
+        self.xs[slot] = node_data.get("pos_x", 0)
+        self.ys[slot] = node_data.get("pos_y", 0)
+        self.values[slot] = node_data.get("value", "0") in ("1", 1, True)
+        self._place(slot)
+        self._notify("node_added", node_id)
+        return self.getNode(node_id)
+
+    def removeNode(self, node_id):
+        """
+        Remove a node and its connections
+
+        Returns:
+            (node record, list of removed connection records), or None if the
+            node is not in the model
+        """
+        slot = self.index.get(node_id)
+        if slot is None:
+            return None
+
+        record = self.getNode(node_id)
+        removed = self.getConnections(node_id)
+        for conn_data in removed:
+            self.removeConnection(conn_data)
+
+        self._unplace(slot)
+        del self.index[node_id]
+        self.ids[slot] = None
+        self.types[slot] = FREE
+        self.free.append(slot)
+        self._notify("node_removed", node_id)
+        return record, removed
+
+    def getNode(self, node_id):
+        """Get the JSON record of a node, or None"""
+
+        slot = self.index.get(node_id)
+        if slot is None:
+            return None
+
+        code = self.types[slot]
+        record = {
+            "id": node_id,
+            "type": TYPE_NAMES[code],
+            "pos_x": self.xs[slot],
+            "pos_y": self.ys[slot]
+        }
+        if code == INPUT_CODE:
+            record["value"] = "1" if self.values[slot] else "0"
+        return record
+
+    def getType(self, node_id):
+        """Get the type name of a node, or None"""
+
+        slot = self.index.get(node_id)
+        return None if slot is None else TYPE_NAMES[self.types[slot]]
+
+    def moveNode(self, node_id, x, y):
+        """Set the position of a node"""
+
+        slot = self.index.get(node_id)
+        if slot is None or (self.xs[slot] == x and self.ys[slot] == y):
+            return
+        self._unplace(slot)
+        self.xs[slot] = x
+        self.ys[slot] = y
+        self._place(slot)
+        self._notify("node_moved", node_id, x, y)
+
+    def getValue(self, node_id):
+        """Get the stored value of a node"""
+
+        slot = self.index.get(node_id)
+        return slot is not None and bool(self.values[slot])
+
+    def setValue(self, node_id, value):
+        """Set the stored value of an InputNode"""
+
+        slot = self.index.get(node_id)
+        if slot is None or bool(self.values[slot]) == bool(value):
+            return
+        self.values[slot] = bool(value)
+        self._notify("value_changed", node_id, bool(value))
+
+    def _connectionRecord(self, source, edge):
+        return {
+            "source_node": self.ids[source],
+            "source_socket": 0,
+            "dest_node": self.ids[edge // MAX_ARITY],
+            "dest_socket": edge % MAX_ARITY
+        }
+
+    def addConnection(self, conn_data):
+        """
+        Add a connection from its JSON data between nodes in the model
+
+        Returns:
+            The connection's record, or None if an endpoint is missing, a
+            socket index is out of range or the destination socket is taken
+        """
+        source = self.index.get(conn_data.get("source_node"))
+        dest = self.index.get(conn_data.get("dest_node"))
+        if source is None or dest is None:
+            return None
+
+        dest_socket = conn_data.get("dest_socket", 0)
+        if conn_data.get("source_socket", 0) != 0 or not TYPE_OUTPUTS[self.types[source]]:
+            return None
+        if not 0 <= dest_socket < TYPE_ARITY[self.types[dest]]:
+            return None
+
+        edge = dest * MAX_ARITY + dest_socket
+        if self.fanin[edge] != UNCONNECTED:
+            return None
+
+        self.fanin[edge] = source
+        self.next_out[edge] = self.first_out[source]
+        self.first_out[source] = edge
+
+        record = self._connectionRecord(source, edge)
+        self._notify("connection_added", record)
+        return record
+
+    def removeConnection(self, conn_data):
+        """
+        Remove the connection matching a JSON record, if present
+
+        Returns:
+            The removed record, or None
+        """
+        dest = self.index.get(conn_data.get("dest_node"))
+        dest_socket = conn_data.get("dest_socket", 0)
+        if dest is None or not 0 <= dest_socket < MAX_ARITY or conn_data.get("source_socket", 0) != 0:
+            return None
+
+        edge = dest * MAX_ARITY + dest_socket
+        source = self.fanin[edge]
+        if source == UNCONNECTED or self.ids[source] != conn_data.get("source_node"):
+            return None
+
+        previous = UNCONNECTED
+        current = self.first_out[source]
+        while current != edge:
+            previous = current
+            current = self.next_out[current]
+        if previous == UNCONNECTED:
+            self.first_out[source] = self.next_out[edge]
+        else:
+            self.next_out[previous] = self.next_out[edge]
+        self.fanin[edge] = UNCONNECTED
+        self.next_out[edge] = UNCONNECTED
+
+        record = self._connectionRecord(source, edge)
+        self._notify("connection_removed", record)
+        return record
+
+    def _fanout(self, slot):
+        """Iterate over the fan-in entries driven by a slot"""
+
+        edge = self.first_out[slot]
+        while edge != UNCONNECTED:
+            yield edge
+            edge = self.next_out[edge]
+
+    def getSource(self, node_id, socket):
+        """Get the id of the node driving an input socket, or None"""
+
+        slot = self.index.get(node_id)
+        if slot is None or not 0 <= socket < MAX_ARITY:
+            return None
+        source = self.fanin[slot * MAX_ARITY + socket]
+        return None if source == UNCONNECTED else self.ids[source]
+
+    def isInputConnected(self, node_id, socket):
+        """Check whether an input socket of a node is connected"""
+
+        return self.getSource(node_id, socket) is not None
+
+    def hasFanout(self, node_id):
+        """Check whether a node's output drives anything"""
+
+        slot = self.index.get(node_id)
+        return slot is not None and self.first_out[slot] != UNCONNECTED
+
+    def getConnections(self, node_id):
+        """Get the records of every connection into or out of a node"""
+
+        slot = self.index.get(node_id)
+        if slot is None:
+            return []
+
+        connections = []
+        base = slot * MAX_ARITY
+        for edge in range(base, base + TYPE_ARITY[self.types[slot]]):
+            source = self.fanin[edge]
+            if source != UNCONNECTED:
+                connections.append(self._connectionRecord(source, edge))
+        for edge in self._fanout(slot):
+            connections.append(self._connectionRecord(slot, edge))
+        return connections
+
+    def getNeighbors(self, node_id):
+        """Get the ids of the nodes connected to a node"""
+
+        slot = self.index.get(node_id)
+        if slot is None:
+            return set()
+
+        neighbors = set()
+        base = slot * MAX_ARITY
+        for source in self.fanin[base:base + MAX_ARITY]:
+            if source != UNCONNECTED:
+                neighbors.add(self.ids[source])
+        for edge in self._fanout(slot):
+            neighbors.add(self.ids[edge // MAX_ARITY])
+        neighbors.discard(node_id)
+        return neighbors
+
+    def nodesInRect(self, left, top, right, bottom, margin=0):
+        """
+        Get the ids of the nodes whose position lies in a rectangle
+
+        Args:
+            left, top, right, bottom: Scene coordinates of the rectangle
+            margin: Distance to grow the rectangle by on every side
+        """
+        size = self.cell_size
+        left -= margin
+        top -= margin
+        right += margin
+        bottom += margin
+
+        first_x, last_x = int(left // size), int(right // size)
+        first_y, last_y = int(top // size), int(bottom // size)
+        if (last_x - first_x + 1) * (last_y - first_y + 1) <= len(self.cells):
+            cells = [(cx, cy) for cx in range(first_x, last_x + 1) for cy in range(first_y, last_y + 1)]
+        else:
+            # Fewer occupied cells than cells in the rectangle
+            cells = [cell for cell in self.cells
+                     if first_x <= cell[0] <= last_x and first_y <= cell[1] <= last_y]
+
+        found = set()
+        xs = self.xs
+        ys = self.ys
+        for cell in cells:
+            for slot in self.cells.get(cell, ()):
+                if left <= xs[slot] <= right and top <= ys[slot] <= bottom:
+                    found.add(self.ids[slot])
+        return found
+
+    def getBounds(self):
+        """Get (left, top, right, bottom) around every node position, or None"""
+
+        if not self.index:
+            return None
+        slots = self.index.values()
+        xs = [self.xs[slot] for slot in slots]
+        ys = [self.ys[slot] for slot in slots]
+        return min(xs), min(ys), max(xs), max(ys)
+
+    def _slots(self):
+        """Get the occupied slots in slot order"""
+
+        return [slot for slot, node_id in enumerate(self.ids) if node_id is not None]
+
+    def toJson(self):
+        """Get the circuit as a dict in the .circuit JSON format"""
+
+        slots = self._slots()
+        nodes = [self.getNode(self.ids[slot]) for slot in slots]
+        connections = []
+        fanin = self.fanin
+        for slot in slots:
+            base = slot * MAX_ARITY
+            for edge in range(base, base + TYPE_ARITY[self.types[slot]]):
+                if fanin[edge] != UNCONNECTED:
+                    connections.append(self._connectionRecord(fanin[edge], edge))
+        return {"nodes": nodes, "connections": connections}
+
+    def getNetlist(self):
+        """
+        Compile the circuit straight from the model arrays
+
+        Nodes are numbered in slot order; the Netlist builds the contiguous
+        fan-out CSR arrays from the fan-in.
+
+        Returns:
+            The compiled Netlist
+        """
+        slots = self._slots()
+        number = array('i', [UNCONNECTED]) * len(self.ids)
+        for i, slot in enumerate(slots):
+            number[slot] = i
+
+        ids = [self.ids[slot] for slot in slots]
+        ops = [TYPE_OPCODES[self.types[slot]] for slot in slots]
+        values = [self.values[slot] for slot in slots]
+        fanin_start = [0] * (len(slots) + 1)
+        fanin = []
+        for i, slot in enumerate(slots):
+            base = slot * MAX_ARITY
+            for source in self.fanin[base:base + OPCODE_ARITY[ops[i]]]:
+                fanin.append(UNCONNECTED if source == UNCONNECTED else number[source])
+            fanin_start[i + 1] = len(fanin)
+
+        return Netlist(ids, ops, fanin_start, fanin, values)
+
+    def getMemoryUsage(self):
+        """Estimate the bytes held by the model"""
+
+        size = sum(sys.getsizeof(values) for values in (self.types, self.xs, self.ys, self.values, self.fanin,
+                                                         self.first_out, self.next_out, self.free))
+        size += sys.getsizeof(self.ids) + sys.getsizeof(self.index) + sys.getsizeof(self.cells)
+        size += sum(sys.getsizeof(node_id) for node_id in self.index)
+        size += sum(sys.getsizeof(members) for members in self.cells.values())
+        return size
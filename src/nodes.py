@@ -3,22 +3,199 @@
 
 import os
 import json
+import math
 import uuid
+import threading
 from PyQt5.QtWidgets import (QWidget, QGraphicsScene, QGraphicsView, QGraphicsItem,
                             QGraphicsRectItem, QGraphicsEllipseItem, QGraphicsPathItem,
-                            QGraphicsTextItem, QLineEdit, QPushButton, QVBoxLayout,
-                            QHBoxLayout, QGraphicsProxyWidget, QFileDialog, QInputDialog)
-from PyQt5.QtCore import Qt, QPointF, QRectF, QSizeF, QMimeData, QByteArray
-from PyQt5.QtGui import QPen, QBrush, QColor, QPainterPath, QFont, QPainter, QCursor
-from PyQt5.QtGui import QRegExpValidator
-from PyQt5.QtCore import QRegExp
+                            QVBoxLayout, QHBoxLayout, QFileDialog, QInputDialog, QMenu, QProgressDialog)
+from PyQt5.QtCore import Qt, QPointF, QRectF, QSizeF, QMimeData, QByteArray, QTimer, QObject, pyqtSignal
+from PyQt5 import sip
+from PyQt5.QtGui import (QPen, QBrush, QColor, QPainterPath, QFont, QFontMetricsF, QPainter, QCursor,
+                         QPixmap, QTransform)
+from engine import Simulator, CircuitError
+from truthtable import truthTable
+from bdd import CircuitFunctions, BDDMemoryError
+from equations import deriveEquation
+from minimize import minimizeTable, MinimizeCancelled, MAX_MINIMIZE_INPUTS
+from history import UndoStack, MoveNodesCommand, SetInputCommand, StructureCommand
+from model import CircuitModel
+from journal import Journal, journalPath, untitledJournalPath, replayJournal
 
 
 NODE_WIDTH = 150
 NODE_HEIGHT = 100
 SOCKET_RADIUS = 8
 GRID_SIZE = 20
+GRID_MIN_PIXELS = 8
+ZOOM_STEP = 1.15
+MIN_ZOOM = 0.1
+MAX_ZOOM = 4.0
+DETAIL_OVERVIEW = 0
+DETAIL_SIMPLE = 1
+DETAIL_FULL = 2
+SIMPLE_ZOOM = 0.5
+OVERVIEW_ZOOM = 0.25
 GRID_COLOR = QColor(50, 50, 50, 150)
+SCENE_SIZE = 5000
+ITEM_CACHE_MODE = QGraphicsItem.DeviceCoordinateCache
+UPDATE_MODES = {
+    "full": QGraphicsView.FullViewportUpdate,
+    "minimal": QGraphicsView.MinimalViewportUpdate,
+    "smart": QGraphicsView.SmartViewportUpdate,
+    "bounding": QGraphicsView.BoundingRectViewportUpdate
+}
+DEFAULT_UPDATE_MODE = "smart"
+VIEW_MARGIN = 400
+POOL_LIMIT = 200
+GLYPH_CACHE_LIMIT = 512
+TEXT_COLOR = QColor(255, 255, 255)
+SYMBOL_COLOR = QColor(220, 220, 220)
+BUTTON_COLOR = QColor(45, 45, 45)
+BUTTON_BORDER_COLOR = QColor(110, 110, 110)
+MINIMIZE_TERMS = 256
+
+class GlyphCache:
+    """Rendered text shared by every item in every scene
+    
+    Node titles, gate symbols, values and button labels are drawn by
+    blitting a pixmap from here instead of laying out a QTextDocument per
+    item. Pixmaps are keyed by text, font, colour (which follows the theme)
+    and zoom bucket, so every gate of a type shares one pixmap per zoom
+    level. Fonts and text sizes are shared the same way.
+    """
+    
+    def __init__(self, limit=GLYPH_CACHE_LIMIT):
+        self.limit = limit
+        self.fonts = {}
+        self.sizes = {}
+        self.pixmaps = {}
+        self.hits = 0
+        self.misses = 0
+    
+    def font(self, size, family="Arial"):
+        """Get the shared bold font of a point size"""
+        
+        key = (family, size)
+        font = self.fonts.get(key)
+        if font is None:
+            font = self.fonts[key] = QFont(family, size, QFont.Bold)
+        return font
+    
+    def size(self, text, font):
+        """Get the size of a text in scene units"""
+        
+        key = (text, font.key())
+        size = self.sizes.get(key)
+        if size is None:
+            size = self.sizes[key] = QFontMetricsF(font).size(0, text)
+        return size
+    
+    @staticmethod
+    def bucket(scale):
+        """Round a device scale to a power of 2 ** 0.5, so zooming reuses pixmaps"""
+        
+        return 2 ** (round(math.log2(max(scale, MIN_ZOOM)) * 2) / 2)
+    
+    def pixmap(self, text, font, color, scale):
+        """Get a pixmap of a text rendered at a zoom bucket"""
+        
+        key = (text, font.key(), color.rgba(), scale)
+        pixmap = self.pixmaps.get(key)
+        if pixmap is not None:
+            self.hits += 1
+            return pixmap
+        
+        self.misses += 1
+        if len(self.pixmaps) >= self.limit:
+            self.pixmaps.clear()
+        
+        size = self.size(text, font)
+        pixmap = QPixmap(max(1, math.ceil(size.width() * scale)), max(1, math.ceil(size.height() * scale)))
+        pixmap.fill(Qt.transparent)
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.TextAntialiasing)
+        painter.scale(scale, scale)
+        painter.setFont(font)
+        painter.setPen(color)
+        painter.drawText(QRectF(0, 0, size.width(), size.height()), Qt.AlignCenter, text)
+        painter.end()
+        
+        self.pixmaps[key] = pixmap
+        return pixmap
+    
+    def draw(self, painter, rect, text, font, color):
+        """Blit a text into a rect, choosing the pixmap for the painter's zoom"""
+        
+        scale = abs(painter.worldTransform().m11()) * painter.device().devicePixelRatioF()
+        pixmap = self.pixmap(text, font, color, self.bucket(scale))
+        painter.drawPixmap(rect, pixmap, QRectF(pixmap.rect()))
+    
+    def getStats(self):
+        """Get the number of cached pixmaps, their estimated bytes and the hit counts"""
+        
+        return {
+            "pixmaps": len(self.pixmaps),
+            "bytes": sum(pixmap.width() * pixmap.height() * 4 for pixmap in self.pixmaps.values()),
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+GLYPH_CACHE = GlyphCache()
+
+class TextItem(QGraphicsItem):
+    """Single line of text painted from GLYPH_CACHE"""
+    
+    def __init__(self, text, font, color, parent=None):
+        """
+        Initialize a text item
+        
+        Args:
+            text: Text to show
+            font: A font from GLYPH_CACHE.font
+            color: Text colour
+            parent: Parent item
+        """
+        super().__init__(parent)
+        self.text = text
+        self.font = font
+        self.color = color
+        self.size = GLYPH_CACHE.size(text, font)
+    
+    def setPlainText(self, text):
+        """Change the text"""
+        
+        if text == self.text:
+            return
+        self.prepareGeometryChange()
+        self.text = text
+        self.size = GLYPH_CACHE.size(text, self.font)
+    
+    def toPlainText(self):
+        return self.text
+    
+    def boundingRect(self):
+        return QRectF(0, 0, self.size.width(), self.size.height())
+    
+    def paint(self, painter, option, widget=None):
+        GLYPH_CACHE.draw(painter, self.boundingRect(), self.text, self.font, self.color)
+
+class CircuitScene(QGraphicsScene):
+    """Scene of a NodeEditor
+    
+    While bulk_loading is set, items skip their per-item indicator, path and
+    simulation updates; the editor recomputes them once when the bulk
+    operation ends.
+    
+    detail is the level of detail items are drawn with, from DETAIL_FULL
+    down to DETAIL_OVERVIEW, chosen by the editor from the view's zoom.
+    """
+    
+    def __init__(self, node_editor):
+        super().__init__()
+        self.node_editor = node_editor
+        self.bulk_loading = False
+        self.detail = DETAIL_FULL
 
 class Socket(QGraphicsEllipseItem):
     """Socket for connecting nodes"""
@@ -129,14 +306,18 @@ class Socket(QGraphicsEllipseItem):
                 self.connection.append(connection)
         
         
-        self.node.updateConnectionIndicators()
+        if not self.node.scene.bulk_loading:
+            self.node.updateConnectionIndicators()
+            self.node.invalidateNetlist()
     
     def removeConnection(self, connection):
         """Remove a specific connection from an output socket"""
         if self.socket_type == Socket.OUTPUT and connection in self.connection:
             self.connection.remove(connection)
             
-            self.node.updateConnectionIndicators()
+            if not self.node.scene.bulk_loading:
+                self.node.updateConnectionIndicators()
+                self.node.invalidateNetlist()
             
     def getConnections(self):
         """Get all connections for this socket"""
@@ -214,24 +395,34 @@ class Connection(QGraphicsPathItem):
         scene.addItem(self)
         
         
-        if source_socket and dest_socket:
+        if dest_socket and scene.detail == DETAIL_OVERVIEW:
+            self.setVisible(False)
+        
+        if source_socket and dest_socket and not scene.bulk_loading:
             self.updatePath()
     
     def mouseDoubleClickEvent(self, event):
         """Handle double-click to disconnect"""
         if event.button() == Qt.LeftButton:
             
-            self.remove()
+            node_editor = None
+            for view in self.scene.views():
+                if hasattr(view, 'node_editor'):
+                    node_editor = view.node_editor
+                    break
+            
+            record = self.toJson()
+            if node_editor:
+                node_editor.removeConnectionRecord(record)
+            else:
+                self.remove()
             
             
-            views = self.scene.views()
-            if views:
-                for view in views:
-                    if hasattr(view, 'node_editor'):
-                        view.node_editor.setUnsavedChanges(True)
-                        
-                        view.node_editor.saveState()
-                        break
+            if node_editor:
+                node_editor.refreshOutputs()
+                node_editor.setUnsavedChanges(True)
+                
+                node_editor.pushCommand(StructureCommand("Disconnect", removed_connections=[record]))
             
             event.accept()
         else:
@@ -252,30 +443,124 @@ class Connection(QGraphicsPathItem):
         path.moveTo(source_pos)
         
         
+        if self.scene.detail < DETAIL_FULL:
+            path.lineTo(dest_pos)
+            self.setPath(path)
+            return
+        
+        
         ctrl1 = QPointF(source_pos.x() + 100, source_pos.y())
         ctrl2 = QPointF(dest_pos.x() - 100, dest_pos.y())
         
         path.cubicTo(ctrl1, ctrl2, dest_pos)
         self.setPath(path)
     
-    def remove(self):
-        """Remove the connection and references to it"""
-        
+    def toJson(self):
+        """Convert connection to JSON serializable dict"""
         
-        source_node = None
-        dest_node = None
+        return {
+            "source_node": self.source_socket.node.id,
+            "source_socket": self.source_socket.index,
+            "dest_node": self.dest_socket.node.id,
+            "dest_socket": self.dest_socket.index
+        }
+    
+    def remove(self):
+        """
+        Remove the connection and references to it
         
+        Items already deleted by a cleared scene are skipped, so tearing an
+        editor down in any order is safe.
+        """
         
-        if self.source_socket:
-            source_node = self.source_socket.node
+        if self.source_socket and not sip.isdeleted(self.source_socket):
             self.source_socket.removeConnection(self)
             
-        if self.dest_socket:
-            dest_node = self.dest_socket.node
+        if self.dest_socket and not sip.isdeleted(self.dest_socket):
             self.dest_socket.setConnection(None)
         
         
-        self.scene.removeItem(self)
+        if not sip.isdeleted(self) and QGraphicsItem.scene(self) is not None:
+            self.scene.removeItem(self)
+
+class ButtonItem(QGraphicsRectItem):
+    """Push button painted directly in the scene, without an embedded widget"""
+    
+    def __init__(self, parent, text, rect, callback, font_size=9):
+        """
+        Initialize a button
+        
+        Args:
+            parent: The item the button belongs to
+            text: Button label
+            rect: Button rect in the parent's coordinates
+            callback: Called without arguments when the button is clicked
+            font_size: Label point size
+        """
+        super().__init__(rect, parent)
+        
+        self.text = text
+        self.callback = callback
+        self.font = GLYPH_CACHE.font(font_size)
+        self.hovered = False
+        self.pressed = False
+        
+        self.setAcceptHoverEvents(True)
+        self.setAcceptedMouseButtons(Qt.LeftButton)
+        self.setCacheMode(ITEM_CACHE_MODE)
+    
+    def setText(self, text):
+        """Change the label"""
+        
+        if text != self.text:
+            self.text = text
+            self.update()
+    
+    def paint(self, painter, option, widget=None):
+        """Draw a rounded button with its label"""
+        
+        color = BUTTON_COLOR
+        if self.pressed:
+            color = color.darker(130)
+        elif self.hovered:
+            color = color.lighter(130)
+        
+        painter.setPen(QPen(BUTTON_BORDER_COLOR, 1))
+        painter.setBrush(QBrush(color))
+        rect = self.rect()
+        painter.drawRoundedRect(rect, 3, 3)
+        
+        size = GLYPH_CACHE.size(self.text, self.font)
+        label = QRectF(rect.center().x() - size.width() / 2, rect.center().y() - size.height() / 2,
+                       size.width(), size.height())
+        GLYPH_CACHE.draw(painter, label, self.text, self.font, TEXT_COLOR)
+    
+    def hoverEnterEvent(self, event):
+        self.hovered = True
+        self.update()
+        super().hoverEnterEvent(event)
+    
+    def hoverLeaveEvent(self, event):
+        self.hovered = False
+        self.update()
+        super().hoverLeaveEvent(event)
+    
+    def mousePressEvent(self, event):
+        """Press the button, keeping the click from starting a drag or selection"""
+        
+        self.pressed = True
+        self.update()
+        event.accept()
+    
+    def mouseReleaseEvent(self, event):
+        """Click if the mouse is released over the button"""
+        
+        clicked = self.pressed and self.contains(event.pos())
+        self.pressed = False
+        self.update()
+        event.accept()
+        if clicked:
+            self.callback()
 
 class Node(QGraphicsRectItem):
     """Base class for nodes in the editor"""
@@ -300,11 +585,13 @@ class Node(QGraphicsRectItem):
         self.setRect(0, 0, NODE_WIDTH, NODE_HEIGHT)
         self.setBrush(QBrush(QColor(60, 60, 60, 230)))
         self.setPen(QPen(QColor(20, 20, 20), 2))
+        self.setCacheMode(ITEM_CACHE_MODE)
         
         
         self.header = QGraphicsRectItem(0, 0, NODE_WIDTH, 30, self)
         self.header.setBrush(QBrush(QColor(80, 80, 80, 230)))
         self.header.setPen(QPen(QColor(20, 20, 20), 1))
+        self.header.setCacheMode(ITEM_CACHE_MODE)
         
         
         self.setFlag(QGraphicsItem.ItemIsMovable)
@@ -312,9 +599,7 @@ class Node(QGraphicsRectItem):
         self.setFlag(QGraphicsItem.ItemSendsGeometryChanges)
         
         
-        self.title_item = QGraphicsTextItem(title, self)
-        self.title_item.setDefaultTextColor(QColor(255, 255, 255))
-        self.title_item.setFont(QFont("Arial", 10, QFont.Bold))
+        self.title_item = TextItem(title, GLYPH_CACHE.font(10), TEXT_COLOR, self)
         
         
         title_width = self.title_item.boundingRect().width()
@@ -337,6 +622,23 @@ class Node(QGraphicsRectItem):
         
         scene.addItem(self)
     
+    def setDetail(self, detail):
+        """Show the header, text, sockets and widgets only at full detail"""
+        
+        for child in self.childItems():
+            child.setVisible(detail == DETAIL_FULL)
+        self.update()
+    
+    def paint(self, painter, option, widget=None):
+        """Draw the node, as a single filled rect when zoomed out"""
+        
+        if self.scene.detail == DETAIL_FULL:
+            super().paint(painter, option, widget)
+            return
+        
+        color = self.brush().color()
+        painter.fillRect(self.rect(), color.lighter(160) if self.isSelected() else color)
+    
     def createConnectionIndicators(self):
         """Create indicators that show connection status"""
         indicator_radius = 5
@@ -367,14 +669,14 @@ class Node(QGraphicsRectItem):
         
         if self.input_indicator:
             
-            all_inputs_connected = all(socket.isConnected() for socket in self.input_sockets)
+            all_inputs_connected = all(self.isSocketConnected(socket) for socket in self.input_sockets)
             self.input_indicator.setBrush(QBrush(
                 QColor(0, 180, 0) if all_inputs_connected else QColor(180, 0, 0)
             ))
         
         
         if self.output_indicator:
-            output_connected = any(socket.isConnected() for socket in self.output_sockets)
+            output_connected = any(self.isSocketConnected(socket) for socket in self.output_sockets)
             self.output_indicator.setBrush(QBrush(
                 QColor(0, 180, 0) if output_connected else QColor(180, 0, 0)
             ))
@@ -402,13 +704,10 @@ class Node(QGraphicsRectItem):
         Returns:
             Boolean value from the connected node, or None if not connected
         """
-        if index < len(self.input_sockets):
-            socket = self.input_sockets[index]
-            if socket.isConnected() and socket.connection and socket.connection.source_socket:
-                source_node = socket.connection.source_socket.node
-                source_index = source_node.output_sockets.index(socket.connection.source_socket)
-                return source_node.getOutputValue(source_index)
-        return None
+        node_editor = self.getNodeEditor()
+        if node_editor is None or index >= len(self.input_sockets):
+            return None
+        return node_editor.getSourceValue(self.id, index)
     
     def getOutputValue(self, index):
         """
@@ -418,10 +717,34 @@ class Node(QGraphicsRectItem):
             index: Index of the output socket
             
         Returns:
-            Boolean value calculated by the node
+            Boolean value calculated by the editor's compiled netlist, or None
+            if the node is not fully connected
         """
         
-        return False
+        node_editor = self.getNodeEditor()
+        if node_editor is None:
+            return None
+        return node_editor.getNodeValue(self)
+    
+    def getNodeEditor(self):
+        """Get the node editor showing this node, if any"""
+        
+        return getattr(self.scene, "node_editor", None)
+    
+    def invalidateNetlist(self):
+        """Tell the node editor that the circuit structure has changed"""
+        
+        node_editor = self.getNodeEditor()
+        if node_editor is not None:
+            node_editor.invalidateNetlist()
+    
+    def isSocketConnected(self, socket):
+        """Check whether a socket is connected in the circuit, even to a node that is not shown"""
+        
+        node_editor = self.getNodeEditor()
+        if node_editor is None:
+            return socket.isConnected()
+        return node_editor.isSocketConnected(self.id, socket)
     
     def getInputCount(self):
         """Get the number of input sockets"""
@@ -436,7 +759,25 @@ class Node(QGraphicsRectItem):
     def itemChange(self, change, value):
         """Handle item changes such as movement"""
         
-        if change == QGraphicsItem.ItemPositionHasChanged:
+        if change == QGraphicsItem.ItemSceneHasChanged:
+            
+            node_editor = self.getNodeEditor()
+            if node_editor is not None:
+                node_editor.indexNode(self, value is not None)
+        
+        elif change == QGraphicsItem.ItemPositionChange:
+            
+            views = self.scene.views()
+            if views and views[0].dragging_item:
+                views[0].node_editor.recordMove(self, self.pos(), value)
+        
+        elif change == QGraphicsItem.ItemPositionHasChanged:
+            
+            node_editor = self.getNodeEditor()
+            if node_editor is not None:
+                node_editor.model.moveNode(self.id, value.x(), value.y())
+            if self.scene.bulk_loading:
+                return super().itemChange(change, value)
             
             for socket in self.input_sockets:
                 if socket.isConnected():
@@ -448,26 +789,6 @@ class Node(QGraphicsRectItem):
                     for connection in socket.getConnections():
                         if connection:
                             connection.updatePath()
-            
-            
-            
-            for socket in self.output_sockets:
-                for connection in socket.getConnections():
-                    if connection and connection.dest_socket:
-                        dest_node = connection.dest_socket.node
-                        
-                        dest_node.update()
-                        
-                        
-                        if isinstance(dest_node, OutputNode):
-                            index = dest_node.input_sockets.index(connection.dest_socket)
-                            dest_node.getInputValue(index)
-            
-            
-            views = self.scene.views()
-            if views:
-                node_editor = views[0].node_editor
-                node_editor.saveState()
         
         return super().itemChange(change, value)
     
@@ -482,42 +803,17 @@ class Node(QGraphicsRectItem):
         }
 
 class InputNode(Node):
-    """Input node with editable value"""
+    """Input node with a value toggled by clicking it"""
     
     def __init__(self, scene):
         super().__init__(scene, "Input", 0, 1)
         
         
-        self.input_field = QLineEdit("0")
-        self.input_field.setMaximumWidth(80)
-        self.input_field.setStyleSheet("""
-            QLineEdit {
-                background-color: 
-                color: white;
-                border: 1px solid 
-                border-radius: 3px;
-                padding: 3px;
-                font-size: 18px;
-                font-weight: bold;
-            }
-        """)
-        self.input_field.textChanged.connect(self.valueChanged)
-        
-        
-        self.input_field.setMaxLength(1)
-        self.input_field.setValidator(QRegExpValidator(QRegExp("[01]")))
-        
-        
-        self.proxy = QGraphicsProxyWidget(self)
-        self.proxy.setWidget(self.input_field)
-        
-        
-        x = (NODE_WIDTH - self.input_field.width()) / 2
-        y = (NODE_HEIGHT - self.input_field.height()) / 2 + 5  
-        self.proxy.setPos(x, y)
-        
-        
         self.value = False
+        self.toggle = ButtonItem(
+            self, "0", QRectF((NODE_WIDTH - 40) / 2, (NODE_HEIGHT - 36) / 2 + 5, 40, 36),
+            self.toggleValue, font_size=14
+        )
         
         
         self.updateConnectionIndicators()
@@ -526,77 +822,39 @@ class InputNode(Node):
         """Override to only show output indicator for InputNode"""
         
         if self.output_indicator:
-            output_connected = any(socket.isConnected() for socket in self.output_sockets)
+            output_connected = any(self.isSocketConnected(socket) for socket in self.output_sockets)
             self.output_indicator.setBrush(QBrush(
                 QColor(0, 180, 0) if output_connected else QColor(180, 0, 0)
             ))
     
-    def valueChanged(self, text):
-        """Handle input field value changes"""
+    def toggleValue(self):
+        """Flip the value when the toggle is clicked"""
         
-        try:
-            
-            old_value = self.value
-            if text.lower() in ["true", "1"]:
-                self.value = True
-            else:
-                self.value = False
-            
-            
-            if old_value != self.value:
-                
-                views = self.scene.views()
-                if views:
-                    node_editor = views[0].node_editor
-                    node_editor.setUnsavedChanges(True)
-                    
-                    node_editor.saveState()
-                
-                
-                self.propagateUpdate()
-            
-        except Exception as e:
-            print(f"Error updating value: {str(e)}")
+        self.valueChanged(not self.value)
     
-    def propagateUpdate(self):
-        """Propagate update to all connected nodes"""
-        visited = set()  
-        nodes_to_update = set()
-        
-        
-        for socket in self.output_sockets:
-            if socket.isConnected():
-                for connection in socket.getConnections():
-                    if connection and connection.dest_socket:
-                        dest_node = connection.dest_socket.node
-                        self._collectNodesToUpdate(dest_node, visited, nodes_to_update)
+    def valueChanged(self, value):
+        """Set a new value from the user, recording it for undo and propagating it"""
         
+        old_value = self.value
+        self.showValue(value)
+        if old_value == self.value:
+            return
         
-        for node in nodes_to_update:
+        views = self.scene.views()
+        if views:
+            node_editor = views[0].node_editor
+            node_editor.setUnsavedChanges(True)
             
-            node.update()
+            node_editor.pushCommand(SetInputCommand(self.id, old_value, self.value))
             
             
-            if isinstance(node, OutputNode):
-                for i in range(len(node.input_sockets)):
-                    
-                    node.getInputValue(i)
+            node_editor.model.setValue(self.id, self.value)
     
-    def _collectNodesToUpdate(self, node, visited, nodes_to_update):
-        """Recursively collect all nodes that need to be updated"""
-        if node in visited:
-            return
-        
-        visited.add(node)
-        nodes_to_update.add(node)
-        
+    def showValue(self, value):
+        """Show a value that is already in the model, without recording or propagating it"""
         
-        for socket in node.output_sockets:
-            if socket.isConnected():
-                for connection in socket.getConnections():
-                    if connection and connection.dest_socket:
-                        dest_node = connection.dest_socket.node
-                        self._collectNodesToUpdate(dest_node, visited, nodes_to_update)
+        self.value = bool(value)
+        self.toggle.setText("1" if value else "0")
     
     def getOutputValue(self, index):
         """Get the output value"""
@@ -613,7 +871,7 @@ class InputNode(Node):
     def fromJson(self, data):
         """Load from JSON data"""
         
-        self.input_field.setText(data.get("value", "0"))
+        self.showValue(data.get("value", "0") == "1")
 
 class OutputNode(Node):
     """Output node that displays the result"""
@@ -622,9 +880,7 @@ class OutputNode(Node):
         super().__init__(scene, "Output", 1, 0)
         
         
-        self.value_text = QGraphicsTextItem("0", self)
-        self.value_text.setDefaultTextColor(QColor(255, 255, 255))
-        self.value_text.setFont(QFont("Arial", 24, QFont.Bold))
+        self.value_text = TextItem("0", GLYPH_CACHE.font(24), TEXT_COLOR, self)
         
         
         self.updateValuePosition()
@@ -645,7 +901,7 @@ class OutputNode(Node):
         
         if self.input_indicator:
             
-            input_connected = any(socket.isConnected() for socket in self.input_sockets)
+            input_connected = any(self.isSocketConnected(socket) for socket in self.input_sockets)
             self.input_indicator.setBrush(QBrush(
                 QColor(0, 180, 0) if input_connected else QColor(180, 0, 0)
             ))
@@ -671,6 +927,91 @@ class OutputNode(Node):
         
         return value
 
+class MinimizeTask(QObject):
+    """Builds and minimizes the truth table of one output on a worker thread"""
+    
+    progress = pyqtSignal(int)
+    finished = pyqtSignal(str)
+    failed = pyqtSignal(str)
+    
+    def __init__(self, parent, netlist, inputs, node, max_terms=MINIMIZE_TERMS):
+        """
+        Args:
+            parent: QObject owning the task
+            netlist: The compiled Netlist; it is only read
+            inputs: Input node indices of the output's cone
+            node: Index of the output node
+            max_terms: Limit on the terms of each form
+        """
+        super().__init__(parent)
+        
+        self.netlist = netlist
+        self.inputs = inputs
+        self.node = node
+        self.max_terms = max_terms
+        self.value = -1
+        self.cancelled = False
+        self.done = False
+        self.lock = threading.Lock()
+        self.thread = None
+    
+    def start(self):
+        """Minimize on a worker thread"""
+        
+        self.thread = threading.Thread(target=self.run, name="minimize", daemon=True)
+        self.thread.start()
+    
+    def cancel(self):
+        """
+        Stop the minimization
+        
+        Returns:
+            False if it had already finished, in which case its result is
+            still delivered
+        """
+        with self.lock:
+            if self.done:
+                return False
+            self.cancelled = True
+            return True
+    
+    def _progress(self, done, total):
+        """Minimize progress callback; nothing is emitted once cancelled, as the task may be deleted"""
+
+        value = 1000 * done // total
+        with self.lock:
+            if self.cancelled:
+                return False
+            if value != self.value:
+                self.value = value
+                self.progress.emit(value)
+            return True
+    
+    def _finish(self):
+        """Mark the task finished; return False if it was cancelled first"""
+        
+        with self.lock:
+            if self.cancelled:
+                return False
+            self.done = True
+            return True
+    
+    def run(self):
+        """Build the truth table and minimize both forms"""
+        
+        try:
+            table = truthTable(self.netlist, self.inputs, [self.node])
+            sop, pos = minimizeTable(table, max_terms=self.max_terms, progress=self._progress)
+        except MinimizeCancelled:
+            return
+        except Exception as e:
+            if self._finish():
+                self.failed.emit(str(e))
+            return
+        if self._finish():
+            self.finished.emit(f"Minimized SOP: {sop}\nMinimized POS: {pos}")
+
+
 class WriteOutputNode(OutputNode):
     """Output node that can write results to a file"""
     
@@ -684,31 +1025,9 @@ class WriteOutputNode(OutputNode):
         self.updateValuePosition()
         
         
-        self.write_button = QPushButton("Write")
-        self.write_button.setMaximumWidth(80)
-        self.write_button.setStyleSheet("""
-            QPushButton {
-                background-color: 
-                color: white;
-                border: 1px solid 
-                border-radius: 3px;
-                padding: 4px;
-                font-weight: bold;
-            }
-            QPushButton:hover {
-                background-color: 
-            }
-            QPushButton:pressed {
-                background-color: 
-            }
-        """)
-        self.write_button.clicked.connect(self.writeOutput)
-        
-        
-        self.button_proxy = QGraphicsProxyWidget(self)
-        self.button_proxy.setWidget(self.write_button)
-        
-        self.button_proxy.setPos((NODE_WIDTH - self.write_button.width()) / 2, NODE_HEIGHT - 30)
+        self.write_button = ButtonItem(
+            self, "Write", QRectF((NODE_WIDTH - 80) / 2, NODE_HEIGHT - 30, 80, 24), self.writeOutput
+        )
         
         
         self.updateTitlePosition()
@@ -737,259 +1056,196 @@ class WriteOutputNode(OutputNode):
         return value
     
     def writeOutput(self):
-        """Write the current output value to a file"""
+        """Write the current output value to a file
+        
+        The file is written once the minimized forms are ready; if their
+        minimization is cancelled, it is written without them.
+        """
         
         value = self.getInputValue(0)
         
-        if value is not None:
-            
-            filePath, _ = QFileDialog.getSaveFileName(
-                None, "Save Output", "", "Text Files (*.txt);;All Files (*)"
-            )
-            
-            if filePath:
-                try:
-                    with open(filePath, 'w') as f:
-                        f.write(f"Logic Gate Output: {int(value)}\n\n")
-                        
-                        
-                        equation = self.deriveEquation()
-                        if equation:
-                            f.write(f"Logic Equation: {equation}")
-                except Exception as e:
-                    print(f"Error writing to file: {str(e)}")
-    
-    def deriveEquation(self):
-        """Derive the logic equation from the connected circuit"""
+        if value is None:
+            return
         
-        if not self.input_sockets or not self.input_sockets[0].isConnected():
-            return "No connected circuit"
+        filePath, _ = QFileDialog.getSaveFileName(
+            None, "Save Output", "", "Text Files (*.txt);;All Files (*)"
+        )
         
+        if not filePath:
+            return
         
-        input_socket = self.input_sockets[0]
-        if not input_socket.connection or not input_socket.connection.source_socket:
-            return "No connected circuit"
+        try:
+            equation = self.deriveEquation()
+            summary = self.describeFunction()
+        except Exception as e:
+            print(f"Error writing to file: {str(e)}")
+            return
+        
+        def write(minimized):
+            try:
+                with open(filePath, 'w') as f:
+                    f.write(f"Logic Gate Output: {int(value)}\n\n")
+                    
+                    if equation:
+                        f.write(f"Logic Equation: {equation}")
+                    
+                    if minimized:
+                        f.write(f"\n\n{minimized}")
+                    
+                    if summary:
+                        f.write(f"\n\n{summary}")
+            except Exception as e:
+                print(f"Error writing to file: {str(e)}")
         
-        source_node = input_socket.connection.source_socket.node
+        self.minimizeEquation(write)
+    
+    def describeFunction(self):
+        """Summarize the canonical function of this output from its BDD"""
         
+        node_editor = self.getNodeEditor()
+        if node_editor is None:
+            return None
         
-        input_node_map = {}
+        try:
+            functions = node_editor.getFunctions()
+        except BDDMemoryError as e:
+            return f"Function: too large to analyse ({str(e)})"
         
+        index = functions.netlist.index.get(self.id)
+        if index is None or functions.getFunction(index) is None:
+            return None
         
-        visited = set()
-        equation = self._buildEquation(source_node, visited, input_node_map)
-        return equation
+        rows = 1 << functions.getInputCount()
+        summary = f"Satisfying Assignments: {functions.satCount(index)} of {rows}"
+        if functions.isTautology(index):
+            summary += " (always 1)"
+        elif functions.isContradiction(index):
+            summary += " (always 0)"
+        return summary
     
-    def _buildEquation(self, node, visited, input_node_map):
-        """Recursively build the equation for a node"""
+    def minimizeEquation(self, callback):
+        """
+        Get minimal sum-of-products and product-of-sums forms of this output
         
-        if node.id in visited:
-            return "(...)"
+        The minimization runs on a worker thread behind a progress dialog
+        that can cancel it; each form is limited to MINIMIZE_TERMS terms.
         
-        visited.add(node.id)
+        Args:
+            callback: Called with the text, or with None if the output is not
+                      connected or the minimization was cancelled
+        """
+        node_editor = self.getNodeEditor()
+        netlist = node_editor.getNetlist() if node_editor is not None else None
+        index = netlist.index.get(self.id) if netlist is not None else None
+        if index is None or not netlist.defined[index]:
+            callback(None)
+            return
         
-        if isinstance(node, InputNode):
-            
-            if node.id not in input_node_map:
-                
-                letter = chr(65 + len(input_node_map))  
-                if len(input_node_map) >= 26:  
-                    letter = f"Input_{len(input_node_map) + 1}"
-                input_node_map[node.id] = letter
-            
-            
-            return input_node_map[node.id]
+        inputs, _ = netlist.getCone([index])
+        if len(inputs) > MAX_MINIMIZE_INPUTS:
+            callback(f"Minimized Equation: too many inputs ({len(inputs)}, the limit is {MAX_MINIMIZE_INPUTS})")
+            return
         
-        elif isinstance(node, AndNode):
-            
-            inputs = []
-            for i in range(node.getInputCount()):
-                if i < len(node.input_sockets) and node.input_sockets[i].isConnected():
-                    socket = node.input_sockets[i]
-                    if socket.connection and socket.connection.source_socket:
-                        source = socket.connection.source_socket.node
-                        input_eq = self._buildEquation(source, visited.copy(), input_node_map)
-                        inputs.append(input_eq)
-            
-            if not inputs:
-                return "0"  
-            
-            
-            inputs = [f"({inp})" if ' ' in inp and not (inp.startswith('(') and inp.endswith(')')) else inp for inp in inputs]
-            
-            
-            return " * ".join(inputs)
+        task = MinimizeTask(node_editor, netlist, inputs, index)
+        progress = QProgressDialog("Minimizing equation...", "Cancel", 0, 1000, node_editor)
+        progress.setWindowTitle("Write Output")
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(500)
+        
+        def done(text):
+            progress.reset()
+            progress.deleteLater()
+            task.deleteLater()
+            callback(text)
+        
+        def cancel():
+            if task.cancel():
+                done(None)
+        
+        task.progress.connect(progress.setValue)
+        task.finished.connect(done)
+        task.failed.connect(lambda message: done(f"Minimized Equation: failed ({message})"))
+        progress.canceled.connect(cancel)
+        task.start()
+    
+    def contextMenuEvent(self, event):
+        """Offer the write actions from a context menu"""
+        
+        menu = QMenu()
+        writeAction = menu.addAction("Write Output...")
+        tableAction = menu.addAction("Write Truth Table...")
+        
+        chosen = menu.exec_(event.screenPos())
+        if chosen == writeAction:
+            self.writeOutput()
+        elif chosen == tableAction:
+            self.writeTruthTable()
+        event.accept()
+    
+    def buildTruthTable(self):
+        """
+        Build the exhaustive truth table of this output over the inputs in its cone
         
-        elif isinstance(node, OrNode):
-            
-            inputs = []
-            for i in range(node.getInputCount()):
-                if i < len(node.input_sockets) and node.input_sockets[i].isConnected():
-                    socket = node.input_sockets[i]
-                    if socket.connection and socket.connection.source_socket:
-                        source = socket.connection.source_socket.node
-                        input_eq = self._buildEquation(source, visited.copy(), input_node_map)
-                        inputs.append(input_eq)
-            
-            if not inputs:
-                return "0"  
-            
-            
-            inputs = [f"({inp})" if ' ' in inp and not (inp.startswith('(') and inp.endswith(')')) else inp for inp in inputs]
-            
-            
-            return " + ".join(inputs)
+        Returns:
+            A TruthTable, or None if the output is not connected
+        """
+        node_editor = self.getNodeEditor()
+        if node_editor is None:
+            return None
         
-        elif isinstance(node, NotNode):
-            
-            if node.getInputCount() > 0 and node.input_sockets[0].isConnected():
-                socket = node.input_sockets[0]
-                if socket.connection and socket.connection.source_socket:
-                    source = socket.connection.source_socket.node
-                    input_eq = self._buildEquation(source, visited.copy(), input_node_map)
-                    
-                    if ' ' in input_eq:
-                        return f"!({input_eq})"
-                    else:
-                        return f"!{input_eq}"
-            
-            return "1"  
+        netlist = node_editor.getNetlist()
+        index = netlist.index.get(self.id)
+        if index is None or not netlist.defined[index]:
+            return None
         
-        elif isinstance(node, NandNode):
-            
-            inputs = []
-            for i in range(node.getInputCount()):
-                if i < len(node.input_sockets) and node.input_sockets[i].isConnected():
-                    socket = node.input_sockets[i]
-                    if socket.connection and socket.connection.source_socket:
-                        source = socket.connection.source_socket.node
-                        input_eq = self._buildEquation(source, visited.copy(), input_node_map)
-                        inputs.append(input_eq)
-            
-            if not inputs:
-                return "1"  
-            
-            
-            inputs = [f"({inp})" if ' ' in inp and not (inp.startswith('(') and inp.endswith(')')) else inp for inp in inputs]
-            
-            
-            return f"!({' * '.join(inputs)})"
+        return truthTable(netlist, outputs=[index])
+    
+    def writeTruthTable(self):
+        """Write the truth table of the connected circuit to a file"""
         
-        elif isinstance(node, NorNode):
-            
-            inputs = []
-            for i in range(node.getInputCount()):
-                if i < len(node.input_sockets) and node.input_sockets[i].isConnected():
-                    socket = node.input_sockets[i]
-                    if socket.connection and socket.connection.source_socket:
-                        source = socket.connection.source_socket.node
-                        input_eq = self._buildEquation(source, visited.copy(), input_node_map)
-                        inputs.append(input_eq)
-            
-            if not inputs:
-                return "1"  
-            
-            
-            inputs = [f"({inp})" if ' ' in inp and not (inp.startswith('(') and inp.endswith(')')) else inp for inp in inputs]
-            
-            
-            return f"!({' + '.join(inputs)})"
+        try:
+            table = self.buildTruthTable()
+        except CircuitError as e:
+            print(f"Error building truth table: {str(e)}")
+            return
         
-        elif isinstance(node, XorNode):
-            
-            inputs = []
-            for i in range(node.getInputCount()):
-                if i < len(node.input_sockets) and node.input_sockets[i].isConnected():
-                    socket = node.input_sockets[i]
-                    if socket.connection and socket.connection.source_socket:
-                        source = socket.connection.source_socket.node
-                        input_eq = self._buildEquation(source, visited.copy(), input_node_map)
-                        inputs.append(input_eq)
-            
-            if not inputs:
-                return "0"  
-            
-            if len(inputs) == 1:
-                return inputs[0]  
-            
-            
-            if len(inputs) == 2:
-                a, b = inputs
-                if ' ' in a:
-                    a = f"({a})"
-                if ' ' in b:
-                    b = f"({b})"
-                return f"{a} ^ {b}"
-            
-            
-            result = inputs[0]
-            for i in range(1, len(inputs)):
-                a = result
-                b = inputs[i]
-                if ' ' in a:
-                    a = f"({a})"
-                if ' ' in b:
-                    b = f"({b})"
-                result = f"{a} ^ {b}"
-            return result
-        
-        elif isinstance(node, XnorNode):
-            
-            inputs = []
-            for i in range(node.getInputCount()):
-                if i < len(node.input_sockets) and node.input_sockets[i].isConnected():
-                    socket = node.input_sockets[i]
-                    if socket.connection and socket.connection.source_socket:
-                        source = socket.connection.source_socket.node
-                        input_eq = self._buildEquation(source, visited.copy(), input_node_map)
-                        inputs.append(input_eq)
-            
-            if not inputs:
-                return "1"  
-            
-            if len(inputs) == 1:
-                
-                input_eq = inputs[0]
-                if ' ' in input_eq:
-                    return f"!({input_eq})"
-                else:
-                    return f"!{input_eq}"
-            
-            
-            if len(inputs) == 2:
-                a, b = inputs
-                if ' ' in a:
-                    a = f"({a})"
-                if ' ' in b:
-                    b = f"({b})"
-                return f"!({a} ^ {b})"
-            
-            
-            result = inputs[0]
-            for i in range(1, len(inputs)):
-                a = result
-                b = inputs[i]
-                if ' ' in a:
-                    a = f"({a})"
-                if ' ' in b:
-                    b = f"({b})"
-                if i == len(inputs) - 1:
-                    
-                    result = f"!({a} ^ {b})"
-                else:
-                    
-                    result = f"{a} ^ {b}"
-            return result
+        if table is None:
+            return
+        
+        filePath, _ = QFileDialog.getSaveFileName(
+            None, "Save Truth Table", "", "Text Files (*.txt);;All Files (*)"
+        )
+        
+        if filePath:
+            try:
+                with open(filePath, 'w') as f:
+                    equation = self.deriveEquation()
+                    if equation:
+                        f.write(f"Logic Equation: {equation}\n\n")
+                    table.write(f)
+            except Exception as e:
+                print(f"Error writing to file: {str(e)}")
+    
+    def deriveEquation(self):
+        """Derive the logic equation from the connected circuit, naming shared subterms once"""
+        
+        if not self.input_sockets or not self.isSocketConnected(self.input_sockets[0]):
+            return "No connected circuit"
+        
+        node_editor = self.getNodeEditor()
+        if node_editor is None:
+            return "No connected circuit"
         
+        netlist = node_editor.getNetlist()
+        index = netlist.index.get(self.id)
+        if index is None:
+            return "No connected circuit"
         
-        return f"Node_{node.id[:4]}"
+        return str(deriveEquation(netlist, index))
 
 class LogicGateNode(Node):
     """Base class for logic gate nodes"""
     
-    
-    _symbol_cache = {}
-    
     def __init__(self, scene, title, inputs=2, outputs=1):
         super().__init__(scene, title, inputs, outputs)
         
@@ -997,9 +1253,7 @@ class LogicGateNode(Node):
         symbol_text = self.getSymbolText()
         
         
-        self.symbol_text = QGraphicsTextItem(symbol_text, self)
-        self.symbol_text.setDefaultTextColor(QColor(220, 220, 220))
-        self.symbol_text.setFont(QFont("Arial", 20, QFont.Bold))
+        self.symbol_text = TextItem(symbol_text, GLYPH_CACHE.font(20), SYMBOL_COLOR, self)
         
         
         self.updateSymbolPosition()
@@ -1025,17 +1279,6 @@ class AndNode(LogicGateNode):
     def getSymbolText(self):
         
         return "∧"
-    
-    def getOutputValue(self, index):
-        """Implement AND logic"""
-        
-        input1 = self.getInputValue(0)
-        input2 = self.getInputValue(1)
-        
-        if input1 is None or input2 is None:
-            return None
-        
-        return input1 and input2
 
 class OrNode(LogicGateNode):
     """OR gate node"""
@@ -1046,17 +1289,6 @@ class OrNode(LogicGateNode):
     def getSymbolText(self):
         
         return "∨"
-    
-    def getOutputValue(self, index):
-        """Implement OR logic"""
-        
-        input1 = self.getInputValue(0)
-        input2 = self.getInputValue(1)
-        
-        if input1 is None or input2 is None:
-            return None
-        
-        return input1 or input2
 
 class NotNode(LogicGateNode):
     """NOT gate node"""
@@ -1067,16 +1299,6 @@ class NotNode(LogicGateNode):
     def getSymbolText(self):
         
         return "¬"
-    
-    def getOutputValue(self, index):
-        """Implement NOT logic"""
-        
-        input_val = self.getInputValue(0)
-        
-        if input_val is None:
-            return None
-        
-        return not input_val
 
 class NandNode(LogicGateNode):
     """NAND gate node"""
@@ -1087,17 +1309,6 @@ class NandNode(LogicGateNode):
     def getSymbolText(self):
         
         return "⊼"
-    
-    def getOutputValue(self, index):
-        """Implement NAND logic"""
-        
-        input1 = self.getInputValue(0)
-        input2 = self.getInputValue(1)
-        
-        if input1 is None or input2 is None:
-            return None
-        
-        return not (input1 and input2)
 
 class NorNode(LogicGateNode):
     """NOR gate node"""
@@ -1108,17 +1319,6 @@ class NorNode(LogicGateNode):
     def getSymbolText(self):
         
         return "⊽"
-    
-    def getOutputValue(self, index):
-        """Implement NOR logic"""
-        
-        input1 = self.getInputValue(0)
-        input2 = self.getInputValue(1)
-        
-        if input1 is None or input2 is None:
-            return None
-        
-        return not (input1 or input2)
 
 class XorNode(LogicGateNode):
     """XOR gate node"""
@@ -1129,17 +1329,6 @@ class XorNode(LogicGateNode):
     def getSymbolText(self):
         
         return "⊕"
-    
-    def getOutputValue(self, index):
-        """Implement XOR logic"""
-        
-        input1 = self.getInputValue(0)
-        input2 = self.getInputValue(1)
-        
-        if input1 is None or input2 is None:
-            return None
-        
-        return input1 != input2
 
 class XnorNode(LogicGateNode):
     """XNOR gate node"""
@@ -1150,17 +1339,6 @@ class XnorNode(LogicGateNode):
     def getSymbolText(self):
         
         return "⊙"
-    
-    def getOutputValue(self, index):
-        """Implement XNOR logic"""
-        
-        input1 = self.getInputValue(0)
-        input2 = self.getInputValue(1)
-        
-        if input1 is None or input2 is None:
-            return None
-        
-        return input1 == input2
 
 class GridGraphicsView(QGraphicsView):
     """Graphics view with grid background and drop handling"""
@@ -1169,11 +1347,16 @@ class GridGraphicsView(QGraphicsView):
         super().__init__(scene)
         self.node_editor = node_editor
         self.setRenderHint(QPainter.Antialiasing)
-        self.setViewportUpdateMode(QGraphicsView.FullViewportUpdate)
+        self.setViewportUpdateMode(UPDATE_MODES[DEFAULT_UPDATE_MODE])
         self.setAcceptDrops(True)
         
         
         self.setDragMode(QGraphicsView.RubberBandDrag)
+        self.setTransformationAnchor(QGraphicsView.AnchorUnderMouse)
+        
+        
+        self.grid_key = None
+        self.grid_brush = None
         
         
         self.dragging_item = False
@@ -1183,43 +1366,91 @@ class GridGraphicsView(QGraphicsView):
         
         self.first_node_added = False
     
-    def drawBackground(self, painter, rect):
-        """Draw a grid in the background"""
-        super().drawBackground(painter, rect)
-        painter.fillRect(rect, self.backgroundBrush())
-
+    def setUpdateMode(self, name):
+        """
+        Choose how much of the viewport is repainted after a change
         
-        bg_color = self.backgroundBrush().color()
+        Args:
+            name: A key of UPDATE_MODES; "full" repaints everything, the others
+                  only the regions of the items that changed
+        """
+        self.setViewportUpdateMode(UPDATE_MODES[name])
+    
+    def getZoom(self):
+        """Get the view's scale factor"""
         
-        if bg_color.lightnessF() < 0.5:
-             grid_color = QColor(60, 60, 60, 150) 
-        else:
-             grid_color = QColor(220, 220, 220, 150) 
+        return self.transform().m11()
+    
+    def gridBrush(self):
+        """
+        Get a brush that paints the grid as a tiled pixmap
         
+        The grid spacing doubles until the lines are at least GRID_MIN_PIXELS
+        apart on screen. The tile is drawn once per spacing, zoom and
+        background colour and reused for every repaint.
+        """
+        zoom = self.getZoom()
+        step = GRID_SIZE
+        while step * zoom < GRID_MIN_PIXELS:
+            step *= 2
+        size = max(1, round(step * zoom))
+        bg_color = self.backgroundBrush().color()
         
-        painter.save()
+        key = (step, size, bg_color.rgba())
+        if key == self.grid_key:
+            return self.grid_brush
         
+        if bg_color.lightnessF() < 0.5:
+            grid_color = QColor(60, 60, 60, 150)
+        else:
+            grid_color = QColor(220, 220, 220, 150)
         
+        tile = QPixmap(size, size)
+        tile.fill(Qt.transparent)
+        painter = QPainter(tile)
         painter.setPen(QPen(grid_color, 1, Qt.SolidLine))
+        painter.drawLine(0, 0, size - 1, 0)
+        painter.drawLine(0, 1, 0, size - 1)
+        painter.end()
         
         
-        left = int(rect.left()) - (int(rect.left()) % GRID_SIZE)
-        top = int(rect.top()) - (int(rect.top()) % GRID_SIZE)
-        
-        
-        x = left
-        while x < rect.right():
-            painter.drawLine(x, rect.top(), x, rect.bottom())
-            x += GRID_SIZE
+        self.grid_brush = QBrush(tile)
+        self.grid_brush.setTransform(QTransform.fromScale(step / size, step / size))
+        self.grid_key = key
+        return self.grid_brush
+    
+    def drawBackground(self, painter, rect):
+        """Draw a grid in the background"""
+        super().drawBackground(painter, rect)
+        painter.fillRect(rect, self.backgroundBrush())
+        painter.fillRect(rect, self.gridBrush())
+    
+    def wheelEvent(self, event):
+        """Zoom around the cursor with Ctrl+wheel"""
         
+        if not event.modifiers() & Qt.ControlModifier:
+            super().wheelEvent(event)
+            return
         
-        y = top
-        while y < rect.bottom():
-            painter.drawLine(rect.left(), y, rect.right(), y)
-            y += GRID_SIZE
+        zoom = self.getZoom()
+        target = min(MAX_ZOOM, max(MIN_ZOOM, zoom * ZOOM_STEP ** (event.angleDelta().y() / 120)))
+        if target != zoom:
+            self.scale(target / zoom, target / zoom)
+            self.node_editor.updateDetail()
+            self.node_editor.scheduleMaterialize()
+        event.accept()
+    
+    def scrollContentsBy(self, dx, dy):
+        """Show the nodes scrolled into view"""
         
+        super().scrollContentsBy(dx, dy)
+        self.node_editor.scheduleMaterialize()
+    
+    def resizeEvent(self, event):
+        """Show the nodes uncovered by a resize"""
         
-        painter.restore()
+        super().resizeEvent(event)
+        self.node_editor.scheduleMaterialize()
     
     def mousePressEvent(self, event):
         """Track when we start dragging items or selection"""
@@ -1251,6 +1482,7 @@ class GridGraphicsView(QGraphicsView):
         """Handle mouse release events and mark unsaved changes if we were dragging a node or rubber band"""
         if self.dragging_item:
             self.node_editor.setUnsavedChanges(True)
+            self.node_editor.history.seal()
             self.dragging_item = False
         
         if self.is_selecting:
@@ -1289,20 +1521,17 @@ class GridGraphicsView(QGraphicsView):
                 if not self.first_node_added:
                     self.setCursor(Qt.WaitCursor)
                 
-                node_class = self.node_editor.node_types[node_type_name]
-                
-                
                 drop_pos = self.mapToScene(event.pos())
                 
-                node = node_class(self.scene())
-                
-                node.setPos(drop_pos.x() - NODE_WIDTH / 2, drop_pos.y() - NODE_HEIGHT / 2)
-                
-                
-                node.updateConnectionIndicators()
+                record = self.node_editor.createNode({
+                    "id": str(uuid.uuid4()),
+                    "type": node_type_name,
+                    "pos_x": drop_pos.x() - NODE_WIDTH / 2,
+                    "pos_y": drop_pos.y() - NODE_HEIGHT / 2
+                }, show=True)
                 
                 
-                self.node_editor.saveState()
+                self.node_editor.pushCommand(StructureCommand("Add Node", added_nodes=[dict(record)]))
                 
                 
                 self.node_editor.setUnsavedChanges(True)
@@ -1329,8 +1558,18 @@ class NodeEditor(QWidget):
         layout.setContentsMargins(0, 0, 0, 0)
         self.setLayout(layout)
         
-        self.scene = QGraphicsScene()
-        self.scene.setSceneRect(0, 0, 5000, 5000)
+        self.scene = CircuitScene(self)
+        self.scene.setSceneRect(0, 0, SCENE_SIZE, SCENE_SIZE)
+        
+        
+        self.model = CircuitModel()
+        self.model.subscribe(self.onModelChanged)
+        self.node_index = {}
+        self.connection_items = {}
+        self.item_pool = {}
+        self.materialize_timer = QTimer(self)
+        self.materialize_timer.setSingleShot(True)
+        self.materialize_timer.timeout.connect(self.materialize)
         
         
         
@@ -1347,13 +1586,22 @@ class NodeEditor(QWidget):
         self.source_socket = None
         
         
-        self.history = []
-        self.history_index = -1
+        self.history = UndoStack()
+        self.detached_connection = None
+        self.bulk_whole_scene = False
         self.clipboard = []
         
         
         self.file_path = None
         self.unsaved_changes = False
+        self.journal = None
+        self.saver = None
+        self.hibernated = None
+        
+        
+        self.netlist = None
+        self.simulator = None
+        self.functions = None
         
         
         self.node_types = {
@@ -1373,21 +1621,14 @@ class NodeEditor(QWidget):
         self._preloadFonts()
     
     def _preloadFonts(self):
-        """Preload fonts to avoid lag on first node creation"""
-        
-        
-        temp_text = QGraphicsTextItem("Preload Font")
-        temp_text.setFont(QFont("Arial", 20, QFont.Bold))
-        temp_text.setFont(QFont("Arial", 10, QFont.Bold))
-        
-        
-        temp_text.document().idealWidth()
-        
+        """Render the titles and symbols into the glyph cache to avoid lag on first node creation"""
         
+        for title in ["Input", "Output", "Write Output", "AND", "OR", "NOT", "NAND", "NOR", "XOR", "XNOR"]:
+            GLYPH_CACHE.pixmap(title, GLYPH_CACHE.font(10), TEXT_COLOR, 1.0)
         for symbol in ["∧", "∨", "¬", "⊼", "⊽", "⊕", "⊙"]:
-            temp_symbol = QGraphicsTextItem(symbol)
-            temp_symbol.setFont(QFont("Arial", 20, QFont.Bold))
-            temp_symbol.document().idealWidth()
+            GLYPH_CACHE.pixmap(symbol, GLYPH_CACHE.font(20), SYMBOL_COLOR, 1.0)
+        for value in ["0", "1"]:
+            GLYPH_CACHE.pixmap(value, GLYPH_CACHE.font(24), TEXT_COLOR, 1.0)
     
     def mouseMoveEvent(self, event):
         """Handle mouse movement for connection creation"""
@@ -1426,6 +1667,9 @@ class NodeEditor(QWidget):
         elif socket.isInput(): 
              if socket.isConnected():
                 
+                self.detached_connection = socket.connection.toJson()
+                self.connection_items.pop((socket.node.id, socket.index), None)
+                self.model.removeConnection(self.detached_connection)
                 self.temp_connection = socket.connection 
                 self.source_socket = self.temp_connection.source_socket 
                 socket.setConnection(None) 
@@ -1465,35 +1709,39 @@ class NodeEditor(QWidget):
 
             
             self.temp_connection.dest_socket = target_socket
+            self.connection_items[(target_socket.node.id, target_socket.index)] = self.temp_connection
+            self.model.addConnection(self.temp_connection.toJson())
             self.source_socket.setConnection(self.temp_connection)
             target_socket.setConnection(self.temp_connection)
             self.temp_connection.updatePath() 
             
             
-            if isinstance(self.source_socket.node, InputNode):
-                self.source_socket.node.propagateUpdate()
-            else:
-                
-                target_socket.node.update()
-                if isinstance(target_socket.node, OutputNode):
-                    index = target_socket.node.input_sockets.index(target_socket)
-                    target_socket.node.getInputValue(index)
+            self.refreshOutputs()
             
             
             self.source_socket.node.updateConnectionIndicators()
             target_socket.node.updateConnectionIndicators()
             
             
-            self.saveState()
+            removed = [self.detached_connection] if self.detached_connection else []
+            self.pushCommand(StructureCommand("Connect", added_connections=[self.temp_connection.toJson()],
+                                              removed_connections=removed))
                     
             self.setUnsavedChanges(True)
         else:
             
-            self.scene.removeItem(self.temp_connection)
+            self.temp_connection.remove()
+            
+            
+            if self.detached_connection is not None:
+                self.refreshOutputs()
+                self.pushCommand(StructureCommand("Disconnect", removed_connections=[self.detached_connection]))
+                self.setUnsavedChanges(True)
 
         
         self.temp_connection = None
         self.source_socket = None
+        self.detached_connection = None
 
     
     
@@ -1507,48 +1755,415 @@ class NodeEditor(QWidget):
         else:
             super().mouseReleaseEvent(event)
     
+    def beginBulkLoad(self, whole_scene=False):
+        """
+        Start constructing many items at once
+        
+        Items skip their indicator, path and simulation updates until
+        endBulkLoad. For a whole-scene load the BSP index, scene signals and
+        view updates are suspended as well.
+        
+        Args:
+            whole_scene: True when (re)building the whole scene
+        """
+        self.scene.bulk_loading = True
+        self.bulk_whole_scene = whole_scene
+        if whole_scene:
+            self.scene.setItemIndexMethod(QGraphicsScene.NoIndex)
+            self.scene.blockSignals(True)
+            self.view.setUpdatesEnabled(False)
+    
+    def endBulkLoad(self, nodes=None):
+        """
+        Finish a bulk construction and bring items up to date once
+        
+        Args:
+            nodes: Nodes whose indicators and connection paths need updating;
+                   defaults to every node in the scene
+        """
+        self.scene.bulk_loading = False
+        if self.bulk_whole_scene:
+            self.scene.blockSignals(False)
+            self.scene.setItemIndexMethod(QGraphicsScene.BspTreeIndex)
+            self.view.setUpdatesEnabled(True)
+            self.bulk_whole_scene = False
+            self.updateSceneRect()
+        
+        
+        self.invalidateNetlist()
+        self.materialize()
+        
+        
+        if nodes is None:
+            nodes = self.node_index.values()
+        paths = set()
+        for node in nodes:
+            node.updateConnectionIndicators()
+            for socket in node.input_sockets + node.output_sockets:
+                paths.update(socket.getConnections())
+        for connection in paths:
+            if connection:
+                connection.updatePath()
+        
+        
+        self.refreshOutputs()
+    
     def undo(self):
         """Undo the last action"""
         
-        if self.history_index > 0:
-            self.history_index -= 1
-            
-            
-            state = self.history[self.history_index]
-            self.loadFromJson(state)
-            
-            
+        if self.history.undo(self):
             self.setUnsavedChanges(True)
     
     def redo(self):
         """Redo the last undone action"""
         
-        if self.history_index < len(self.history) - 1:
-            self.history_index += 1
-            
-            
-            state = self.history[self.history_index]
-            self.loadFromJson(state)
-            
-            
+        if self.history.redo(self):
             self.setUnsavedChanges(True)
     
-    def saveState(self):
-        """Save current state to history"""
+    def pushCommand(self, command):
+        """Record an edit that has already been applied to the scene"""
+        
+        self.history.push(command)
+    
+    def recordMove(self, node, old_pos, new_pos):
+        """Record a node being dragged; moves of one drag merge into one command"""
+        
+        self.history.push(MoveNodesCommand({
+            node.id: ((old_pos.x(), old_pos.y()), (new_pos.x(), new_pos.y()))
+        }))
+    
+    def indexNode(self, node, present):
+        """Add a node to or drop it from the id index as it enters or leaves the scene"""
+        
+        if present:
+            self.node_index[node.id] = node
+        elif self.node_index.get(node.id) is node:
+            del self.node_index[node.id]
+    
+    def findNodes(self, node_ids):
+        """Get a dict of node id to Node for the given ids that are shown in the scene"""
+        
+        nodes = {}
+        for node_id in node_ids:
+            node = self.node_index.get(node_id)
+            if node is not None:
+                nodes[node_id] = node
+        return nodes
+    
+    def isSocketConnected(self, node_id, socket):
+        """Check whether a node's socket is connected in the model"""
+        
+        if socket.isInput():
+            return self.model.isInputConnected(node_id, socket.index)
+        return self.model.hasFanout(node_id)
+    
+    def getViewRect(self):
+        """Get the scene rectangle shown by the view"""
+        
+        return self.view.mapToScene(self.view.viewport().rect()).boundingRect()
+    
+    def updateSceneRect(self):
+        """Grow the scene rectangle to take in every node of the model"""
+        
+        rect = QRectF(0, 0, SCENE_SIZE, SCENE_SIZE)
+        bounds = self.model.getBounds()
+        if bounds is not None:
+            left, top, right, bottom = bounds
+            rect = rect.united(QRectF(left, top, right - left + NODE_WIDTH, bottom - top + NODE_HEIGHT)
+                               .adjusted(-VIEW_MARGIN, -VIEW_MARGIN, VIEW_MARGIN, VIEW_MARGIN))
+        self.scene.setSceneRect(rect)
+    
+    def updateDetail(self):
+        """Pick the level of detail for the view's zoom and apply it to the shown items"""
+        
+        zoom = self.view.getZoom()
+        if zoom < OVERVIEW_ZOOM:
+            detail = DETAIL_OVERVIEW
+        elif zoom < SIMPLE_ZOOM:
+            detail = DETAIL_SIMPLE
+        else:
+            detail = DETAIL_FULL
+        if detail == self.scene.detail:
+            return
+        
+        self.scene.detail = detail
+        for node in self.node_index.values():
+            node.setDetail(detail)
+        for connection in self.connection_items.values():
+            connection.setVisible(detail != DETAIL_OVERVIEW)
+            connection.updatePath()
+    
+    def scheduleMaterialize(self):
+        """Update the shown nodes once control returns to the event loop"""
+        
+        self.materialize_timer.start(0)
+    
+    def materialize(self):
+        """
+        Create items for the nodes in and around the viewport and recycle the rest
+        
+        Nodes within VIEW_MARGIN of the viewport are shown together with the
+        nodes they are connected to, so every wire leaving the viewport has
+        both ends. Selected nodes and the node a connection is being dragged
+        from are kept.
+        """
+        if self.scene.bulk_loading:
+            return
+        
+        rect = self.getViewRect()
+        visible = self.model.nodesInRect(rect.left() - NODE_WIDTH, rect.top() - NODE_HEIGHT,
+                                         rect.right(), rect.bottom(), VIEW_MARGIN)
+        wanted = set(visible)
+        for node_id in visible:
+            wanted.update(self.model.getNeighbors(node_id))
+        for item in self.scene.selectedItems():
+            if isinstance(item, Node):
+                wanted.add(item.id)
+        if self.source_socket is not None:
+            wanted.add(self.source_socket.node.id)
+        
+        stale = [node for node_id, node in self.node_index.items() if node_id not in wanted]
+        new = [node_id for node_id in wanted if node_id not in self.node_index]
+        if not stale and not new:
+            return
+        
+        
+        self.scene.bulk_loading = True
+        for node in stale:
+            self._dropNode(node)
+        built = [self._buildNode(self.model.getNode(node_id)) for node_id in new]
+        connections = []
+        for node in built:
+            for conn_data in self.model.getConnections(node.id):
+                key = (conn_data["dest_node"], conn_data["dest_socket"])
+                if key not in self.connection_items:
+                    connection = self._buildConnection(conn_data)
+                    if connection:
+                        connections.append(connection)
+        self.scene.bulk_loading = False
+        
+        
+        for node in built:
+            node.updateConnectionIndicators()
+            if isinstance(node, OutputNode):
+                node.getInputValue(0)
+        for connection in connections:
+            connection.updatePath()
+    
+    def _buildNode(self, record):
+        """Create or recycle the item showing a node record"""
+        
+        pool = self.item_pool.get(record["type"])
+        if pool:
+            node = pool.pop()
+            node.id = record["id"]
+            self.scene.addItem(node)
+        else:
+            node = self.node_types[record["type"]](self.scene)
+            self.indexNode(node, False)
+            node.id = record["id"]
+            self.indexNode(node, True)
+        
+        node.setPos(record["pos_x"], record["pos_y"])
+        if hasattr(node, "fromJson"):
+            node.fromJson(record)
+        node.setDetail(self.scene.detail)
+        return node
+    
+    def _dropNode(self, node):
+        """Take a node's item and its connection items out of the scene, keeping the model"""
+        
+        if sip.isdeleted(node):
+            
+            self.indexNode(node, False)
+            return
+        
+        for socket in node.input_sockets + node.output_sockets:
+            for connection in list(socket.getConnections()):
+                if connection:
+                    self._dropConnection(connection)
+        node.setSelected(False)
+        self.scene.removeItem(node)
+        
+        
+        pool = self.item_pool.setdefault(node.__class__.__name__, [])
+        if len(pool) < POOL_LIMIT:
+            pool.append(node)
+    
+    def _buildConnection(self, conn_data):
+        """Create the item showing a connection record if both of its nodes are shown"""
+        
+        source_node = self.node_index.get(conn_data["source_node"])
+        dest_node = self.node_index.get(conn_data["dest_node"])
+        if source_node is None or dest_node is None:
+            return None
+        
+        source_socket = source_node.output_sockets[conn_data["source_socket"]]
+        dest_socket = dest_node.input_sockets[conn_data["dest_socket"]]
+        connection = Connection(self.scene, source_socket, dest_socket)
+        source_socket.setConnection(connection)
+        dest_socket.setConnection(connection)
+        self.connection_items[(dest_node.id, dest_socket.index)] = connection
+        return connection
+    
+    def _dropConnection(self, connection):
+        """Take a connection item out of the scene, keeping the model"""
+        
+        if connection.dest_socket:
+            self.connection_items.pop((connection.dest_socket.node.id, connection.dest_socket.index), None)
+        connection.remove()
+    
+    def onModelChanged(self, event, *args):
+        """Keep the shown items and the compiled netlist in step with the model"""
+        
+        bulk_loading = self.scene.bulk_loading
+        if event == "connection_added":
+            record = args[0]
+            self.invalidateNetlist()
+            if (record["dest_node"], record["dest_socket"]) not in self.connection_items:
+                connection = self._buildConnection(record)
+                if connection is not None and not bulk_loading:
+                    connection.updatePath()
+            if not bulk_loading:
+                for node in self.findNodes([record["source_node"], record["dest_node"]]).values():
+                    node.updateConnectionIndicators()
+        
+        elif event == "connection_removed":
+            record = args[0]
+            self.invalidateNetlist()
+            connection = self.connection_items.get((record["dest_node"], record["dest_socket"]))
+            if connection is not None:
+                self._dropConnection(connection)
+            if not bulk_loading:
+                for node in self.findNodes([record["source_node"], record["dest_node"]]).values():
+                    node.updateConnectionIndicators()
+        
+        elif event == "node_added":
+            self.invalidateNetlist()
+            if not bulk_loading:
+                self.scheduleMaterialize()
+        
+        elif event == "node_removed":
+            self.invalidateNetlist()
+            node = self.node_index.get(args[0])
+            if node is not None:
+                self._dropNode(node)
+        
+        elif event == "node_moved":
+            node_id, x, y = args
+            node = self.node_index.get(node_id)
+            if node is None:
+                self.scheduleMaterialize()
+            elif node.pos().x() != x or node.pos().y() != y:
+                node.setPos(x, y)
+        
+        elif event == "value_changed":
+            node_id, value = args
+            node = self.node_index.get(node_id)
+            if isinstance(node, InputNode) and node.value != value:
+                node.showValue(value)
+            if not bulk_loading:
+                self.propagateInput(node_id, value)
+        
+        elif event == "reset":
+            self.scene.clear()
+            self.node_index = {}
+            self.connection_items = {}
+            self.temp_connection = None
+            self.source_socket = None
+            self.invalidateNetlist()
+    
+    def createNode(self, node_data, show=False):
+        """
+        Add a node to the circuit from its JSON data, keeping its id
+        
+        The node's item is created straight away when show is set; otherwise
+        it is created when the node comes into view.
+        
+        Returns:
+            The node's model record, or None if the type is unknown
+        """
+        record = self.model.addNode(node_data)
+        if record is not None and show:
+            node = self._buildNode(record)
+            node.updateConnectionIndicators()
+        return record
+    
+    def createConnection(self, conn_data):
+        """
+        Add a connection to the circuit from its JSON data
+        
+        Returns:
+            The connection's model record, or None if an endpoint is missing
+            or taken
+        """
+        return self.model.addConnection(conn_data)
+    
+    def removeConnectionRecord(self, conn_data):
+        """
+        Remove the connection matching some JSON data, if present
+        
+        Returns:
+            The removed model record, or None
+        """
+        return self.model.removeConnection(conn_data)
+    
+    def removeNode(self, node_id):
+        """
+        Remove a node and every connection attached to it
         
+        Returns:
+            (node record, list of removed connection records), or None if
+            the node is not in the circuit
+        """
+        return self.model.removeNode(node_id)
+    
+    def applyStructure(self, remove_connections, remove_nodes, add_nodes, add_connections):
+        """
+        Apply a structural edit to the circuit, touching only the affected items
+        
+        Args:
+            remove_connections: Connection JSON data to remove
+            remove_nodes: Ids of nodes to remove
+            add_nodes: Node JSON data to create
+            add_connections: Connection JSON data to create
+        """
+        self.beginBulkLoad()
         
-        if self.history_index < len(self.history) - 1:
-            self.history = self.history[:self.history_index + 1]
+        for conn_data in remove_connections:
+            self.removeConnectionRecord(conn_data)
         
+        for node_id in remove_nodes:
+            self.removeNode(node_id)
         
-        state = self.saveToJson()
-        self.history.append(state)
-        self.history_index = len(self.history) - 1
+        for node_data in add_nodes:
+            self.createNode(node_data)
         
+        for conn_data in add_connections:
+            self.createConnection(conn_data)
         
-        if len(self.history) > 20:
-            self.history = self.history[-20:]
-            self.history_index = len(self.history) - 1
+        
+        touched = set(node_data.get("id") for node_data in add_nodes)
+        for conn_data in list(remove_connections) + list(add_connections):
+            touched.add(conn_data.get("source_node"))
+            touched.add(conn_data.get("dest_node"))
+        self.endBulkLoad(self.findNodes(touched).values())
+    
+    def moveNodes(self, positions):
+        """
+        Move nodes to new positions
+        
+        Args:
+            positions: Dict of node id to (x, y)
+        """
+        for node_id, (x, y) in positions.items():
+            self.model.moveNode(node_id, x, y)
+    
+    def setInputValue(self, node_id, value):
+        """Set the value of an InputNode by id"""
+        
+        if self.model.getType(node_id) == "InputNode":
+            self.model.setValue(node_id, value)
     
     def cut(self):
         """Cut selected nodes to clipboard"""
@@ -1588,158 +2203,221 @@ class NodeEditor(QWidget):
             return
         
         
-        self.saveState()
+        added = []
         
         
         for item in self.scene.selectedItems():
             item.setSelected(False)
         
         
+        self.beginBulkLoad()
+        nodes = []
         for node_data in self.clipboard:
-            node_type = node_data["type"]
-            
-            if node_type in self.node_types:
-                node_class = self.node_types[node_type]
-                node = node_class(self.scene)
-                
-                
-                node.setPos(node_data["pos_x"] + 20, node_data["pos_y"] + 20)
-                
-                
+            record = self.createNode({
+                "id": str(uuid.uuid4()),
+                "type": node_data["type"],
+                "pos_x": node_data["pos_x"] + 20,
+                "pos_y": node_data["pos_y"] + 20
+            }, show=True)
+            
+            if record is not None:
+                node = self.node_index[record["id"]]
                 node.setSelected(True)
+                nodes.append(node)
+                added.append(dict(record))
+        self.endBulkLoad(nodes)
         
         
+        self.pushCommand(StructureCommand("Paste", added_nodes=added))
         self.setUnsavedChanges(True)
     
     def delete(self):
         """Delete selected items"""
         
         
-        self.saveState()
-        
-        
         selected_items = self.scene.selectedItems()
         
         
-        affected_nodes = set()
+        removed_nodes = []
+        removed_connections = []
+        touched = set()
+        self.beginBulkLoad()
         for item in selected_items:
-            if isinstance(item, Connection):
-                if item.source_socket:
-                    affected_nodes.add(item.source_socket.node)
-                if item.dest_socket:
-                    affected_nodes.add(item.dest_socket.node)
-                item.remove()
+            if isinstance(item, Connection) and item.source_socket and item.dest_socket:
+                record = self.removeConnectionRecord(item.toJson())
+                if record is not None:
+                    removed_connections.append(record)
         
         
         for item in selected_items:
             if isinstance(item, Node):
-                
-                for socket in item.input_sockets + item.output_sockets:
-                    if socket.isConnected():
-                        for conn in socket.getConnections():
-                            if conn:
-                                
-                                if socket.isInput() and conn.source_socket:
-                                    affected_nodes.add(conn.source_socket.node)
-                                elif socket.isOutput() and conn.dest_socket:
-                                    affected_nodes.add(conn.dest_socket.node)
-                                conn.remove()
-                
-                
-                self.scene.removeItem(item)
-                if item in affected_nodes:
-                    affected_nodes.remove(item)
+                removed = self.removeNode(item.id)
+                if removed is not None:
+                    removed_nodes.append(removed[0])
+                    removed_connections.extend(removed[1])
         
         
-        for node in affected_nodes:
-            node.updateConnectionIndicators()
+        for conn_data in removed_connections:
+            touched.add(conn_data["source_node"])
+            touched.add(conn_data["dest_node"])
+        self.endBulkLoad(self.findNodes(touched).values())
         
         
+        if selected_items:
+            self.pushCommand(StructureCommand("Delete", removed_nodes=removed_nodes,
+                                              removed_connections=removed_connections))
         self.setUnsavedChanges(True)
     
     def saveToJson(self):
         """Save the current node editor state to JSON"""
         
-        data = {
-            "nodes": [],
-            "connections": []
-        }
+        return self.model.toJson()
+    
+    def loadFromJson(self, data, bulk=True):
+        """
+        Load node editor state from JSON
         
+        Args:
+            data: Dict with "nodes" and "connections" lists
+            bulk: Fill the model and create items only for the nodes in view;
+                  otherwise every node's item is created as it is added
+        """
         
-        for item in self.scene.items():
-            if isinstance(item, Node):
-                node_data = item.toJson()
-                data["nodes"].append(node_data)
+        self.model.clear()
         
         
-        for item in self.scene.items():
-            if isinstance(item, Connection) and item.source_socket and item.dest_socket:
-                connection_data = {
-                    "source_node": item.source_socket.node.id,
-                    "source_socket": item.source_socket.index,
-                    "dest_node": item.dest_socket.node.id,
-                    "dest_socket": item.dest_socket.index
-                }
-                data["connections"].append(connection_data)
+        if bulk:
+            self.beginBulkLoad(whole_scene=True)
         
-        return data
-    
-    def loadFromJson(self, data):
-        """Load node editor state from JSON"""
+        for node_data in data.get("nodes", []):
+            self.createNode(node_data, show=not bulk)
         
         
-        self.scene.clear()
-        self.temp_connection = None
-        self.source_socket = None
+        for conn_data in data.get("connections", []):
+            self.createConnection(conn_data)
         
         
-        nodes = {}
+        if bulk:
+            self.endBulkLoad()
+            return
         
+        for node in self.node_index.values():
+            node.updateConnectionIndicators()
         
-        for node_data in data.get("nodes", []):
-            node_type = node_data.get("type")
-            node_id = node_data.get("id")
+        
+        self.updateSceneRect()
+        self.refreshOutputs()
+    
+    def invalidateNetlist(self):
+        """Drop the compiled netlist after a structural change"""
+        
+        self.netlist = None
+        self.simulator = None
+        self.functions = None
+    
+    def getNetlist(self):
+        """Get the compiled netlist for the circuit, compiling it if needed"""
+        
+        if self.netlist is None:
+            self.netlist = self.model.getNetlist()
+            self.simulator = Simulator(self.netlist)
+        
+        return self.netlist
+    
+    def getFunctions(self):
+        """Get the BDDs of the circuit's output cones, building them if needed"""
+        
+        netlist = self.getNetlist()
+        if self.functions is None:
+            self.functions = CircuitFunctions(netlist)
+        return self.functions
+    
+    def propagateInput(self, node_id, value):
+        """
+        Propagate a changed InputNode value and refresh only the shown nodes it changed
+        
+        Args:
+            node_id: Id of the InputNode whose value changed
+            value: The new value
+        """
+        if self.netlist is None:
             
-            if node_type in self.node_types:
-                node_class = self.node_types[node_type]
-                node = node_class(self.scene)
-                
-                
-                node.setPos(node_data.get("pos_x", 0), node_data.get("pos_y", 0))
-                
-                
-                node.id = node_id
-                
-                
-                nodes[node_id] = node
-                
-                
-                if hasattr(node, "fromJson"):
-                    node.fromJson(node_data)
+            self.refreshOutputs()
+            return
         
+        index = self.netlist.index.get(node_id)
+        if index is None:
+            return
         
-        for conn_data in data.get("connections", []):
-            source_node_id = conn_data.get("source_node")
-            source_socket_idx = conn_data.get("source_socket")
-            dest_node_id = conn_data.get("dest_node")
-            dest_socket_idx = conn_data.get("dest_socket")
+        ids = self.netlist.ids
+        for changed in self.simulator.setInput(index, value):
+            item = self.node_index.get(ids[changed])
+            if item is None:
+                continue
+            item.update()
+            if isinstance(item, OutputNode):
+                item.getInputValue(0)
+    
+    def refreshOutputs(self):
+        """Recompute and redisplay every shown output node after a structural change"""
+        
+        self.getNetlist()
+        ids = self.netlist.ids
+        for index in self.netlist.outputs:
+            item = self.node_index.get(ids[index])
+            if item is not None:
+                item.getInputValue(0)
+    
+    def getHistoryStats(self):
+        """Get the undo history's entry count, estimated bytes and undo depth reached"""
+        
+        return self.history.getStats()
+    
+    def setHistoryBudget(self, budget):
+        """Set the estimated number of bytes the undo history may hold"""
+        
+        self.history.setBudget(budget)
+    
+    def getSimulationStats(self):
+        """Get the simulator's evaluation counters for the current netlist"""
+        
+        self.getNetlist()
+        return self.simulator.getStats()
+    
+    def getNodeValue(self, node):
+        """
+        Get the simulated output value of a node
+        
+        Args:
+            node: A node in this editor's scene
             
-            if (source_node_id in nodes and dest_node_id in nodes and
-                source_socket_idx < len(nodes[source_node_id].output_sockets) and
-                dest_socket_idx < len(nodes[dest_node_id].input_sockets)):
-                
-                source_socket = nodes[source_node_id].output_sockets[source_socket_idx]
-                dest_socket = nodes[dest_node_id].input_sockets[dest_socket_idx]
-                
-                
-                connection = Connection(self.scene, source_socket, dest_socket)
-                source_socket.setConnection(connection)
-                dest_socket.setConnection(connection)
-                connection.updatePath()
+        Returns:
+            True or False, or None if the node is not fully connected
+        """
+        return self.getValueById(node.id)
+    
+    def getValueById(self, node_id):
+        """Get the simulated output value of a node by id, or None if it is not fully connected"""
         
+        netlist = self.getNetlist()
+        index = netlist.index.get(node_id)
+        if index is None:
+            
+            self.invalidateNetlist()
+            netlist = self.getNetlist()
+            index = netlist.index.get(node_id)
+            if index is None:
+                return None
         
-        for node in nodes.values():
-            node.updateConnectionIndicators()
+        return self.simulator.getValue(index)
+    
+    def getSourceValue(self, node_id, index):
+        """Get the value driving input socket index of a node, or None if it is unconnected"""
+        
+        source_id = self.model.getSource(node_id, index)
+        if source_id is None:
+            return None
+        return self.getValueById(source_id)
     
     def setFilePath(self, path):
         """Set the file path for this editor"""
@@ -1760,3 +2438,134 @@ class NodeEditor(QWidget):
         """Check if there are unsaved changes"""
         
         return self.unsaved_changes
+    
+    def finishSave(self):
+        """Wait for a background save to finish and ignore its completion signals"""
+        
+        if self.saver is not None:
+            self.saver.wait()
+            self.saver = None
+    
+    def startJournal(self, path=None):
+        """
+        Start autosaving edits to a journal on a worker thread
+        
+        Args:
+            path: Journal file to append to; defaults to the journal of the
+                  editor's file, or a new file in the autosave directory
+        """
+        self.stopJournal(discard=False, wait=True)
+        if path is None:
+            path = journalPath(self.file_path) if self.file_path else untitledJournalPath()
+        self.journal = Journal(path, self.file_path)
+        self.journal.attach(self.model)
+    
+    def stopJournal(self, discard=True, wait=False):
+        """
+        Stop autosaving, deleting the journal unless discard is False
+        
+        Args:
+            discard: Delete the journal file
+            wait: Wait briefly for the journal to be written instead of
+                  letting it finish in the background
+        
+        Returns:
+            None if the journal finished, or was left to finish in the
+            background; otherwise a message saying why it did not
+        """
+        journal = self.journal
+        if journal is None:
+            return None
+        self.journal = None
+        if journal.close(discard, wait):
+            return None
+        return journal.error
+    
+    def rebaseJournal(self):
+        """Start the journal over after the circuit was saved to its file path"""
+        
+        if self.journal is None:
+            self.startJournal()
+        else:
+            self.journal.rebase(self.file_path, journalPath(self.file_path))
+    
+    def recoverJournal(self, path):
+        """
+        Replay the edits in a journal left by a crash on top of the loaded circuit
+        
+        Returns:
+            The number of records replayed
+        """
+        self.beginBulkLoad(whole_scene=True)
+        try:
+            count = replayJournal(self.model, path)
+        finally:
+            self.endBulkLoad()
+        if count:
+            self.setUnsavedChanges(True)
+        return count
+    
+    def hibernate(self):
+        """
+        Free the scene of an inactive tab, keeping the circuit compressed
+        
+        Every graphics item, pooled item and compiled netlist is dropped and
+        the model is packed into bytes. The undo history, clipboard and
+        journal are kept, so wake restores the tab as it was.
+        
+        Returns:
+            True if the editor was hibernated
+        """
+        if self.hibernated is not None or self.scene.bulk_loading or self.temp_connection:
+            return False
+        
+        self.materialize_timer.stop()
+        self.scene.clear()
+        self.node_index = {}
+        self.connection_items = {}
+        self.item_pool = {}
+        self.source_socket = None
+        self.invalidateNetlist()
+        self.hibernated = self.model.pack()
+        return True
+    
+    def wake(self):
+        """Restore a hibernated editor and rebuild the items in view"""
+        
+        if self.hibernated is None:
+            return
+        self.model.unpack(self.hibernated)
+        self.hibernated = None
+        self.materialize()
+        self.refreshOutputs()
+    
+    def release(self):
+        """Drop the scene, history and clipboard of an editor whose tab was closed"""
+        
+        self.materialize_timer.stop()
+        self.hibernated = None
+        self.model.clear()
+        self.model.unsubscribe(self.onModelChanged)
+        self.item_pool = {}
+        self.history.clear()
+        self.clipboard = []
+        self.detached_connection = None
+    
+    def getMemoryUsage(self):
+        """
+        Get an estimate of the memory held by the editor
+        
+        Returns:
+            A dict of model bytes (compressed when hibernated), item counts,
+            history bytes and clipboard entries
+        """
+        return {
+            "nodes": len(self.model) if self.hibernated is None else None,
+            "hibernated": self.hibernated is not None,
+            "model_bytes": self.model.getMemoryUsage() if self.hibernated is None else len(self.hibernated),
+            "node_items": len(self.node_index),
+            "connection_items": len(self.connection_items),
+            "pooled_items": sum(len(pool) for pool in self.item_pool.values()),
+            "history_bytes": self.history.getBytes(),
+            "clipboard_entries": len(self.clipboard)
+        }
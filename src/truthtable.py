@@ -0,0 +1,193 @@
+"""Bit-parallel truth table generation.
+
+Each input combination is one bit position in a Python int, so a single pass
+over the netlist evaluates a whole block of combinations at once with plain
+bitwise operators.
+"""
+
+import sys
+import argparse
+
+from engine import CircuitError, inputLabel, loadCircuit
+
+
+MAX_TABLE_INPUTS = 30
+BLOCK_BITS = 12
+
+
+def inputPattern(bit, width_bits, base=0):
+    """
+    Get the packed word for one input over a block of rows
+
+    Row r of the table assigns input bit position p the value (r >> p) & 1.
+
+    Args:
+        bit: Bit position of the input within the row number
+        width_bits: log2 of the number of rows in the block
+        base: Row number of the first row in the block (a multiple of the
+              block size)
+
+    Returns:
+        Int with bit i set when the input is 1 in row base + i
+    """
+    width = 1 << width_bits
+    if bit >= width_bits:
+        return (1 << width) - 1 if (base >> bit) & 1 else 0
+
+    half = 1 << bit
+    word = ((1 << half) - 1) << half
+    period = half << 1
+    while period < width:
+        word |= word << period
+        period <<= 1
+    return word
+
+
+class TruthTable:
+    """Exhaustive truth table with one packed column per output"""
+
+    def __init__(self, labels, output_labels, columns):
+        """
+        Initialize a truth table
+
+        Args:
+            labels: Label per input, most significant row bit first
+            output_labels: Label per output
+            columns: Int per output with bit r holding the output for row r,
+                     or None if the output is not fully connected
+        """
+        self.labels = list(labels)
+        self.output_labels = list(output_labels)
+        self.columns = list(columns)
+
+    def getRowCount(self):
+        """Get the number of rows, 2 ** number of inputs"""
+
+        return 1 << len(self.labels)
+
+    def getValue(self, row, output=0):
+        """Get one output value for a row, or None if it is undefined"""
+
+        column = self.columns[output]
+        if column is None:
+            return None
+        return (column >> row) & 1
+
+    def getOnsetCount(self, output=0):
+        """Get the number of rows for which an output is 1"""
+
+        column = self.columns[output]
+        if column is None:
+            return None
+        return bin(column).count("1")
+
+    def write(self, f):
+        """Write the table as text, one row per input combination"""
+
+        count = len(self.labels)
+        rows = self.getRowCount()
+        f.write(" ".join(self.labels) + " | " + " ".join(self.output_labels) + "\n")
+
+        digits = []
+        for column in self.columns:
+            if column is None:
+                digits.append("X" * rows)
+            else:
+                digits.append(format(column, f"0{rows}b")[::-1])
+
+        low_bits = min(count, 8)
+        high_bits = count - low_bits
+        low_prefixes = [" ".join(format(low, f"0{low_bits}b")) if low_bits else "" for low in range(1 << low_bits)]
+        for high in range(1 << high_bits):
+            high_prefix = " ".join(format(high, f"0{high_bits}b")) + " " if high_bits else ""
+            base = high << low_bits
+            lines = []
+            for low, low_prefix in enumerate(low_prefixes):
+                row = base + low
+                outputs = " ".join(column[row] for column in digits)
+                lines.append(f"{high_prefix}{low_prefix} | {outputs}\n")
+            f.write("".join(lines))
+
+
+def truthTable(netlist, inputs=None, outputs=None, block_bits=BLOCK_BITS):
+    """
+    Build an exhaustive truth table with bit-parallel evaluation
+
+    Args:
+        netlist: The compiled Netlist
+        inputs: Input node indices to enumerate, first one most significant;
+                defaults to the inputs of the outputs' cone. Inputs that are
+                not enumerated keep their stored value.
+        outputs: Node indices to tabulate; defaults to every output node
+        block_bits: log2 of the number of rows evaluated per pass
+
+    Returns:
+        A TruthTable
+    """
+    if outputs is None:
+        outputs = list(netlist.outputs)
+    cone_inputs, order = netlist.getCone(outputs)
+    if inputs is None:
+        inputs = cone_inputs
+
+    count = len(inputs)
+    if count > MAX_TABLE_INPUTS:
+        raise CircuitError(f"Truth table has {count} inputs, the limit is {MAX_TABLE_INPUTS}")
+
+    width_bits = min(count, block_bits)
+    width = 1 << width_bits
+    mask = (1 << width) - 1
+    blocks = 1 << (count - width_bits)
+
+    values = [0] * len(netlist)
+    for node, value in zip(netlist.inputs, netlist.input_values):
+        values[node] = mask if value else 0
+
+    patterns = [inputPattern(count - 1 - position, width_bits) for position in range(count)]
+    chunks = [[] for _ in outputs]
+    for block in range(blocks):
+        base = block << width_bits
+        for position, node in enumerate(inputs):
+            bit = count - 1 - position
+            values[node] = patterns[position] if bit < width_bits else inputPattern(bit, width_bits, base)
+
+        netlist.propagate(values, mask, order)
+        for chunk, node in zip(chunks, outputs):
+            chunk.append(values[node])
+
+    columns = []
+    for chunk, node in zip(chunks, outputs):
+        if not netlist.defined[node]:
+            columns.append(None)
+        elif width >= 8:
+            columns.append(int.from_bytes(b"".join(word.to_bytes(width // 8, "little") for word in chunk), "little"))
+        else:
+            columns.append(chunk[0])
+
+    labels = [inputLabel(position) for position in range(count)]
+    if len(outputs) == 1:
+        output_labels = ["F"]
+    else:
+        output_labels = [f"F{position + 1}" for position in range(len(outputs))]
+    return TruthTable(labels, output_labels, columns)
+
+
+def main(argv=None):
+    """Print the truth table of a .circuit file"""
+
+    parser = argparse.ArgumentParser(description="Write the exhaustive truth table of a circuit")
+    parser.add_argument("circuit", help="Path to a .circuit or .circuitb file")
+    parser.add_argument("-o", "--output", help="Output file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    netlist = loadCircuit(args.circuit)
+    table = truthTable(netlist)
+    if args.output:
+        with open(args.output, 'w') as f:
+            table.write(f)
+    else:
+        table.write(sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
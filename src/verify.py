@@ -0,0 +1,285 @@
+"""Sharded exhaustive verification.
+
+The input space of a circuit is split into shards of whole bit-parallel
+blocks and checked on a ProcessPoolExecutor. Each worker receives the
+compiled netlist once through the pool initializer; shards only carry their
+block range.
+"""
+
+import os
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from engine import CircuitError, compileCircuit
+from truthtable import inputPattern
+from circuitfile import readCircuit
+
+
+BLOCK_BITS = 16
+SHARDS_PER_WORKER = 8
+MAX_CHECK_INPUTS = 40
+
+
+class VerificationResult:
+    """Merged statistics of an exhaustive check"""
+
+    def __init__(self, input_ids, output_ids):
+        self.input_ids = list(input_ids)
+        self.output_ids = list(output_ids)
+        self.onset_counts = [0] * len(output_ids)
+        self.counterexamples = [None] * len(output_ids)
+        self.vectors = 0
+        self.total_vectors = 1 << len(input_ids)
+        self.elapsed = 0.0
+        self.cancelled = False
+
+    def merge(self, shard):
+        """Merge the result of one shard"""
+
+        vectors, onsets, counterexamples = shard
+        self.vectors += vectors
+        for position, onset in enumerate(onsets):
+            if onset is None:
+                self.onset_counts[position] = None
+            elif self.onset_counts[position] is not None:
+                self.onset_counts[position] += onset
+
+        for position, row in enumerate(counterexamples):
+            if row is None:
+                continue
+            current = self.counterexamples[position]
+            if current is None or row < current:
+                self.counterexamples[position] = row
+
+    def getRate(self):
+        """Get the throughput in vectors per second"""
+
+        if self.elapsed <= 0:
+            return 0.0
+        return self.vectors / self.elapsed
+
+    def isEquivalent(self):
+        """Check if no counterexample was found in a completed check"""
+
+        return not self.cancelled and all(row is None for row in self.counterexamples)
+
+    def getAssignment(self, row):
+        """Map a row number to a dict of input id to value, first input most significant"""
+
+        count = len(self.input_ids)
+        return {node_id: (row >> (count - 1 - position)) & 1 for position, node_id in enumerate(self.input_ids)}
+
+
+_worker = None
+
+
+class _ShardWorker:
+    """Per-process state: the netlist, reference and precomputed patterns"""
+
+    def __init__(self, netlist, inputs, outputs, block_bits, reference, expected):
+        self.netlist = netlist
+        self.inputs = inputs
+        self.outputs = outputs
+        self.block_bits = block_bits
+        self.expected = expected
+        _, self.order = netlist.getCone(outputs)
+
+        count = len(inputs)
+        self.mask = (1 << (1 << block_bits)) - 1
+        self.patterns = [inputPattern(count - 1 - position, block_bits) for position in range(count)]
+
+        self.reference = None
+        if reference is not None:
+            self.reference = self._bindReference(compileCircuit(reference))
+
+    def _bindReference(self, reference):
+        """Match reference inputs to ours by id, falling back to input order"""
+
+        netlist = self.netlist
+        ids = [netlist.ids[node] for node in self.inputs]
+        if all(node_id in reference.index for node_id in ids):
+            ref_inputs = [reference.index[node_id] for node_id in ids]
+        else:
+            ref_inputs, _ = reference.getCone(list(reference.outputs))
+            if len(ref_inputs) != len(ids):
+                raise CircuitError("Reference circuit has a different number of inputs")
+
+        ref_outputs = list(reference.outputs)
+        if len(ref_outputs) != len(self.outputs):
+            raise CircuitError("Reference circuit has a different number of outputs")
+
+        _, ref_order = reference.getCone(ref_outputs)
+        return reference, ref_inputs, ref_outputs, ref_order
+
+    def run(self, first_block, last_block):
+        """Check the blocks in [first_block, last_block)"""
+
+        netlist = self.netlist
+        mask = self.mask
+        block_bits = self.block_bits
+        count = len(self.inputs)
+        defined = netlist.defined
+
+        values = [0] * len(netlist)
+        for node, value in zip(netlist.inputs, netlist.input_values):
+            values[node] = mask if value else 0
+
+        ref_values = None
+        if self.reference is not None:
+            reference, ref_inputs, ref_outputs, ref_order = self.reference
+            ref_values = [0] * len(reference)
+            for node, value in zip(reference.inputs, reference.input_values):
+                ref_values[node] = mask if value else 0
+
+        onsets = [0 if defined[node] else None for node in self.outputs]
+        counterexamples = [None] * len(self.outputs)
+        words = [0] * count
+
+        for block in range(first_block, last_block):
+            base = block << block_bits
+            for position, node in enumerate(self.inputs):
+                bit = count - 1 - position
+                word = self.patterns[position] if bit < block_bits else inputPattern(bit, block_bits, base)
+                words[position] = word
+                values[node] = word
+
+            netlist.propagate(values, mask, self.order)
+
+            expected = None
+            if ref_values is not None:
+                for node, word in zip(ref_inputs, words):
+                    ref_values[node] = word
+                reference.propagate(ref_values, mask, ref_order)
+                expected = [ref_values[node] if reference.defined[node] else None for node in ref_outputs]
+            elif self.expected is not None:
+                expected = self.expected(words, mask)
+
+            for position, node in enumerate(self.outputs):
+                if onsets[position] is None:
+                    continue
+                word = values[node]
+                onsets[position] += bin(word).count("1")
+                if expected is None or expected[position] is None:
+                    continue
+                if counterexamples[position] is None:
+                    diff = (word ^ expected[position]) & mask
+                    if diff:
+                        counterexamples[position] = base + (diff & -diff).bit_length() - 1
+
+        return (last_block - first_block) << block_bits, onsets, counterexamples
+
+
+def _initWorker(*args):
+    """Pool initializer: build the shard worker once per process"""
+
+    global _worker
+    _worker = _ShardWorker(*args)
+
+
+def _runShard(first_block, last_block):
+    """Pool task: check one shard with the process's worker"""
+
+    return _worker.run(first_block, last_block)
+
+
+def exhaustiveCheck(data, reference=None, expected=None, workers=None, block_bits=BLOCK_BITS, progress=None):
+    """
+    Simulate every input combination of a circuit across worker processes
+
+    Inputs are the InputNodes in the cone of the outputs, first one most
+    significant in the row numbering. Inputs outside the cone do not affect
+    the outputs and are not enumerated.
+
+    Args:
+        data: Circuit data as produced by NodeEditor.saveToJson
+        reference: Optional circuit data of the expected behaviour; inputs
+                   are matched by id, or by order when the ids differ, and
+                   outputs by order
+        expected: Optional picklable callable (input_words, mask) -> list of
+                  expected output words, used when no reference is given;
+                  a None word leaves that output unchecked, as do outputs
+                  that are undefined in the reference
+        workers: Number of processes; 0 checks in this process
+        block_bits: log2 of the number of vectors evaluated per pass
+        progress: Optional callable (result) called after each shard; if it
+                  returns False the check is cancelled
+
+    Returns:
+        A VerificationResult
+    """
+    netlist = compileCircuit(data)
+    outputs = list(netlist.outputs)
+    inputs, _ = netlist.getCone(outputs)
+
+    count = len(inputs)
+    if count > MAX_CHECK_INPUTS:
+        raise CircuitError(f"Circuit has {count} inputs, the limit is {MAX_CHECK_INPUTS}")
+
+    block_bits = min(count, block_bits)
+    blocks = 1 << (count - block_bits)
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    result = VerificationResult([netlist.ids[node] for node in inputs], [netlist.ids[node] for node in outputs])
+    start = time.perf_counter()
+    init_args = (netlist, inputs, outputs, block_bits, reference, expected)
+
+    if workers <= 1 or blocks == 1:
+        worker = _ShardWorker(*init_args)
+        step = max(1, blocks // SHARDS_PER_WORKER)
+        for first in range(0, blocks, step):
+            result.merge(worker.run(first, min(blocks, first + step)))
+            result.elapsed = time.perf_counter() - start
+            if progress is not None and progress(result) is False:
+                result.cancelled = True
+                break
+        return result
+
+    shard_count = min(blocks, workers * SHARDS_PER_WORKER)
+    bounds = [blocks * shard // shard_count for shard in range(shard_count + 1)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_initWorker, initargs=init_args) as pool:
+        futures = [pool.submit(_runShard, bounds[shard], bounds[shard + 1]) for shard in range(shard_count)]
+        for future in as_completed(futures):
+            result.merge(future.result())
+            result.elapsed = time.perf_counter() - start
+            if progress is not None and progress(result) is False:
+                result.cancelled = True
+                for pending in futures:
+                    pending.cancel()
+                break
+
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+def main(argv=None):
+    """Exhaustively simulate a .circuit file, optionally against a reference"""
+
+    parser = argparse.ArgumentParser(description="Exhaustively simulate a circuit")
+    parser.add_argument("circuit", help="Path to a .circuit or .circuitb file")
+    parser.add_argument("--reference", help="Circuit file with the expected behaviour")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes")
+    args = parser.parse_args(argv)
+
+    data = readCircuit(args.circuit)
+    reference = None
+    if args.reference:
+        reference = readCircuit(args.reference)
+
+    def report(result):
+        percent = 100.0 * result.vectors / result.total_vectors
+        print(f"\r{percent:5.1f}%  {result.getRate():,.0f} vectors/s", end="", flush=True)
+
+    result = exhaustiveCheck(data, reference, workers=args.workers, progress=report)
+    print()
+    for position, output_id in enumerate(result.output_ids):
+        line = f"{output_id}: onset {result.onset_counts[position]} of {result.total_vectors}"
+        row = result.counterexamples[position]
+        if row is not None:
+            line += f", counterexample at row {row}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
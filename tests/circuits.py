@@ -0,0 +1,76 @@
+"""Random circuits and a gate-by-gate reference evaluator for the tests"""
+
+import random
+
+from engine import NODE_OPCODES, OPCODE_ARITY, evaluateGate
+
+
+GATE_TYPES = ["AndNode", "OrNode", "NotNode", "NandNode", "NorNode", "XorNode", "XnorNode"]
+
+
+def randomCircuit(seed, input_count=4, gate_count=12, output_count=3):
+    """
+    Build circuit data where every gate reads earlier nodes
+
+    Inputs are named A, B, ... and outputs Y0, Y1, ...; every socket is
+    connected, so all outputs are defined.
+    """
+    rng = random.Random(seed)
+    nodes = []
+    connections = []
+
+    def add(node_id, node_type, **extra):
+        nodes.append(dict({"id": node_id, "type": node_type,
+                           "pos_x": float(100 * len(nodes)), "pos_y": float(rng.randrange(0, 1000, 10))}, **extra))
+        return node_id
+
+    def connect(source, dest, socket):
+        connections.append({"source_node": source, "source_socket": 0, "dest_node": dest, "dest_socket": socket})
+
+    sources = [add(chr(65 + position), "InputNode", value=rng.choice("01")) for position in range(input_count)]
+    for gate in range(gate_count):
+        node_type = rng.choice(GATE_TYPES)
+        node_id = add(f"g{gate}", node_type)
+        for socket in range(OPCODE_ARITY[NODE_OPCODES[node_type]]):
+            connect(rng.choice(sources), node_id, socket)
+        sources.append(node_id)
+
+    for output in range(output_count):
+        node_id = add(f"Y{output}", "OutputNode")
+        connect(sources[-1 - output], node_id, 0)
+
+    return {"nodes": nodes, "connections": connections}
+
+
+def referenceValues(data, assignment):
+    """
+    Evaluate circuit data gate by gate with evaluateGate
+
+    Args:
+        data: Circuit data whose nodes only read earlier nodes
+        assignment: Dict of input id to 0 or 1
+
+    Returns:
+        Dict of node id to 0 or 1
+    """
+    fanin = {}
+    for conn_data in data["connections"]:
+        fanin.setdefault(conn_data["dest_node"], {})[conn_data["dest_socket"]] = conn_data["source_node"]
+
+    values = {}
+    for node_data in data["nodes"]:
+        node_id = node_data["id"]
+        op = NODE_OPCODES[node_data["type"]]
+        if node_data["type"] == "InputNode":
+            values[node_id] = assignment[node_id]
+            continue
+        operands = [values[fanin[node_id][socket]] for socket in range(OPCODE_ARITY[op])]
+        values[node_id] = evaluateGate(op, *operands)
+    return values
+
+
+def canonical(data):
+    """Get circuit data in an order-independent form for comparisons"""
+
+    return (sorted(tuple(sorted(node_data.items())) for node_data in data["nodes"]),
+            sorted(tuple(sorted(conn_data.items())) for conn_data in data["connections"]))
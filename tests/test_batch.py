@@ -0,0 +1,78 @@
+import pytest
+
+from engine import CircuitError, compileCircuit
+from batch import simulateVectors
+
+
+def notCircuit():
+    """A single input A driving an output through a NotNode"""
+
+    return compileCircuit({
+        "nodes": [{"id": "A", "type": "InputNode"}, {"id": "n", "type": "NotNode"},
+                  {"id": "Y", "type": "OutputNode"}],
+        "connections": [{"source_node": "A", "source_socket": 0, "dest_node": "n", "dest_socket": 0},
+                        {"source_node": "n", "source_socket": 0, "dest_node": "Y", "dest_socket": 0}],
+    })
+
+
+def andCircuit():
+    """Inputs A and B driving an output through an AndNode"""
+
+    return compileCircuit({
+        "nodes": [{"id": "A", "type": "InputNode"}, {"id": "B", "type": "InputNode"},
+                  {"id": "g", "type": "AndNode"}, {"id": "Y", "type": "OutputNode"}],
+        "connections": [{"source_node": "A", "source_socket": 0, "dest_node": "g", "dest_socket": 0},
+                        {"source_node": "B", "source_socket": 0, "dest_node": "g", "dest_socket": 1},
+                        {"source_node": "g", "source_socket": 0, "dest_node": "Y", "dest_socket": 0}],
+    })
+
+
+def run(tmp_path, netlist, text, name="vectors.txt", chunk_rows=1024):
+    in_path = tmp_path / name
+    out_path = tmp_path / "out.txt"
+    in_path.write_text(text)
+    count = simulateVectors(netlist, str(in_path), str(out_path), chunk_rows)
+    return count, out_path.read_text().splitlines()
+
+
+def testPackedAndSeparatedRows(tmp_path):
+    count, lines = run(tmp_path, andCircuit(), "00\n0 1\n# comment\n\n10\n1 1\n", chunk_rows=3)
+    assert count == 4
+    assert lines == ["Y", "0", "0", "0", "1"]
+
+
+def testOneWordHeaderIsNotSplit(tmp_path):
+    count, lines = run(tmp_path, notCircuit(), "A\n0\n1\n")
+    assert count == 2
+    assert lines == ["Y", "1", "0"]
+
+
+def testUnknownOneWordHeader(tmp_path):
+    with pytest.raises(CircuitError, match="in0"):
+        run(tmp_path, notCircuit(), "in0\n0\n")
+
+
+def testHeaderSetsColumnOrder(tmp_path):
+    _, lines = run(tmp_path, andCircuit(), "B,A\n1,0\n1,1\n", name="vectors.csv")
+    assert lines == ["Y", "0", "1"]
+
+
+def testMultiCharacterToken(tmp_path):
+    with pytest.raises(CircuitError, match="line 2: expected 1 values per vector, got 2"):
+        run(tmp_path, notCircuit(), "0\n11\n")
+    with pytest.raises(CircuitError, match=r"line 1: expected 0 or 1, got '11'"):
+        run(tmp_path, andCircuit(), "0,11\n", name="vectors.csv")
+    with pytest.raises(CircuitError, match=r"line 1: expected 0 or 1, got '11'"):
+        run(tmp_path, andCircuit(), "0 11\n")
+
+
+def testInvalidValueAfterHeader(tmp_path):
+    with pytest.raises(CircuitError, match=r"line 3: expected 0 or 1, got 'x'"):
+        run(tmp_path, andCircuit(), "A B\n0 1\n1 x\n")
+
+
+def testWrongWidth(tmp_path):
+    with pytest.raises(CircuitError, match="line 4: expected 2 values per vector, got 3"):
+        run(tmp_path, andCircuit(), "01\n\n10\n101\n")
+    with pytest.raises(CircuitError, match="line 2: expected 2 values per vector, got 1"):
+        run(tmp_path, andCircuit(), "A,B\n1\n", name="vectors.csv")
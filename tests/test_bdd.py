@@ -0,0 +1,68 @@
+import random
+
+import pytest
+
+from engine import compileCircuit
+from truthtable import truthTable
+from bdd import BDD, FALSE, TRUE, ORDERINGS, CircuitFunctions, circuitsEquivalent
+from circuits import randomCircuit
+
+
+@pytest.mark.parametrize("ordering", sorted(ORDERINGS))
+@pytest.mark.parametrize("seed", range(6))
+def testSatCountMatchesTruthTable(seed, ordering):
+    netlist = compileCircuit(randomCircuit(seed, input_count=6, gate_count=24))
+    functions = CircuitFunctions(netlist, ordering=ordering)
+    table = truthTable(netlist)
+
+    assert functions.getInputCount() == len(table.labels)
+    for output, node in enumerate(netlist.outputs):
+        assert functions.satCount(node) == table.getOnsetCount(output)
+
+
+@pytest.mark.parametrize("seed", range(6))
+def testSatisfyFindsOnsetRow(seed):
+    netlist = compileCircuit(randomCircuit(seed, input_count=5, gate_count=16))
+    inputs = list(netlist.inputs)
+    functions = CircuitFunctions(netlist, inputs=inputs)
+    table = truthTable(netlist, inputs=inputs)
+
+    for output, node in enumerate(netlist.outputs):
+        assignment = functions.manager.satisfy(functions.getFunction(node))
+        if table.getOnsetCount(output) == 0:
+            assert assignment is None
+            continue
+        # Variables missing from the path are don't-cares; fill them with 0
+        row = sum(assignment.get(var, 0) << (len(inputs) - 1 - var) for var in range(len(inputs)))
+        assert table.getValue(row, output) == 1
+
+
+def testSatCountCountsSkippedVariables():
+    manager = BDD(4)
+    assert manager.satCount(TRUE) == 16
+    assert manager.satCount(FALSE) == 0
+    assert manager.satCount(manager.variable(3)) == 8
+    assert manager.satCount(manager.conjoin(manager.variable(0), manager.variable(2))) == 4
+
+
+def testEquivalenceIgnoresNodeOrder():
+    data = randomCircuit(1)
+    # Outputs are matched by order, so only the other nodes are shuffled
+    outputs = [node_data for node_data in data["nodes"] if node_data["type"] == "OutputNode"]
+    others = [node_data for node_data in data["nodes"] if node_data["type"] != "OutputNode"]
+    random.Random(1).shuffle(others)
+    shuffled = {"nodes": others + outputs, "connections": list(reversed(data["connections"]))}
+    assert circuitsEquivalent(data, shuffled)
+
+    other = randomCircuit(2)
+    assert not circuitsEquivalent(data, other)
+
+
+def testUnconnectedOutputsAreNotEquivalent():
+    data = {
+        "nodes": [{"id": "A", "type": "InputNode"}, {"id": "g", "type": "AndNode"},
+                  {"id": "Y", "type": "OutputNode"}],
+        "connections": [{"source_node": "A", "source_socket": 0, "dest_node": "g", "dest_socket": 0},
+                        {"source_node": "g", "source_socket": 0, "dest_node": "Y", "dest_socket": 0}],
+    }
+    assert not circuitsEquivalent(data, data)
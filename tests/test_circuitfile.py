@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+from engine import CircuitError, compileCircuit
+from model import CircuitModel
+from circuitfile import (PROGRESS_RECORDS, CircuitFile, WriteCancelled, iterCircuitRecords, readCircuit,
+                         writeCircuit)
+from circuits import randomCircuit, canonical
+
+
+@pytest.mark.parametrize("name", ["circuit.circuit", "circuit.circuitb"])
+def testRoundTrip(tmp_path, name):
+    data = randomCircuit(3, input_count=6, gate_count=40)
+    path = str(tmp_path / name)
+    writeCircuit(data, path)
+
+    assert canonical(readCircuit(path)) == canonical(data)
+
+    records = list(iterCircuitRecords(path))
+    nodes = [record for kind, record, _ in records if kind == "node"]
+    connections = [record for kind, record, _ in records if kind == "connection"]
+    assert canonical({"nodes": nodes, "connections": connections}) == canonical(data)
+
+
+def testBinaryAndJsonAgree(tmp_path):
+    data = randomCircuit(4, input_count=5, gate_count=30)
+    json_path = str(tmp_path / "circuit.circuit")
+    binary_path = str(tmp_path / "circuit.circuitb")
+    writeCircuit(data, json_path)
+    writeCircuit(readCircuit(json_path), binary_path)
+    writeCircuit(readCircuit(binary_path), json_path)
+    assert canonical(readCircuit(json_path)) == canonical(data)
+
+    expected = compileCircuit(data)
+    with CircuitFile(binary_path) as circuit:
+        netlist = circuit.getNetlist()
+    assert netlist.ids == expected.ids
+    assert list(netlist.ops) == list(expected.ops)
+    assert list(netlist.fanin) == list(expected.fanin)
+    assert netlist.input_values == expected.input_values
+
+
+def testModelRoundTrip():
+    data = randomCircuit(5)
+    model = CircuitModel()
+    for node_data in data["nodes"]:
+        model.addNode(node_data)
+    for conn_data in data["connections"]:
+        model.addConnection(conn_data)
+    assert canonical(model.toJson()) == canonical(data)
+
+    model.unpack(model.pack())
+    assert canonical(model.toJson()) == canonical(data)
+    assert canonical(model.snapshot().toJson()) == canonical(data)
+
+
+def testSocketOutOfRange(tmp_path):
+    data = randomCircuit(6)
+    data["connections"][0]["dest_socket"] = 256
+    with pytest.raises(CircuitError, match="does not fit the binary format"):
+        writeCircuit(data, str(tmp_path / "circuit.circuitb"))
+
+
+@pytest.mark.parametrize("data", [randomCircuit(10, gate_count=PROGRESS_RECORDS + 100),
+                                  {"nodes": [], "connections": []}, {}])
+def testJsonMatchesJsonDump(tmp_path, data):
+    path = tmp_path / "circuit.circuit"
+    calls = []
+    writeCircuit(data, str(path), lambda done, total: calls.append((done, total)))
+    assert path.read_text() == json.dumps(data, indent=4)
+    total = len(data.get("nodes", [])) + len(data.get("connections", []))
+    assert calls[-1] == (total, total)
+
+
+@pytest.mark.parametrize("name", ["circuit.circuit", "circuit.circuitb"])
+def testProgressCancelsWrite(tmp_path, name):
+    data = randomCircuit(11, gate_count=2 * PROGRESS_RECORDS)
+    calls = []
+    with pytest.raises(WriteCancelled):
+        writeCircuit(data, str(tmp_path / name), lambda done, total: calls.append(done) or False)
+    assert calls == [PROGRESS_RECORDS]
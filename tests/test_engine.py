@@ -0,0 +1,87 @@
+import itertools
+
+import pytest
+
+from engine import (CircuitError, Simulator, compileCircuit, evaluateGate,
+                    OP_AND, OP_OR, OP_NOT, OP_NAND, OP_NOR, OP_XOR, OP_XNOR)
+from truthtable import truthTable
+from circuits import randomCircuit, referenceValues
+
+
+GATE_TABLES = {
+    OP_AND: [0, 0, 0, 1],
+    OP_OR: [0, 1, 1, 1],
+    OP_NAND: [1, 1, 1, 0],
+    OP_NOR: [1, 0, 0, 0],
+    OP_XOR: [0, 1, 1, 0],
+    OP_XNOR: [1, 0, 0, 1],
+}
+
+
+def testEvaluateGate():
+    for op, table in GATE_TABLES.items():
+        for row, (a, b) in enumerate(itertools.product((0, 1), repeat=2)):
+            assert evaluateGate(op, a, b) == table[row]
+        # Packed words: bit r of a and b is row r of the table
+        assert evaluateGate(op, 0b1100, 0b1010, 0b1111) == sum(value << row for row, value in enumerate(table))
+    assert evaluateGate(OP_NOT, 0b01, mask=0b11) == 0b10
+    with pytest.raises(CircuitError):
+        evaluateGate(99, 0, 0)
+
+
+@pytest.mark.parametrize("seed", range(8))
+def testEvaluateMatchesReference(seed):
+    data = randomCircuit(seed)
+    netlist = compileCircuit(data)
+    input_ids = [netlist.ids[node] for node in netlist.inputs]
+
+    for bits in itertools.product((0, 1), repeat=len(input_ids)):
+        expected = referenceValues(data, dict(zip(input_ids, bits)))
+        values = netlist.evaluate(bits)
+        for node, node_id in enumerate(netlist.ids):
+            assert values[node] == bool(expected[node_id])
+
+
+@pytest.mark.parametrize("seed", range(8))
+def testSimulatorMatchesReference(seed):
+    data = randomCircuit(seed, input_count=5, gate_count=20)
+    netlist = compileCircuit(data)
+    input_ids = [netlist.ids[node] for node in netlist.inputs]
+    simulator = Simulator(netlist, [0] * len(input_ids))
+
+    # Gray code order flips one input per step, exercising event-driven updates
+    for step in range(1 << len(input_ids)):
+        gray = step ^ (step >> 1)
+        bits = [(gray >> (len(input_ids) - 1 - position)) & 1 for position in range(len(input_ids))]
+        for node, value in zip(netlist.inputs, bits):
+            simulator.setInput(node, value)
+        expected = referenceValues(data, dict(zip(input_ids, bits)))
+        for node, node_id in enumerate(netlist.ids):
+            assert simulator.getValue(node) == bool(expected[node_id])
+
+
+@pytest.mark.parametrize("seed", range(8))
+def testTruthTableMatchesReference(seed):
+    data = randomCircuit(seed, input_count=6, gate_count=24)
+    netlist = compileCircuit(data)
+    inputs = list(netlist.inputs)
+    table = truthTable(netlist, inputs=inputs, block_bits=3)
+    input_ids = [netlist.ids[node] for node in inputs]
+    output_ids = [netlist.ids[node] for node in netlist.outputs]
+
+    for row in range(table.getRowCount()):
+        bits = [(row >> (len(inputs) - 1 - position)) & 1 for position in range(len(inputs))]
+        expected = referenceValues(data, dict(zip(input_ids, bits)))
+        for output, output_id in enumerate(output_ids):
+            assert table.getValue(row, output) == expected[output_id]
+
+
+def testUnconnectedOutputIsUndefined():
+    netlist = compileCircuit({
+        "nodes": [{"id": "A", "type": "InputNode"}, {"id": "g", "type": "AndNode"},
+                  {"id": "Y", "type": "OutputNode"}],
+        "connections": [{"source_node": "A", "source_socket": 0, "dest_node": "g", "dest_socket": 0},
+                        {"source_node": "g", "source_socket": 0, "dest_node": "Y", "dest_socket": 0}],
+    })
+    assert netlist.evaluate([1])[netlist.index["Y"]] is None
+    assert truthTable(netlist).columns == [None]
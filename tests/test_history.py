@@ -0,0 +1,122 @@
+import os
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtWidgets import QApplication
+
+from nodes import NodeEditor
+from history import Command, MoveNodesCommand, SetInputCommand, StructureCommand
+from circuits import randomCircuit, canonical
+
+
+@pytest.fixture(scope="module")
+def app():
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture
+def editor(app):
+    editor = NodeEditor()
+    editor.loadFromJson(randomCircuit(9))
+    yield editor
+    editor.release()
+    editor.deleteLater()
+    app.processEvents()
+
+
+def state(editor):
+    return canonical(editor.saveToJson())
+
+
+def applyEdits(editor):
+    """Make one edit of each command kind, returning the state after each"""
+
+    states = [state(editor)]
+
+    record = editor.createNode({"id": "extra", "type": "AndNode", "pos_x": 40.0, "pos_y": 50.0})
+    editor.pushCommand(StructureCommand("Add Node", added_nodes=[record]))
+    states.append(state(editor))
+
+    connection = editor.createConnection({"source_node": "A", "source_socket": 0,
+                                          "dest_node": "extra", "dest_socket": 0})
+    editor.pushCommand(StructureCommand("Connect", added_connections=[connection]))
+    states.append(state(editor))
+
+    node = editor.model.getNode("g0")
+    old_pos = (node["pos_x"], node["pos_y"])
+    for step in range(1, 4):
+        # Consecutive moves of a drag merge into one command
+        new_pos = (old_pos[0] + 100.0 * step, old_pos[1] + 50.0 * step)
+        editor.moveNodes({"g0": new_pos})
+        editor.pushCommand(MoveNodesCommand({"g0": (old_pos if step == 1 else previous, new_pos)}))
+        previous = new_pos
+    states.append(state(editor))
+
+    old_value = editor.model.getValue("B")
+    editor.setInputValue("B", not old_value)
+    editor.pushCommand(SetInputCommand("B", old_value, not old_value))
+    states.append(state(editor))
+
+    node_record, connections = editor.removeNode("g1")
+    editor.pushCommand(StructureCommand("Delete", removed_nodes=[node_record], removed_connections=connections))
+    states.append(state(editor))
+    return states
+
+
+def testUndoRedoRoundTrip(editor):
+    states = applyEdits(editor)
+    assert len(editor.history.commands) == len(states) - 1
+
+    for expected in reversed(states[:-1]):
+        assert editor.history.undo(editor)
+        assert state(editor) == expected
+    assert not editor.history.undo(editor)
+
+    for expected in states[1:]:
+        assert editor.history.redo(editor)
+        assert state(editor) == expected
+    assert not editor.history.redo(editor)
+
+
+def testNewEditDropsRedo(editor):
+    states = applyEdits(editor)
+    editor.history.undo(editor)
+    editor.history.undo(editor)
+    assert state(editor) == states[-3]
+
+    node = editor.model.getNode("A")
+    editor.moveNodes({"A": (-100.0, -100.0)})
+    editor.pushCommand(MoveNodesCommand({"A": ((node["pos_x"], node["pos_y"]), (-100.0, -100.0))}))
+    assert not editor.history.canRedo()
+    edited = state(editor)
+
+    editor.history.undo(editor)
+    assert state(editor) == states[-3]
+    editor.history.redo(editor)
+    assert state(editor) == edited
+
+
+def testEvictionKeepsNewestCommands(editor):
+    states = applyEdits(editor)
+    editor.history.setBudget(editor.history.getBytes() // 2)
+    kept = len(editor.history.commands)
+    assert 0 < kept < len(states) - 1
+
+    while editor.history.undo(editor):
+        pass
+    assert state(editor) == states[-1 - kept]
+
+    while editor.history.redo(editor):
+        pass
+    assert state(editor) == states[-1]
+
+
+def testCommandWithoutUndoCannotBeCreated():
+    class RedoOnly(Command):
+        def redo(self, editor):
+            pass
+
+    with pytest.raises(TypeError):
+        RedoOnly()
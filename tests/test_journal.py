@@ -0,0 +1,74 @@
+import os
+
+import pytest
+
+from model import CircuitModel
+from journal import Journal, journalPath, loadSnapshot, replayJournal
+from circuitfile import readCircuit, writeCircuit
+from circuits import randomCircuit, canonical
+
+
+def edit(model):
+    """Apply one of each kind of journaled change"""
+
+    model.addNode({"id": "extra", "type": "NotNode", "pos_x": 10.0, "pos_y": 20.0})
+    model.addConnection({"source_node": "A", "source_socket": 0, "dest_node": "extra", "dest_socket": 0})
+    model.moveNode("g0", 500.0, 600.0)
+    model.setValue("A", not model.getValue("A"))
+    model.removeConnection(model.getConnections("Y0")[0])
+    model.removeNode("g1")
+
+
+def recover(base_path, path):
+    model = CircuitModel()
+    loadSnapshot(model, readCircuit(base_path))
+    replayJournal(model, path)
+    return model
+
+
+@pytest.mark.parametrize("compact_records", [10000, 4])
+def testReplayAfterCrash(tmp_path, compact_records):
+    base_path = str(tmp_path / "circuit.circuit")
+    path = journalPath(base_path)
+    data = randomCircuit(7)
+    writeCircuit(data, base_path)
+
+    model = CircuitModel()
+    loadSnapshot(model, data)
+    journal = Journal(path, base_path, compact_records)
+    journal.attach(model)
+    edit(model)
+    journal.flush()
+
+    # Stop the worker without removing the file, then cut the last write short
+    assert journal.close(discard=False, wait=True)
+    with open(path, 'a') as f:
+        f.write('{"op":"move","id":"g2","x":')
+
+    assert canonical(recover(base_path, path).toJson()) == canonical(model.toJson())
+
+
+def testReopenedJournalAppends(tmp_path):
+    base_path = str(tmp_path / "circuit.circuit")
+    path = journalPath(base_path)
+    data = randomCircuit(8)
+    writeCircuit(data, base_path)
+
+    model = CircuitModel()
+    loadSnapshot(model, data)
+    journal = Journal(path, base_path)
+    journal.attach(model)
+    model.moveNode("g0", 1.0, 2.0)
+    assert journal.close(discard=False, wait=True)
+
+    model = recover(base_path, path)
+    journal = Journal(path, base_path)
+    journal.attach(model)
+    edit(model)
+    assert journal.close(discard=False, wait=True)
+
+    assert canonical(recover(base_path, path).toJson()) == canonical(model.toJson())
+
+    journal = Journal(path, base_path)
+    assert journal.close(wait=True)
+    assert not os.path.exists(path)
@@ -0,0 +1,78 @@
+import random
+
+import pytest
+
+from engine import compileCircuit
+from truthtable import TruthTable, truthTable
+from minimize import EXACT_LIMIT, Minimizer, MinimizeCancelled, minimizeColumn, minimizeTable
+from circuits import randomCircuit
+
+
+def coverMask(minimizer, cubes):
+    mask = 0
+    for cube in cubes:
+        mask |= minimizer.cubeMask(cube)
+    return mask
+
+
+@pytest.mark.parametrize("count", range(0, EXACT_LIMIT + 4))
+def testCoverEqualsOnset(count):
+    rng = random.Random(count)
+    rows = 1 << count
+    for _ in range(5):
+        onset = rng.getrandbits(rows)
+        minimizer = Minimizer(onset, count)
+        cubes = minimizeColumn(onset, count)
+        assert coverMask(minimizer, cubes) == onset
+
+
+@pytest.mark.parametrize("count", [3, EXACT_LIMIT + 2])
+def testConstantFunctions(count):
+    full = (1 << (1 << count)) - 1
+    assert minimizeColumn(0, count) == []
+    assert minimizeColumn(full, count) == [(0, 0)]
+
+
+def testExactCoverIsMinimal():
+    # A xor B needs both minterms; A + B needs two single-literal cubes
+    assert len(minimizeColumn(0b0110, 2)) == 2
+    assert sorted(minimizeColumn(0b1110, 2)) == [(1, 1), (2, 2)]
+
+
+@pytest.mark.parametrize("seed", range(4))
+def testMinimizedTableStaysEquivalent(seed):
+    netlist = compileCircuit(randomCircuit(seed, input_count=5, gate_count=20))
+    table = truthTable(netlist)
+    count = len(table.labels)
+    env = {}
+
+    for output in range(len(table.output_labels)):
+        sop, pos = minimizeTable(table, output)
+        for row in range(table.getRowCount()):
+            for position, label in enumerate(table.labels):
+                env[label] = bool((row >> (count - 1 - position)) & 1)
+            expected = table.getValue(row, output)
+            for text in (sop, pos):
+                expression = text.replace("!", " not ").replace("*", " and ").replace("+", " or ")
+                assert eval(expression, {}, env) == bool(expected)
+
+
+def testParityTermLimit():
+    count = 10
+    onset = sum(1 << row for row in range(1 << count) if bin(row).count("1") & 1)
+    table = TruthTable([f"x{i}" for i in range(count)], ["y"], [onset])
+    sop, pos = minimizeTable(table, max_terms=100)
+    assert sop == pos == "more than 100 terms"
+    sop, _ = minimizeTable(table, max_terms=512)
+    assert sop.count("+") == 511
+
+
+def testProgressAndCancel():
+    onset = random.Random(3).getrandbits(1 << 12)
+    reports = []
+    cubes = minimizeColumn(onset, 12, progress=lambda done, total: reports.append((done, total)) or True)
+    assert coverMask(Minimizer(onset, 12), cubes) == onset
+    assert reports and all(0 <= done <= total for done, total in reports)
+    assert [done for done, _ in reports] == sorted(done for done, _ in reports)
+    with pytest.raises(MinimizeCancelled):
+        minimizeColumn(onset, 12, progress=lambda done, total: False)